@@ -116,6 +116,10 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': 'fingerprint.log',
         },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+        },
     },
     'loggers': {
         'fingerprint': {
@@ -123,6 +127,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        # Configured here rather than with logging.basicConfig at import time
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
     },
 }
 
@@ -130,7 +139,73 @@ LOGGING = {
 FINGERPRINT_SCANNER = {
     'PORT': '/dev/ttyACM0',  # Update this for your system
     'BAUDRATE': 9600,
-    'TIMEOUT': 1
+    'TIMEOUT': 1,
+    'TERMINAL': 'main',  # Identifies this scanner in caches and punch records
+    'HEALTH_INTERVAL': 5,  # Seconds between STATUS probes while the scanner is idle
+    'HEALTH_FAILURES': 3,  # Failed probes in a row before reconnecting
+    'RECONNECT_BACKOFF_MAX': 30,  # Longest wait between reconnect attempts
+    'HEALTH_FILE': BASE_DIR / 'scanner_health.json',  # Written by the scanner service
+}
+
+FINGERPRINT_MATCHER = {
+    'TEMPLATE_PACK': BASE_DIR / 'template_pack.bin',
+    'ACCEPT_THRESHOLD': 0.85,  # Minimum bit agreement for a match when the sensor does not decide
+    'SENSOR_MATCH': True,  # Confirm matches with the sensor's own matcher
+    'SENSOR_ACCEPT_SCORE': 50,  # Minimum sensor match score
+    'CONFIRM_BATCH_SIZE': 64,  # Ranked templates read from the pack per batch of sensor comparisons
+    'WORKERS': None,  # Matcher processes, defaults to the number of cores
+    'PARALLEL_MIN_TEMPLATES': 4096,  # Smaller galleries are matched in-process
+    'REJECT_DUPLICATES': True,  # False only flags fingers already enrolled to someone else
+    'PROBE_CACHE_TTL': 10,  # Seconds a probe's identification is reused at the same terminal
+    'PROBE_CACHE_SIZE': 256,  # Recent probes kept per process
+    'PUNCH_DEDUP_SECONDS': 60,  # Repeat punches within this window are not recorded
+    'CANDIDATE_LOOKBACK_DAYS': 7,  # History used to pick likely candidates per terminal
+    'CANDIDATE_WINDOW_MINUTES': 90,  # Time-of-day window around past check-ins
+    'CANDIDATE_CACHE_TTL': 300,
+    'MAX_CANDIDATES': 2000,
+}
+
+# Enrollment scans several placements and keeps the clearest of the good ones
+FINGERPRINT_ENROLLMENT = {
+    'SAMPLES': 3,  # Scans taken per enrollment
+    'MIN_SAMPLES': 2,  # Good, mutually matching scans needed to enroll
+    'MIN_QUALITY': 50,  # Scans with a lower sensor image_quality are discarded
+    'MIN_AGREEMENT': None,  # Score scans need to each other, defaults to the matcher's accept score
+    'SAMPLE_INTERVAL': 1,  # Seconds to lift and replace the finger between scans
+}
+
+# Terminals running the scanner daemon sync punches and templates with this token
+ATTENDANCE_SYNC = {
+    'TOKEN': None,  # Set to enable the ingest and template pack endpoints
+    'SERVER_URL': 'http://localhost:8000',  # Used by the scanner daemon
+    'JOURNAL': BASE_DIR / 'punch_journal.jsonl',
+    'PACK_CACHE': BASE_DIR / 'template_pack.cache.bin',
+    'BATCH_SIZE': 500,
+    'SYNC_INTERVAL': 30,  # Seconds between sync attempts while offline
+}
+
+# Punches are paired into work sessions across midnight
+ATTENDANCE_PAIRING = {
+    'MAX_SESSION_HOURS': 16,  # A later punch starts a new session instead of checking out
+    'REPEAT_PUNCH_SECONDS': 60,  # Punches this close to the previous one are double scans
+}
+
+# Columnar attendance partitions for long-range reports, refreshed nightly
+# by the export_analytics command
+ANALYTICS = {
+    'STORE': BASE_DIR / 'analytics',
+}
+
+# Rendered report fragments; a month's fragments are invalidated as soon as
+# its attendance or salaries change, so the timeout only reclaims memory
+REPORT_CACHE = {
+    'TIMEOUT': 60 * 60 * 24 * 7,
+}
+
+PAYROLL_JOBS = {
+    'WORKERS': 1,  # Background payroll threads per process
+    'CHUNK_SIZE': 500,  # Employees calculated between progress updates
+    'STALE_AFTER': 600,  # Seconds without progress before a run is restarted
 }
 
 
@@ -1,7 +1,88 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from .bulk import adjust_base_salaries, close_payroll_month, deactivate_employees, delete_attendance, orphaned_attendance
 from .models import *
 
-admin.site.register(Employee)
+
+class AdjustBaseSalariesForm(forms.Form):
+    percent = forms.DecimalField(max_digits=6, decimal_places=2, help_text="Change in percent, negative to lower")
+
+
+@admin.register(Employee)
+class EmployeeAdmin(admin.ModelAdmin):
+    list_display = ['employee_id', '__str__', 'designation', 'base_salary', 'fingerprint_quality', 'is_active']
+    list_filter = ['is_active', 'designation']
+    search_fields = ['employee_id', 'user__first_name', 'user__last_name']
+    list_select_related = ['user']
+    actions = ['deactivate', 'adjust_base_salaries']
+
+    @admin.action(description='Deactivate selected employees')
+    def deactivate(self, request, queryset):
+        count = deactivate_employees(queryset)
+        self.message_user(request, f'{count} employees deactivated')
+
+    @admin.action(description='Adjust base salaries by a percentage')
+    def adjust_base_salaries(self, request, queryset):
+        form = AdjustBaseSalariesForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            try:
+                count = adjust_base_salaries(queryset, form.cleaned_data['percent'])
+            except ValueError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return None
+            self.message_user(request, f"Base salaries of {count} employees adjusted by {form.cleaned_data['percent']}%")
+            return None
+
+        # Ask for the percentage, keeping the selection in hidden fields
+        return TemplateResponse(request, 'admin/core/employee/adjust_base_salaries.html', {
+            **self.admin_site.each_context(request),
+            'title': 'Adjust base salaries',
+            'opts': self.model._meta,
+            'form': form,
+            'count': queryset.count(),
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'action': 'adjust_base_salaries',
+        })
+
+
+@admin.register(EmployeeSalary)
+class EmployeeSalaryAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'month', 'base_salary', 'final_salary', 'closed_at']
+    list_filter = ['month', ('closed_at', admin.EmptyFieldListFilter)]
+    list_select_related = ['employee__user']
+    actions = ['close_months']
+
+    @admin.action(description='Close the payroll months of the selected salaries')
+    def close_months(self, request, queryset):
+        months = sorted(set(queryset.values_list('month', flat=True)))
+        try:
+            closed = sum(close_payroll_month(month) for month in months)
+        except ValueError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, f"{closed} salaries closed in {', '.join(f'{month:%Y-%m}' for month in months)}")
+
+
+@admin.register(Attendance)
+class AttendanceAdmin(admin.ModelAdmin):
+    list_display = ['employee', 'date', 'check_in', 'check_out', 'terminal']
+    list_filter = ['date', 'terminal']
+    list_select_related = ['employee__user']
+    date_hierarchy = 'date'
+    actions = ['delete_orphaned']
+
+    @admin.action(description='Delete selected attendance not backed by punch events')
+    def delete_orphaned(self, request, queryset):
+        deleted = delete_attendance(orphaned_attendance().filter(pk__in=queryset.values('pk')))
+        self.message_user(request, f'{deleted} orphaned attendance records deleted')
+
+
 admin.site.register(SalaryConfiguration)
-admin.site.register(EmployeeSalary)
-admin.site.register(Attendance)
\ No newline at end of file
+admin.site.register(PayrollRun)
+admin.site.register(Shift)
+admin.site.register(ShiftAssignment)
+admin.site.register(PunchEvent)
+admin.site.register(DailyAttendanceRollup)
@@ -0,0 +1,230 @@
+# core/analytics.py
+import datetime
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Attendance, SalaryConfiguration
+from core.payroll import work_windows
+from core.schedules import ShiftSchedule
+
+logger = logging.getLogger(__name__)
+
+# Columns of a month partition; times are seconds since midnight of the
+# attendance date and NaN where a session has no check-out
+COLUMNS = ['employee', 'day', 'check_in', 'check_out', 'worked', 'late', 'early_leave', 'overtime']
+MANIFEST = 'manifest.json'
+
+
+class AnalyticsError(Exception):
+    """Raised when the analytics store is missing or unreadable"""
+    pass
+
+
+def get_store_path() -> Path:
+    return Path(settings.ANALYTICS['STORE'])
+
+
+def _months(start: datetime.date, end: datetime.date) -> List[datetime.date]:
+    months, month = [], start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    return months
+
+
+def export_month(month_date: datetime.date, store: Optional[Path] = None) -> int:
+    """
+    Export a month of attendance into a columnar partition.
+
+    Each column is written as a ``.npy`` file in a ``YYYY-MM`` directory,
+    which replaces the previous partition in one rename, so readers never
+    see a half-written month. Late, early leave and overtime are measured
+    against shifts and configuration versions at export time.
+
+    Args:
+        month_date (date): Any day in the month
+        store (Path, optional): Store directory, defaults to ANALYTICS['STORE']
+
+    Returns:
+        int: Number of attendance records exported
+    """
+    store = Path(store or get_store_path())
+    store.mkdir(parents=True, exist_ok=True)
+    start = month_date.replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+
+    rows = list(Attendance.objects.filter(
+        date__range=(start, end), check_in__isnull=False
+    ).order_by('employee_id', 'date').values_list('employee_id', 'date', 'check_in', 'check_out').iterator(chunk_size=10000))
+    count = len(rows)
+
+    employee = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    day = np.fromiter((row[1].toordinal() for row in rows), dtype=np.int32, count=count)
+    check_in = np.fromiter((row[2].timestamp() for row in rows), dtype=np.float64, count=count)
+    check_out = np.fromiter((row[3].timestamp() if row[3] else np.nan for row in rows), dtype=np.float64, count=count)
+
+    # Local midnight is resolved once per distinct date, not per record
+    days, day_index = np.unique(day, return_inverse=True)
+    midnight = np.array([
+        timezone.make_aware(datetime.datetime.combine(datetime.date.fromordinal(int(ordinal)), datetime.time.min)).timestamp()
+        for ordinal in days
+    ], dtype=np.float64)[day_index] if count else np.zeros(0)
+    check_in -= midnight
+    check_out -= midnight
+
+    columns = {
+        'employee': employee,
+        'day': day,
+        'check_in': check_in,
+        'check_out': check_out,
+        'worked': check_out - check_in,
+    }
+    configs = SalaryConfiguration.objects.index()
+    if configs and count:
+        _, work_start, work_end = work_windows(employee, day.astype(np.int64), configs, ShiftSchedule.load(start, end))
+        columns['late'] = np.maximum(check_in - work_start, 0)
+        columns['early_leave'] = np.maximum(work_end - check_out, 0)
+        columns['overtime'] = np.maximum(check_out - work_end, 0)
+    else:
+        for name in ('late', 'early_leave', 'overtime'):
+            columns[name] = np.full(count, np.nan)
+
+    partition = store / f'{start:%Y-%m}'
+    staging = Path(tempfile.mkdtemp(dir=store, prefix=f'.{start:%Y-%m}-'))
+    try:
+        for name in COLUMNS:
+            np.save(staging / f'{name}.npy', columns[name])
+        with open(staging / MANIFEST, 'w') as handle:
+            json.dump({
+                'month': f'{start:%Y-%m}',
+                'rows': count,
+                'columns': COLUMNS,
+                'exported_at': timezone.now().isoformat(),
+            }, handle)
+
+        retired = None
+        if partition.exists():
+            retired = store / f'.{start:%Y-%m}-retired-{os.getpid()}'
+            os.rename(partition, retired)
+        os.rename(staging, partition)
+        if retired is not None:
+            shutil.rmtree(retired)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    logger.info(f"Exported {count} attendance records for {start:%Y-%m}")
+    return count
+
+
+def load_columns(start: datetime.date, end: datetime.date, columns: Iterable[str] = COLUMNS,
+                 store: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Read columns for a date range from the store.
+
+    Partitions are memory-mapped and only the requested columns are read.
+    Months that were never exported are skipped with a warning.
+
+    Args:
+        start (date): First date
+        end (date): Last date
+        columns (Iterable[str]): Columns to read
+        store (Path, optional): Store directory
+
+    Returns:
+        Dict[str, np.ndarray]: Concatenated columns, always including ``day``
+    """
+    store = Path(store or get_store_path())
+    columns = list(dict.fromkeys(['day', *columns]))
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise AnalyticsError(f"Unknown analytics columns: {', '.join(sorted(unknown))}")
+
+    parts: Dict[str, List[np.ndarray]] = {name: [] for name in columns}
+    for month in _months(start, end):
+        partition = store / f'{month:%Y-%m}'
+        if not (partition / MANIFEST).exists():
+            logger.warning(f"No analytics partition for {month:%Y-%m}")
+            continue
+        loaded = {name: np.load(partition / f'{name}.npy', mmap_mode='r') for name in columns}
+        # Only the first and last months can be partial
+        mask = (loaded['day'] >= start.toordinal()) & (loaded['day'] <= end.toordinal())
+        for name in columns:
+            parts[name].append(loaded[name][mask] if not mask.all() else loaded[name])
+
+    return {
+        name: np.concatenate(values) if values else np.zeros(0)
+        for name, values in parts.items()
+    }
+
+
+def attendance_percentage(start: datetime.date, end: datetime.date, store: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Present days and attendance percentage per employee.
+
+    Returns:
+        Dict[str, np.ndarray]: ``employee`` pks with their ``present_days``
+        and ``percentage`` of the days in the range
+    """
+    data = load_columns(start, end, ['employee'], store)
+    total_days = (end - start).days + 1
+    # Several sessions on one day count as one present day
+    pairs = np.unique(np.stack([data['employee'].astype(np.int64), data['day'].astype(np.int64)]), axis=1)
+    employees, present = np.unique(pairs[0], return_counts=True)
+    return {
+        'employee': employees,
+        'present_days': present,
+        'percentage': present * 100.0 / total_days,
+    }
+
+
+def lateness_distribution(start: datetime.date, end: datetime.date, bin_minutes: int = 15,
+                          max_minutes: int = 240, store: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Histogram of late arrivals across all employees.
+
+    Returns:
+        Dict[str, np.ndarray]: Bin ``edges`` in minutes and the ``counts`` of
+        late check-ins per bin; the last bin collects everything later
+    """
+    late = load_columns(start, end, ['late'], store)['late'] / 60
+    late = late[late > 0]
+    edges = np.append(np.arange(0, max_minutes + bin_minutes, bin_minutes), np.inf)
+    counts, _ = np.histogram(late, bins=edges)
+    return {'edges': edges, 'counts': counts}
+
+
+def overtime_trend(start: datetime.date, end: datetime.date, store: Optional[Path] = None) -> Dict[str, np.ndarray]:
+    """
+    Overtime per month across all employees.
+
+    Returns:
+        Dict[str, np.ndarray]: ``month`` labels (YYYY-MM), ``total_hours`` of
+        overtime and ``average_hours`` per employee with attendance that month
+    """
+    data = load_columns(start, end, ['employee', 'overtime'], store)
+    months = _months(start, end)
+    month_starts = np.array([month.toordinal() for month in months], dtype=np.int64)
+    month_index = np.searchsorted(month_starts, data['day'].astype(np.int64), side='right') - 1
+
+    overtime = np.nan_to_num(data['overtime']) / 3600
+    totals = np.bincount(month_index, weights=overtime, minlength=len(months))
+    employees = np.zeros(len(months))
+    if len(month_index):
+        pairs = np.unique(np.stack([month_index, data['employee'].astype(np.int64)]), axis=1)
+        employees = np.bincount(pairs[0], minlength=len(months)).astype(np.float64)
+
+    return {
+        'month': np.array([f'{month:%Y-%m}' for month in months]),
+        'total_hours': totals,
+        'average_hours': np.divide(totals, employees, out=np.zeros(len(months)), where=employees > 0),
+    }
@@ -0,0 +1,156 @@
+# core/bulk.py
+import datetime
+import logging
+from decimal import Decimal
+from typing import Iterator, List, Optional
+
+from django.db import transaction
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q, QuerySet, Value
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from core.directory import invalidate_directory
+from core.models import Attendance, Employee, EmployeeSalary, PunchEvent
+from core.payroll import calculate_monthly_salaries
+from core.report_cache import invalidate_months
+from core.rollups import refresh_bitmaps, refresh_daily_rollups
+
+logger = logging.getLogger(__name__)
+
+# Rows written per statement; keeps IN lists and lock times bounded
+BULK_CHUNK_SIZE = 1000
+
+
+def _chunks(pks: List[int], size: int = BULK_CHUNK_SIZE) -> Iterator[List[int]]:
+    for index in range(0, len(pks), size):
+        yield pks[index:index + size]
+
+
+def deactivate_employees(employees: QuerySet) -> int:
+    """
+    Mark employees inactive with one UPDATE per chunk.
+
+    Args:
+        employees (QuerySet): Employees to deactivate
+
+    Returns:
+        int: Number of employees that were active
+    """
+    pks = list(employees.filter(is_active=True).values_list('pk', flat=True))
+    updated = 0
+    with transaction.atomic():
+        for chunk in _chunks(pks):
+            updated += Employee.objects.filter(pk__in=chunk).update(is_active=False)
+        # update() sends no post_save
+        invalidate_directory()
+
+    logger.info(f"Deactivated {updated} employees")
+    return updated
+
+
+def adjust_base_salaries(employees: QuerySet, percent: Decimal) -> int:
+    """
+    Raise or lower base salaries by a percentage, rounded to cents, in the database.
+
+    Months with open salary records of these employees are invalidated,
+    since recalculating them pays the new base salaries.
+
+    Args:
+        employees (QuerySet): Employees to adjust
+        percent (Decimal): Change in percent, negative to lower
+
+    Returns:
+        int: Number of employees adjusted
+
+    Raises:
+        ValueError: If the change would make salaries negative
+    """
+    factor = Decimal(1) + Decimal(percent) / 100
+    if factor < 0:
+        raise ValueError("Base salaries cannot be lowered by more than 100%")
+
+    adjusted = ExpressionWrapper(
+        Round(F('base_salary') * Value(factor), 2),
+        output_field=DecimalField(max_digits=10, decimal_places=2)
+    )
+    pks = list(employees.values_list('pk', flat=True))
+    updated = 0
+    with transaction.atomic():
+        for chunk in _chunks(pks):
+            updated += Employee.objects.filter(pk__in=chunk).update(base_salary=adjusted)
+        # update() sends no post_save
+        invalidate_months(EmployeeSalary.objects.filter(
+            employee__in=pks, closed_at__isnull=True
+        ).values_list('month', flat=True).distinct())
+
+    logger.info(f"Adjusted base salaries of {updated} employees by {percent}%")
+    return updated
+
+
+def close_payroll_month(month_date: datetime.date) -> int:
+    """
+    Calculate a month's outstanding salaries and close them against recalculation.
+
+    Args:
+        month_date (date): Any day in the month
+
+    Returns:
+        int: Number of salaries closed
+
+    Raises:
+        ValueError: If no salary configuration exists
+    """
+    month = month_date.replace(day=1)
+    with transaction.atomic():
+        calculate_monthly_salaries(month)
+        closed = EmployeeSalary.objects.filter(month=month, closed_at__isnull=True).update(closed_at=timezone.now())
+        invalidate_months([month])
+
+    logger.info(f"Closed payroll for {month:%Y-%m}: {closed} salaries")
+    return closed
+
+
+def orphaned_attendance(start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> QuerySet:
+    """
+    Attendance rows not derived from any punch event.
+
+    Sessions are projected from the event log, so a row without a check-in
+    or whose check-in was never punched would disappear on a rebuild.
+    """
+    punched = PunchEvent.objects.filter(employee_id=OuterRef('employee_id'), timestamp=OuterRef('check_in'))
+    records = Attendance.objects.filter(Q(check_in__isnull=True) | ~Exists(punched))
+    if start is not None:
+        records = records.filter(date__gte=start)
+    if end is not None:
+        records = records.filter(date__lte=end)
+    return records
+
+
+def delete_attendance(records: QuerySet) -> int:
+    """
+    Delete attendance rows a chunk at a time.
+
+    Heatmap rollups of the affected dates are refreshed once for the
+    whole deletion.
+
+    Args:
+        records (QuerySet): Attendance to delete
+
+    Returns:
+        int: Number of rows deleted
+    """
+    rows = list(records.values_list('pk', 'employee_id', 'date'))
+    deleted = 0
+    with transaction.atomic():
+        for chunk in _chunks([pk for pk, _, _ in rows]):
+            _, per_model = Attendance.objects.filter(pk__in=chunk).delete()
+            deleted += per_model.get(Attendance._meta.label, 0)
+
+        dates = {date for _, _, date in rows}
+        employee_pks = {employee_pk for _, employee_pk, _ in rows}
+        refresh_daily_rollups(dates)
+        for month in {date.replace(day=1) for date in dates}:
+            refresh_bitmaps(month, employee_pks)
+
+    logger.info(f"Deleted {deleted} attendance records")
+    return deleted
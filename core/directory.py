@@ -0,0 +1,132 @@
+# core/directory.py
+import datetime
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import DataVersion, Employee
+from core.schedules import get_schedule
+
+# Seconds after which the directory is reloaded even without a signal, to
+# pick up bulk updates that bypass post_save
+DIRECTORY_MAX_AGE = 300
+# Seconds between checks for edits made by other processes
+DIRECTORY_CHECK_INTERVAL = 30
+VERSION_KEY = 'employee-directory'
+
+
+class DirectoryEntry:
+    """
+    The parts of an Employee the punch path needs.
+
+    Entries stand in for Employee instances in punch handling and messages:
+    they have ``pk``, ``employee_id``, ``is_active``, ``get_full_name()``
+    and the same ``str()``.
+    """
+    __slots__ = ('pk', 'employee_id', 'name', 'is_active')
+
+    def __init__(self, pk: int, employee_id: str, name: str, is_active: bool):
+        self.pk = pk
+        self.employee_id = employee_id
+        self.name = name
+        self.is_active = is_active
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.name}"
+
+    def get_full_name(self) -> str:
+        return self.name
+
+    def shift_window(self, date: Optional[datetime.date] = None) -> Optional[Tuple[float, float]]:
+        """The employee's shift window on ``date`` (default today), from the compiled schedule"""
+        return get_schedule().window(self.pk, date or timezone.localdate())
+
+
+class EmployeeDirectory:
+    """
+    Every employee's pk, code, full name and active flag.
+
+    Pks are kept in a sorted NumPy array searched with ``searchsorted``;
+    codes and names are parallel lists, so 10k employees take well under
+    a megabyte and a lookup builds one small entry.
+    """
+    __slots__ = ('_pks', '_employee_ids', '_names', '_active')
+
+    def __init__(self, rows: Iterable[Tuple[int, str, str, str, bool]]):
+        rows = sorted(rows)
+        self._pks = np.array([row[0] for row in rows], dtype=np.int64)
+        self._employee_ids: List[str] = [row[1] for row in rows]
+        self._names: List[str] = [f"{row[2]} {row[3]}".strip() for row in rows]
+        self._active = np.array([row[4] for row in rows], dtype=bool)
+
+    def __len__(self):
+        return len(self._pks)
+
+    @classmethod
+    def load(cls) -> 'EmployeeDirectory':
+        """Load every employee with their user's name in one query"""
+        return cls(Employee.objects.values_list(
+            'pk', 'employee_id', 'user__first_name', 'user__last_name', 'is_active'
+        ))
+
+    def get(self, pk: int) -> Optional[DirectoryEntry]:
+        """Entry of an employee pk, or None if there is no such employee"""
+        index = int(np.searchsorted(self._pks, pk))
+        if index >= len(self._pks) or self._pks[index] != pk:
+            return None
+        return DirectoryEntry(pk, self._employee_ids[index], self._names[index], bool(self._active[index]))
+
+
+_directory: Optional[EmployeeDirectory] = None
+_directory_version = None
+_directory_loaded = 0.0
+_directory_checked = 0.0
+_directory_lock = threading.Lock()
+
+
+def get_directory() -> EmployeeDirectory:
+    """
+    Process-wide employee directory.
+
+    Lookups are served from memory. At most every DIRECTORY_CHECK_INTERVAL
+    seconds one query reads the directory's DataVersion, which saving an
+    Employee or User moves, and the directory is reloaded if it moved.
+    Edits made in this process are picked up on the next lookup.
+    """
+    global _directory, _directory_version, _directory_loaded, _directory_checked
+    with _directory_lock:
+        now = time.monotonic()
+        if _directory is not None and now - _directory_checked < DIRECTORY_CHECK_INTERVAL:
+            return _directory
+
+        version = DataVersion.objects.current(VERSION_KEY)
+        if _directory is None or version != _directory_version or now - _directory_loaded > DIRECTORY_MAX_AGE:
+            _directory = EmployeeDirectory.load()
+            _directory_version = version
+            _directory_loaded = now
+        _directory_checked = now
+        return _directory
+
+
+def _recheck_directory():
+    global _directory_checked
+    with _directory_lock:
+        _directory_checked = 0.0
+
+
+def lookup_employee(pk: int, active_only: bool = True) -> Optional[DirectoryEntry]:
+    """Directory entry of an employee, or None if unknown or, with ``active_only``, inactive"""
+    entry = get_directory().get(pk)
+    if entry is None or (active_only and not entry.is_active):
+        return None
+    return entry
+
+
+def invalidate_directory():
+    """Make every process reload its directory once the current transaction commits"""
+    DataVersion.objects.bump([VERSION_KEY])
+    transaction.on_commit(_recheck_directory)
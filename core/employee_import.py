@@ -0,0 +1,177 @@
+# core/employee_import.py
+import csv
+import logging
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from core.directory import invalidate_directory
+from core.forms import EmployeeForm
+from core.models import Employee
+
+logger = logging.getLogger(__name__)
+
+# Columns an import file must have, the same fields as the employee form
+EMPLOYEE_COLUMNS = (
+    'employee_id', 'first_name', 'last_name', 'email', 'designation', 'date_joined',
+    'phone_number', 'emergency_contact', 'address', 'base_salary',
+)
+USER_FIELDS = ('first_name', 'last_name', 'email')
+IMPORT_CHUNK_SIZE = 1000
+
+
+class EmployeeImportError(Exception):
+    """Raised when an employee import file cannot be read at all"""
+    pass
+
+
+def read_employee_csv(lines: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    """
+    Read employee rows from a CSV stream with a header row.
+
+    Args:
+        lines (Iterable[str]): Text lines of the file
+
+    Returns:
+        Iterator[Tuple[int, dict]]: Line number and raw row of every record
+
+    Raises:
+        EmployeeImportError: If the header lacks any of ``EMPLOYEE_COLUMNS``
+    """
+    reader = csv.DictReader(lines)
+    header = [name.strip() for name in reader.fieldnames or []]
+    missing = [column for column in EMPLOYEE_COLUMNS if column not in header]
+    if missing:
+        raise EmployeeImportError(f"Missing columns: {', '.join(missing)}")
+    reader.fieldnames = header
+
+    for row in reader:
+        yield reader.line_num, row
+
+
+def clean_employee_row(row: dict) -> Tuple[dict, Dict[str, List[str]]]:
+    """
+    Validate one row with the employee form's fields and the model's validators.
+
+    Uniqueness is not checked here; ``import_employees`` checks whole
+    chunks against the file and the database at once.
+
+    Args:
+        row (dict): Raw CSV row
+
+    Returns:
+        Tuple[dict, Dict[str, List[str]]]: Cleaned values and error messages by field
+    """
+    cleaned, errors = {}, {}
+    for name in EMPLOYEE_COLUMNS:
+        value = (row.get(name) or '').strip()
+        try:
+            cleaned[name] = EmployeeForm.base_fields[name].clean(value)
+            if name not in USER_FIELDS:
+                # Model validators, such as the EMP1234 format, are not on the form fields
+                Employee._meta.get_field(name).run_validators(cleaned[name])
+        except ValidationError as e:
+            errors[name] = e.messages
+
+    if 'base_salary' in cleaned and cleaned['base_salary'] < 0:
+        errors['base_salary'] = ["Base salary cannot be negative"]
+    return cleaned, errors
+
+
+def _create_chunk(rows: List[dict]) -> int:
+    users = User.objects.bulk_create([
+        User(username=row['email'], first_name=row['first_name'], last_name=row['last_name'], email=row['email'])
+        for row in rows
+    ])
+    if not connection.features.can_return_rows_from_bulk_insert:
+        users = User.objects.in_bulk([user.username for user in users], field_name='username')
+        users = [users[row['email']] for row in rows]
+
+    Employee.objects.bulk_create([
+        Employee(user=user, **{name: row[name] for name in EMPLOYEE_COLUMNS if name not in USER_FIELDS})
+        for user, row in zip(users, rows)
+    ])
+    return len(rows)
+
+
+def import_employees(rows: Iterable[Tuple[int, dict]], chunk_size: int = IMPORT_CHUNK_SIZE,
+                     dry_run: bool = False) -> dict:
+    """
+    Create users and employees from import rows.
+
+    Every row is validated before anything is written. Rows with errors,
+    including employee ids or emails already taken in the file or the
+    database, are reported and skipped; the rest are created with
+    ``bulk_create`` in chunks inside one transaction.
+
+    Args:
+        rows (Iterable[Tuple[int, dict]]): Line numbers and raw rows, as from ``read_employee_csv``
+        chunk_size (int): Rows per INSERT and per uniqueness query
+        dry_run (bool): Validate only
+
+    Returns:
+        dict: ``read``, ``valid``, ``created`` and ``invalid`` counts and the
+        ``errors`` of every invalid row, each with its ``line``, ``employee_id`` and
+        messages by field
+    """
+    valid: List[Tuple[int, dict]] = []
+    errors: List[dict] = []
+    seen_ids, seen_emails = set(), set()
+    read = 0
+
+    def reject(line: int, row: dict, messages: Dict[str, List[str]]):
+        errors.append({'line': line, 'employee_id': (row.get('employee_id') or '').strip(), 'errors': messages})
+
+    for line, row in rows:
+        read += 1
+        cleaned, messages = clean_employee_row(row)
+        if 'employee_id' in cleaned:
+            if cleaned['employee_id'] in seen_ids:
+                messages.setdefault('employee_id', []).append("Duplicate employee ID in file")
+            seen_ids.add(cleaned['employee_id'])
+        if 'email' in cleaned:
+            if cleaned['email'] in seen_emails:
+                messages.setdefault('email', []).append("Duplicate email in file")
+            seen_emails.add(cleaned['email'])
+
+        if messages:
+            reject(line, row, messages)
+        else:
+            valid.append((line, cleaned))
+
+    # One query per chunk for codes and usernames already in the database
+    taken_ids, taken_emails = set(), set()
+    for index in range(0, len(valid), chunk_size):
+        chunk = [row for _, row in valid[index:index + chunk_size]]
+        taken_ids.update(Employee.objects.filter(
+            employee_id__in=[row['employee_id'] for row in chunk]
+        ).values_list('employee_id', flat=True))
+        taken_emails.update(User.objects.filter(
+            username__in=[row['email'] for row in chunk]
+        ).values_list('username', flat=True))
+
+    creatable = []
+    for line, row in valid:
+        messages = {}
+        if row['employee_id'] in taken_ids:
+            messages['employee_id'] = ["Employee with this Employee id already exists."]
+        if row['email'] in taken_emails:
+            messages['email'] = ["A user with this email already exists."]
+        if messages:
+            reject(line, row, messages)
+        else:
+            creatable.append(row)
+
+    created = 0
+    if not dry_run and creatable:
+        with transaction.atomic():
+            for index in range(0, len(creatable), chunk_size):
+                created += _create_chunk(creatable[index:index + chunk_size])
+            # bulk_create sends no post_save
+            invalidate_directory()
+
+    errors.sort(key=lambda error: error['line'])
+    logger.info(f"Imported {created} of {read} employees, {len(errors)} invalid")
+    return {'read': read, 'valid': len(creatable), 'created': created, 'invalid': len(errors), 'errors': errors}
@@ -0,0 +1,155 @@
+# core/enrollment.py
+import hashlib
+import itertools
+import logging
+import time
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from django.conf import settings
+
+from core.fingerprint_utils import FingerprintError, FingerprintScanner, sensor_compare
+from core.matcher import Compare, template_similarity
+
+logger = logging.getLogger(__name__)
+
+
+class EnrollmentError(FingerprintError):
+    """Raised when enrollment scans are too poor or inconsistent to enroll"""
+    pass
+
+
+class EnrollmentSample(NamedTuple):
+    template: bytes
+    quality: Optional[int]
+
+
+class EnrolledTemplate(NamedTuple):
+    template: bytes
+    template_hash: str
+    quality: Optional[int]
+    samples: int
+    rejected: int
+
+
+def get_enrollment_config() -> dict:
+    """FINGERPRINT_ENROLLMENT with the agreement threshold resolved for the configured matcher"""
+    config = dict(settings.FINGERPRINT_ENROLLMENT)
+    if config.get('MIN_AGREEMENT') is None:
+        matcher = settings.FINGERPRINT_MATCHER
+        if matcher.get('SENSOR_MATCH', True):
+            config['MIN_AGREEMENT'] = matcher.get('SENSOR_ACCEPT_SCORE', 50)
+        else:
+            config['MIN_AGREEMENT'] = matcher.get('ACCEPT_THRESHOLD', 0.85)
+    return config
+
+
+def collect_samples(scanner: FingerprintScanner, count: int, interval: float = 0) -> List[EnrollmentSample]:
+    """
+    Scan the same finger ``count`` times.
+
+    A scan that times out or fails is left out rather than aborting the
+    enrollment; ``select_template`` decides whether enough remain.
+
+    Args:
+        scanner (FingerprintScanner): Open scanner
+        count (int): Scans to take
+        interval (float): Seconds between scans to lift and replace the finger
+
+    Returns:
+        List[EnrollmentSample]: Successful scans with their image quality
+    """
+    samples = []
+    for number in range(1, count + 1):
+        logger.info(f"Place finger for scan {number} of {count}...")
+        try:
+            samples.append(EnrollmentSample(*scanner.capture_sample()))
+        except FingerprintError as e:
+            logger.warning(f"Enrollment scan {number} failed: {str(e)}")
+        if number < count and interval:
+            time.sleep(interval)
+    return samples
+
+
+def select_template(samples: List[EnrollmentSample], min_samples: int = 2, min_quality: int = 0,
+                    min_agreement: float = 0.85, compare: Optional[Compare] = None) -> EnrolledTemplate:
+    """
+    Gate enrollment scans on quality and agreement and keep the best one.
+
+    Scans below ``min_quality`` are discarded. Of the rest, the scan most
+    similar to all others is taken as the reference and scans that do not
+    match it at ``min_agreement`` are discarded too, which drops slipped or
+    partial placements. The clearest remaining scan is stored; character
+    files are not averaged, since only the sensor can align them.
+
+    Args:
+        samples (List[EnrollmentSample]): Enrollment scans
+        min_samples (int): Scans that must survive gating
+        min_quality (int): Minimum sensor image quality; scans without one pass
+        min_agreement (float): Minimum score against the reference scan
+        compare (Compare, optional): Sensor match used to score scan pairs,
+            instead of ``template_similarity``
+
+    Returns:
+        EnrolledTemplate: Template to store with its quality metadata
+
+    Raises:
+        EnrollmentError: If fewer than ``min_samples`` scans survive
+    """
+    good = [sample for sample in samples if sample.quality is None or sample.quality >= min_quality]
+    if len(good) < max(min_samples, 1):
+        raise EnrollmentError(
+            f"Only {len(good)} of {len(samples)} scans were clear enough, "
+            f"place the finger flat on the sensor and try again"
+        )
+
+    score = compare or template_similarity
+    similarity = np.zeros((len(good), len(good)))
+    for first, second in itertools.combinations(range(len(good)), 2):
+        similarity[first, second] = similarity[second, first] = score(good[first].template, good[second].template)
+    reference = int(np.argmax(similarity.sum(axis=1)))
+    agreeing = [
+        sample for index, sample in enumerate(good)
+        if index == reference or similarity[reference, index] >= min_agreement
+    ]
+    if len(agreeing) < max(min_samples, 1):
+        raise EnrollmentError(
+            f"Only {len(agreeing)} of {len(samples)} scans matched each other, "
+            f"use the same finger for every scan and try again"
+        )
+
+    qualities = [sample.quality for sample in agreeing if sample.quality is not None]
+    # Ties go to the reference scan
+    best = max(agreeing, key=lambda sample: (
+        sample.quality if sample.quality is not None else -1, sample is good[reference]
+    ))
+    return EnrolledTemplate(
+        template=best.template,
+        template_hash=hashlib.sha256(best.template).hexdigest(),
+        quality=round(sum(qualities) / len(qualities)) if qualities else None,
+        samples=len(agreeing),
+        rejected=len(samples) - len(agreeing)
+    )
+
+
+def enroll_template(scanner: FingerprintScanner) -> EnrolledTemplate:
+    """
+    Take the configured enrollment scans and pick the template to store.
+
+    Raises:
+        EnrollmentError: If the scans do not pass quality gating
+    """
+    config = get_enrollment_config()
+    samples = collect_samples(scanner, config.get('SAMPLES', 3), config.get('SAMPLE_INTERVAL', 1))
+    enrolled = select_template(
+        samples,
+        min_samples=config.get('MIN_SAMPLES', 2),
+        min_quality=config.get('MIN_QUALITY', 0),
+        min_agreement=config['MIN_AGREEMENT'],
+        compare=sensor_compare(scanner)
+    )
+    logger.info(
+        f"Enrollment template chosen from {enrolled.samples} scans, "
+        f"{enrolled.rejected} rejected, quality {enrolled.quality}"
+    )
+    return enrolled
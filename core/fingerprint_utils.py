@@ -1,19 +1,28 @@
 # attendance/fingerprint_utils.py
-from datetime import date, timezone
-from pyexpat.errors import messages
+import datetime
+from datetime import date
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import OperationalError
+from django.db.models import Max, Q
 from django.shortcuts import redirect
-import serial
+from django.utils import timezone
 import time
 import base64
 import hashlib
 import logging
-from typing import Optional, Tuple, List
+import os
+import threading
+from typing import Dict, Optional, Tuple, List, Union
 from django.conf import settings
 
-from core.models import Attendance, Employee
+from core.directory import DirectoryEntry, lookup_employee
+from core.matcher import Compare, get_matcher, template_similarity
+from core.models import Attendance, Employee, PunchEvent
+from core.projector import project_events
+from core.schedules import get_schedule
+from core.summary import summarize_attendance
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class FingerprintError(Exception):
@@ -21,6 +30,14 @@ class FingerprintError(Exception):
     pass
 
 class FingerprintScanner:
+    """
+    Line-based serial protocol to the Arduino sketch driving the sensor.
+    
+    Besides TEST, SCAN, ENROLL, VERIFY and STATUS, host-side matching
+    needs the sketch to answer CAPTURE with the probe's character file
+    (``TEMPLATE:<base64>``) and COMPARE with the sensor's match score of
+    two uploaded character files (``SCORE:<n>`` or ``NO_MATCH``).
+    """
     def __init__(self, port: str = '/dev/ttyACM0', baudrate: int = 9600, timeout: int = 1):
         """
         Initialize the Arduino fingerprint scanner connection.
@@ -33,6 +50,9 @@ class FingerprintScanner:
         Raises:
             FingerprintError: If scanner initialization fails
         """
+        # Only processes that open a scanner pay for pyserial
+        import serial
+
         try:
             self.serial = serial.Serial(
                 port=port,
@@ -191,6 +211,84 @@ class FingerprintScanner:
             logger.error(f"Verification failed: {str(e)}")
             raise FingerprintError(f"Verification failed: {str(e)}")
     
+    def capture_template(self) -> bytes:
+        """
+        Capture a probe template for host-side identification.
+        
+        Returns:
+            bytes: Template of the finger currently on the scanner
+            
+        Raises:
+            FingerprintError: If capture fails
+        """
+        try:
+            self.serial.write(b'CAPTURE\n')
+            
+            # Wait for finger placement
+            logger.info("Place finger to identify...")
+            while self._read_response() != 'PLACE_FINGER':
+                pass
+            
+            response = self._read_response()
+            if response.startswith('TEMPLATE:'):
+                return base64.b64decode(response[9:].encode())
+            else:
+                raise FingerprintError("Failed to get template from Arduino")
+            
+        except Exception as e:
+            logger.error(f"Capture failed: {str(e)}")
+            raise FingerprintError(f"Capture failed: {str(e)}")
+    
+    def compare_templates(self, first: bytes, second: bytes) -> int:
+        """
+        Score two templates with the sensor's own matcher.
+        
+        Both templates are loaded into the sensor's character buffers and
+        matched on the device, which aligns their minutiae, so the score
+        holds up when the finger was placed differently each time.
+        
+        Args:
+            first (bytes): Template, such as a captured probe
+            second (bytes): Template to compare it with
+            
+        Returns:
+            int: Sensor match score, 0 if the templates do not match
+            
+        Raises:
+            FingerprintError: If the comparison fails
+        """
+        try:
+            first_str = base64.b64encode(first).decode()
+            second_str = base64.b64encode(second).decode()
+            self.serial.write(f'COMPARE:{first_str}:{second_str}\n'.encode())
+            
+            response = self._read_response()
+            if response.startswith('SCORE:'):
+                return int(response[6:])
+            elif response == 'NO_MATCH':
+                return 0
+            else:
+                raise FingerprintError("Invalid response from Arduino")
+            
+        except Exception as e:
+            logger.error(f"Comparison failed: {str(e)}")
+            raise FingerprintError(f"Comparison failed: {str(e)}")
+    
+    def capture_sample(self) -> Tuple[bytes, Optional[int]]:
+        """
+        Capture an enrollment scan with the sensor's quality of its image.
+        
+        Returns:
+            Tuple[bytes, Optional[int]]: Template and image quality, None if
+            the sensor did not report one
+            
+        Raises:
+            FingerprintError: If capture fails
+        """
+        template = self.capture_template()
+        status = self.get_scanner_status()
+        return template, status.get('image_quality')
+    
     def get_scanner_status(self) -> dict:
         """
         Get current status of the fingerprint scanner.
@@ -222,6 +320,18 @@ class FingerprintScanner:
                 'error': str(e)
             }
     
+    def is_connected(self) -> bool:
+        """
+        Whether the serial port is still open and its device still present.
+        
+        A reset Arduino or re-enumerated USB port removes the device node
+        while the open handle lingers, so the node is checked as well.
+        """
+        serial = getattr(self, 'serial', None)
+        if serial is None or not serial.is_open:
+            return False
+        return not serial.port.startswith('/dev/') or os.path.exists(serial.port)
+    
     def clean_scanner(self) -> None:
         """
         Clean up scanner resources and close serial connection.
@@ -235,80 +345,294 @@ class FingerprintScanner:
 
 
 
-def record_attendance(employee: Employee) -> Tuple[Attendance, str]:
+def sensor_compare(scanner: FingerprintScanner) -> Optional[Compare]:
+    """The scanner's on-device match if FINGERPRINT_MATCHER['SENSOR_MATCH'] is on, else None"""
+    return scanner.compare_templates if settings.FINGERPRINT_MATCHER.get('SENSOR_MATCH', True) else None
+
+def _get_terminal(terminal: Optional[str]) -> str:
+    return terminal or settings.FINGERPRINT_SCANNER.get('TERMINAL', 'default')
+
+def get_candidate_employees(terminal: Optional[str] = None) -> List[int]:
+    """
+    Employees most likely to be punching at a terminal right now.
+    
+    Candidates checked in at this terminal within the last
+    CANDIDATE_LOOKBACK_DAYS at around the current time of day, most recent
+    first, followed by employees whose shift starts or ends around now. The
+    list is cached per terminal for CANDIDATE_CACHE_TTL seconds.
+    
+    Args:
+        terminal (str, optional): Terminal the probe was captured at
+        
+    Returns:
+        List[int]: Candidate employee primary keys
+    """
+    config = settings.FINGERPRINT_MATCHER
+    terminal = _get_terminal(terminal)
+    now = timezone.localtime()
+    window = datetime.timedelta(minutes=config.get('CANDIDATE_WINDOW_MINUTES', 90))
+    
+    # Bucket by window so the cached list follows the clock through the day
+    minute_of_day = now.hour * 60 + now.minute
+    bucket = minute_of_day // max(int(window.total_seconds() // 60), 1)
+    key = f'candidates:{terminal}:{bucket}'
+    candidates = cache.get(key)
+    if candidates is not None:
+        return candidates
+    
+    start = (now - window).time()
+    end = (now + window).time()
+    if start <= end:
+        time_filter = Q(check_in__time__range=(start, end))
+    else:
+        # Window wraps around midnight
+        time_filter = Q(check_in__time__gte=start) | Q(check_in__time__lte=end)
+    
+    recent = Attendance.objects.filter(
+        time_filter,
+        terminal=terminal,
+        date__gte=now.date() - datetime.timedelta(days=config.get('CANDIDATE_LOOKBACK_DAYS', 7)),
+        employee__is_active=True
+    ).values('employee').annotate(
+        last_check_in=Max('check_in')
+    ).order_by('-last_check_in').values_list('employee', flat=True)
+    
+    candidates = list(recent[:config.get('MAX_CANDIDATES', 2000)])
+    
+    # Employees whose shift starts or ends around now, wherever they punched before
+    seconds = now.hour * 3600 + now.minute * 60 + now.second
+    seen = set(candidates)
+    for employee_pk in get_schedule().employees_near(now.date(), seconds, window.total_seconds()):
+        if len(candidates) >= config.get('MAX_CANDIDATES', 2000):
+            break
+        if employee_pk not in seen:
+            candidates.append(employee_pk)
+    
+    cache.set(key, candidates, config.get('CANDIDATE_CACHE_TTL', 300))
+    return candidates
+
+def identify_employee(template: bytes, terminal: Optional[str] = None,
+                      compare: Optional[Compare] = None) -> Optional[Tuple[DirectoryEntry, float]]:
+    """
+    Identify the employee a probe template belongs to.
+    
+    Repeat scans at the same terminal within PROBE_CACHE_TTL seconds are
+    matched against the probes recently identified there, kept in the
+    matcher's in-process cache, before the gallery is searched; with
+    ``compare`` the sensor decides whether the probes match.
+    
+    Args:
+        template (bytes): Probe template from the scanner
+        terminal (str, optional): Terminal the probe was captured at
+        compare (Compare, optional): Sensor match used to decide the
+            match, see ``TemplateMatcher.identify``
+        
+    Returns:
+        Optional[Tuple[DirectoryEntry, float]]: Matched active employee, from
+        the in-memory directory, and match score, or None
+    """
+    matcher = get_matcher()
+    terminal = _get_terminal(terminal)
+    
+    match = None
+    for employee_pk, cached_template in matcher.probe_cache.recent(terminal):
+        if compare is not None:
+            score, threshold = compare(template, cached_template), matcher.sensor_threshold
+        else:
+            score, threshold = template_similarity(template, cached_template), matcher.threshold
+        if score >= threshold:
+            match = employee_pk, float(score)
+            break
+    
+    if match is None:
+        match = matcher.identify(template, candidates=get_candidate_employees(terminal), compare=compare)
+        if match is None:
+            return None
+        matcher.probe_cache.add(terminal, match[0], template)
+    
+    employee_pk, score = match
+    employee = lookup_employee(employee_pk)
+    if employee is None:
+        return None
+    return employee, score
+
+def find_duplicate_enrollment(template: bytes, template_hash: str, employee: Employee,
+                              compare: Optional[Compare] = None) -> Optional[Employee]:
+    """
+    Check whether a newly enrolled finger already belongs to another employee.
+    
+    An exact template hash match is checked first, then the template is
+    run through the same 1:N search used for punches. With ``compare``
+    that search tries every other enrolled template on the sensor, so a
+    finger enrolled at a different placement is still found.
+    
+    Args:
+        template (bytes): Template returned by the scanner
+        template_hash (str): SHA-256 of the template
+        employee (Employee): Employee being enrolled
+        compare (Compare, optional): Sensor match used to decide the match
+        
+    Returns:
+        Optional[Employee]: Employee already enrolled with this finger, or None
+    """
+    duplicate = Employee.objects.select_related('user').filter(
+        fingerprint_hash=template_hash
+    ).exclude(pk=employee.pk).first()
+    if duplicate:
+        return duplicate
+    
+    match = get_matcher().identify(template, exclude=employee.pk, compare=compare)
+    if match is None:
+        return None
+    return Employee.objects.select_related('user').filter(pk=match[0]).first()
+
+def record_attendance(employee: Union[Employee, DirectoryEntry], terminal: Optional[str] = None,
+                      score: Optional[float] = None) -> Tuple[Attendance, str]:
     """
     Record attendance for an employee with current timestamp.
     
+    The punch is appended to the event log and projected into attendance:
+    it closes the employee's open session if it started within
+    MAX_SESSION_HOURS, even on the previous calendar day, and otherwise
+    starts a new session. Heatmap rollups are refreshed after the
+    response, in the background. If the database is too busy to project
+    the punch once it is logged, it is reported as "recorded" and the
+    next projection applies it.
+    
     Args:
-        employee (Employee): Employee instance
+        employee (Employee or DirectoryEntry): Employee punching; only the pk is used
+        terminal (str, optional): Terminal the punch came from
+        score (float, optional): Match score of the identification
         
     Returns:
-        Tuple[Attendance, str]: Created/updated attendance record and status message
+        Tuple[Optional[Attendance], str]: Created/updated attendance record
+        and status "check_in", "check_out" or "duplicate", or None and
+        "recorded"
         
     Raises:
         Exception: If attendance recording fails
     """
     try:
         current_time = timezone.now()
-        current_date = current_time.date()
-        
-        # Try to get existing attendance record for today
-        attendance = Attendance.objects.filter(
-            employee=employee,
-            date=current_date
-        ).first()
-        
-        if not attendance:
-            # First scan of the day - Create check-in record
-            attendance = Attendance.objects.create(
-                employee=employee,
-                check_in=current_time,
-                date=current_date
-            )
-            return attendance, "check_in"
-            
-        elif not attendance.check_out:
-            # Second scan - Record check-out
-            attendance.check_out = current_time
-            attendance.save()
-            return attendance, "check_out"
-            
-        else:
-            # Already checked out
-            raise Exception("Employee has already checked out for today")
+        PunchEvent.objects.create(
+            employee_id=employee.pk,
+            timestamp=current_time,
+            terminal=_get_terminal(terminal),
+            score=score
+        )
+        changed = []
+        try:
+            project_events(defer=True, changed=changed)
+        except OperationalError as e:
+            # The event is committed, so the punch must not be reported as failed
+            logger.warning(f"Punch logged for {employee.employee_id}, projection deferred: {str(e)}")
+            return None, "recorded"
+        
+        attendance = next((
+            row for row in changed
+            if row.employee_id == employee.pk and current_time in (row.check_in, row.check_out)
+        ), None)
+        if attendance is None:
+            # Dropped by the projector as a double scan
+            attendance = Attendance.objects.filter(employee_id=employee.pk).order_by('-check_in').first()
+            return attendance, "duplicate"
+        
+        return attendance, "check_in" if attendance.check_in == current_time else "check_out"
             
     except Exception as e:
         logger.error(f"Failed to record attendance: {str(e)}")
         raise Exception(f"Attendance recording failed: {str(e)}")
 
+# Punches recorded in this process within PUNCH_DEDUP_SECONDS, by terminal
+# and employee pk. A repeat sent to another process is recorded as an event
+# and dropped by the projector as a double scan.
+_recent_punches: Dict[Tuple[str, int], Tuple[float, Optional[Attendance]]] = {}
+_recent_punches_lock = threading.Lock()
+
+def record_punch(employee: Union[Employee, DirectoryEntry], terminal: Optional[str] = None,
+                 score: Optional[float] = None) -> Tuple[Attendance, str]:
+    """
+    Record a punch, ignoring repeats from the same employee and terminal.
+    
+    A second scan within PUNCH_DEDUP_SECONDS returns the first punch's
+    attendance with status "duplicate" instead of checking the employee
+    straight back out.
+    
+    Args:
+        employee (Employee or DirectoryEntry): Identified employee
+        terminal (str, optional): Terminal the punch came from
+        score (float, optional): Match score of the identification
+        
+    Returns:
+        Tuple[Optional[Attendance], str]: Attendance record and "check_in",
+        "check_out" or "duplicate", or None and "recorded", see ``record_attendance``
+    """
+    terminal = _get_terminal(terminal)
+    window = settings.FINGERPRINT_MATCHER.get('PUNCH_DEDUP_SECONDS', 0)
+    if not window:
+        return record_attendance(employee, terminal, score)
+    
+    key = (terminal, employee.pk)
+    now = time.monotonic()
+    with _recent_punches_lock:
+        for stale in [stale for stale, (expires, _) in _recent_punches.items() if expires <= now]:
+            del _recent_punches[stale]
+        claimed = key not in _recent_punches
+        if claimed:
+            # Claimed before recording; a repeat arriving meanwhile falls through below
+            _recent_punches[key] = (now + window, None)
+        else:
+            recent = _recent_punches[key][1]
+    
+    if claimed:
+        try:
+            attendance, status = record_attendance(employee, terminal, score)
+        except Exception:
+            with _recent_punches_lock:
+                _recent_punches.pop(key, None)
+            raise
+        with _recent_punches_lock:
+            _recent_punches[key] = (now + window, attendance)
+        return attendance, status
+    
+    if recent is not None:
+        logger.info(f"Ignoring repeat punch for {employee.employee_id}")
+        return recent, "duplicate"
+    # The first scan is still being recorded; the projector drops the repeat
+    return record_attendance(employee, terminal, score)
+
 def verify_attendance(request):
     try:
         scanner = FingerprintScanner()
         
         # Get current fingerprint
-        scanner.wait_for_finger()
+        template = scanner.capture_template()
         
-        # Try to match with all employees
-        for employee in Employee.objects.filter(fingerprint_data__isnull=False):
-            if scanner.verify_fingerprint(employee.fingerprint_data):
-                # Record attendance
-                attendance, status = record_attendance(employee)
-                
-                if status == "check_in":
-                    messages.success(
-                        request, 
-                        f"Check-in recorded for {employee.get_full_name()} at {attendance.check_in.strftime('%H:%M:%S')}"
-                    )
-                else:
-                    duration = attendance.get_duration()
-                    messages.success(
-                        request, 
-                        f"Check-out recorded for {employee.get_full_name()} at {attendance.check_out.strftime('%H:%M:%S')}. "
-                        f"Duration: {duration}"
-                    )
-                return redirect('dashboard')
+        # Identify against the template pack
+        match = identify_employee(template, compare=sensor_compare(scanner))
+        if match is None:
+            messages.error(request, "No matching fingerprint found")
+            return redirect('dashboard')
         
-        messages.error(request, "No matching fingerprint found")
+        employee, score = match
+        attendance, status = record_punch(employee, score=score)
+        
+        if status == "duplicate":
+            messages.info(request, f"Attendance already recorded for {employee.get_full_name()}")
+        elif status == "recorded":
+            messages.success(request, f"Punch recorded for {employee.get_full_name()}")
+        elif status == "check_in":
+            messages.success(
+                request, 
+                f"Check-in recorded for {employee.get_full_name()} at {attendance.check_in.strftime('%H:%M:%S')}"
+            )
+        else:
+            duration = attendance.get_duration()
+            messages.success(
+                request, 
+                f"Check-out recorded for {employee.get_full_name()} at {attendance.check_out.strftime('%H:%M:%S')}. "
+                f"Duration: {duration}"
+            )
         return redirect('dashboard')
         
     except Exception as e:
@@ -331,26 +655,13 @@ def get_employee_attendance_summary(employee: Employee, start_date: date, end_da
     Returns:
         dict: Attendance summary statistics
     """
-    attendance_records = Attendance.objects.filter(
-        employee=employee,
-        date__range=[start_date, end_date]
-    )
-    
-    total_days = (end_date - start_date).days + 1
-    present_days = attendance_records.count()
-    
-    # Calculate total working hours
-    total_hours = timezone.timedelta()
-    for record in attendance_records:
-        if record.check_in and record.check_out:
-            total_hours += record.get_duration()
-    
+    summary = summarize_attendance(start_date, end_date, [employee.pk])[0]
     return {
-        'total_days': total_days,
-        'present_days': present_days,
-        'absent_days': total_days - present_days,
-        'total_hours': total_hours,
-        'attendance_percentage': (present_days / total_days) * 100 if total_days > 0 else 0
+        'total_days': summary['total_days'],
+        'present_days': summary['present_days'],
+        'absent_days': summary['absent_days'],
+        'total_hours': summary['worked'],
+        'attendance_percentage': summary['attendance_percentage']
     }
 
 def get_late_check_ins(employee: Employee, month: Optional[date] = None) -> List[Attendance]:
@@ -7,6 +7,7 @@ class SalaryConfigurationForm(forms.ModelForm):
     class Meta:
         model = SalaryConfiguration
         fields = [
+            'effective_from',
             'standard_work_start', 
             'standard_work_end', 
             'working_hours_per_day',
@@ -0,0 +1,234 @@
+# core/ingest.py
+import csv
+import datetime
+import json
+import logging
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Employee
+from core.projector import append_punch_events, project_events
+
+logger = logging.getLogger(__name__)
+
+
+class IngestError(Exception):
+    """Raised when a punch in a batch cannot be parsed"""
+    pass
+
+
+def load_employee_map() -> Dict[str, int]:
+    """Map every ``employee_id`` string to its primary key in one query."""
+    return dict(Employee.objects.values_list('employee_id', 'pk'))
+
+
+def _parse_timestamp(value) -> Optional[datetime.datetime]:
+    if isinstance(value, datetime.datetime):
+        return value
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return parse_datetime(value) if isinstance(value, str) else None
+
+
+def parse_punch(data: dict, employee_map: Optional[Dict[str, int]] = None) -> dict:
+    """
+    Validate a single punch from a terminal or import file.
+
+    Args:
+        data (dict): Punch with ``employee`` (pk) or ``employee_id`` (e.g.
+            EMP1234), ``timestamp`` (ISO 8601) and optional ``terminal`` and
+            match ``score``
+        employee_map (Dict[str, int], optional): Preloaded ``employee_id`` to pk
+            map, required for punches identified by ``employee_id``
+
+    Returns:
+        dict: Punch with an integer employee pk and an aware timestamp
+
+    Raises:
+        IngestError: If the punch is malformed or names an unknown employee
+    """
+    try:
+        if data.get('employee_id') and employee_map is not None:
+            employee = employee_map.get(data['employee_id'].strip())
+            if employee is None:
+                raise IngestError(f"Unknown employee {data['employee_id']!r}")
+        else:
+            employee = int(data['employee'])
+        timestamp = _parse_timestamp(data['timestamp'])
+    except (KeyError, TypeError, ValueError, AttributeError):
+        raise IngestError(f"Punch needs an employee and a timestamp: {data!r}")
+
+    if timestamp is None:
+        raise IngestError(f"Invalid timestamp in punch: {data!r}")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    try:
+        score = float(data['score']) if data.get('score') not in (None, '') else None
+    except (TypeError, ValueError):
+        raise IngestError(f"Invalid score in punch: {data!r}")
+
+    return {
+        'employee': employee,
+        'timestamp': timestamp,
+        'terminal': str(data.get('terminal') or '')[:50],
+        'score': score,
+    }
+
+
+def read_punch_stream(lines: Iterable[str], format: str) -> Iterator[dict]:
+    """
+    Parse raw punch rows from a CSV or JSONL stream.
+
+    CSV streams need a header row with ``employee_id`` (or ``employee``)
+    and ``timestamp`` columns; ``terminal`` is optional.
+
+    Args:
+        lines (Iterable[str]): Text lines of the stream
+        format (str): "csv" or "jsonl"
+
+    Returns:
+        Iterator[dict]: Raw punch rows for ``parse_punch``
+    """
+    if format == 'csv':
+        yield from csv.DictReader(lines)
+    elif format == 'jsonl':
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'invalid': line.strip()}
+    else:
+        raise IngestError(f"Unsupported punch format {format!r}")
+
+
+def ingest_punch_stream(rows: Iterable[dict], chunk_size: int = 50000,
+                        progress: Optional[Callable[[Dict[str, int]], None]] = None) -> Dict[str, int]:
+    """
+    Import a large punch stream in chunks.
+
+    Employee ids are resolved through a map loaded once up front, and each
+    chunk is appended to the event log by ``log_punches``. The whole
+    stream is then projected into attendance in one pass, so sessions
+    spanning chunks are paired once and each date's rollups are refreshed
+    once.
+
+    Args:
+        rows (Iterable[dict]): Raw punch rows
+        chunk_size (int): Punches per batch
+        progress (Callable, optional): Called with running totals after each
+            chunk and after the projection
+
+    Returns:
+        Dict[str, int]: Totals over the whole stream, including ``invalid``
+        rows and punches of ``unknown`` employees
+    """
+    employee_map = load_employee_map()
+    totals = {'read': 0, 'invalid': 0, 'created': 0, 'updated': 0, 'removed': 0, 'duplicates': 0, 'unknown': 0}
+    errors: List[str] = []
+    chunk = []
+
+    def flush():
+        for key, value in log_punches(chunk).items():
+            totals[key] += value
+        chunk.clear()
+        if progress:
+            progress(totals)
+
+    for row in rows:
+        totals['read'] += 1
+        try:
+            chunk.append(parse_punch(row, employee_map))
+        except IngestError as e:
+            totals['invalid'] += 1
+            if len(errors) < 100:
+                errors.append(f"Row {totals['read']}: {str(e)}")
+            continue
+
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+
+    projected = project_events()
+    for key in ('created', 'updated', 'removed'):
+        totals[key] += projected[key]
+    if progress:
+        progress(totals)
+
+    for error in errors:
+        logger.warning(error)
+    return totals
+
+
+def split_known_employees(punches: Iterable[dict]) -> Tuple[List[dict], List[dict]]:
+    """
+    Separate punches of existing employees from punches naming unknown pks.
+
+    A terminal's template pack can still hold an employee deleted since it
+    was built. Logging such a punch would fail the event log's foreign key
+    and take the rest of its batch down with it.
+
+    Args:
+        punches (Iterable[dict]): Punches as returned by ``parse_punch``
+
+    Returns:
+        Tuple[List[dict], List[dict]]: Punches of known employees and the rest
+    """
+    punches = list(punches)
+    known = set(Employee.objects.filter(
+        pk__in={punch['employee'] for punch in punches}
+    ).values_list('pk', flat=True))
+
+    valid, unknown = [], []
+    for punch in punches:
+        (valid if punch['employee'] in known else unknown).append(punch)
+    return valid, unknown
+
+
+def ingest_punches(punches: Iterable[dict]) -> Dict[str, int]:
+    """
+    Log a batch of punches and project them into attendance.
+
+    Punches are appended to the ``PunchEvent`` log, skipping any already
+    logged, so re-sending a batch is harmless. Punches of unknown employees
+    are dropped and counted. The projector then pairs the new events into
+    attendance sessions.
+
+    Args:
+        punches (Iterable[dict]): Punches as returned by ``parse_punch``
+
+    Returns:
+        Dict[str, int]: Counts of created, updated and removed attendance
+        rows, duplicate punches and punches of unknown employees
+    """
+    stats = log_punches(punches)
+    projected = project_events()
+
+    stats.update(created=projected['created'], updated=projected['updated'], removed=projected['removed'])
+    logger.debug(f"Ingested punches: {stats}")
+    return stats
+
+
+def log_punches(punches: Iterable[dict]) -> Dict[str, int]:
+    """
+    Append a batch of punches to the event log without projecting them.
+
+    Punches already logged are skipped and punches of unknown employees
+    are dropped, as in ``ingest_punches``.
+
+    Args:
+        punches (Iterable[dict]): Punches as returned by ``parse_punch``
+
+    Returns:
+        Dict[str, int]: Counts of ``duplicates`` and ``unknown`` punches
+    """
+    punches, unknown = split_known_employees(punches)
+    if unknown:
+        logger.warning(f"Dropped {len(unknown)} punches of unknown employees")
+    return {'duplicates': append_punch_events(punches), 'unknown': len(unknown)}
@@ -0,0 +1,131 @@
+# core/jobs.py
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, IntegrityError
+from django.utils import timezone
+
+from core.models import Employee, PayrollRun
+from core.payroll import SALARY_FIELDS, calculate_monthly_salaries, get_month_version
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.PAYROLL_JOBS.get('WORKERS', 1),
+                thread_name_prefix='payroll'
+            )
+        return _executor
+
+
+def start_payroll_run(month_date: datetime.date, force: bool = False) -> PayrollRun:
+    """
+    Return the payroll run for a month, queueing one if needed.
+
+    Runs are keyed on ``get_month_version``, so a completed run is reused
+    only while the month's configuration versions, shifts, attendance and
+    base salaries are unchanged; a new configuration version invalidates
+    just the months it covers. A run already in flight is returned for
+    progress polling. Runs left in flight by a worker that died are
+    restarted once they go stale.
+
+    Args:
+        month_date (date): Any day in the month
+        force (bool): Recalculate even if a snapshot exists
+
+    Returns:
+        PayrollRun: The month's run
+
+    Raises:
+        ValueError: If no salary configuration exists
+    """
+    month = month_date.replace(day=1)
+    config_version = get_month_version(month)
+    try:
+        run, created = PayrollRun.objects.get_or_create(month=month, config_version=config_version)
+    except IntegrityError:
+        run, created = PayrollRun.objects.get(month=month, config_version=config_version), False
+
+    stale_after = datetime.timedelta(seconds=settings.PAYROLL_JOBS.get('STALE_AFTER', 600))
+    stale = not run.is_finished and run.updated_at < timezone.now() - stale_after
+    if created or force or stale or run.status == PayrollRun.STATUS_FAILED:
+        if not created:
+            # Only one request gets to requeue the run
+            requeued = PayrollRun.objects.filter(pk=run.pk, updated_at=run.updated_at).update(
+                status=PayrollRun.STATUS_PENDING, progress=0, error='', updated_at=timezone.now()
+            )
+            if not requeued:
+                run.refresh_from_db()
+                return run
+            run.refresh_from_db()
+        _get_executor().submit(_execute_payroll_run, run.pk)
+
+    return run
+
+
+def _snapshot_row(salary) -> dict:
+    row = {field: str(getattr(salary, field)) for field in ['base_salary'] + SALARY_FIELDS}
+    row['total_deductions'] = str(salary.late_deductions + salary.early_leave_deductions)
+    row['employee_id'] = salary.employee.employee_id
+    row['name'] = salary.employee.get_full_name()
+    return row
+
+
+def _execute_payroll_run(run_pk: int) -> None:
+    close_old_connections()
+    try:
+        run = PayrollRun.objects.get(pk=run_pk)
+        employees = list(Employee.objects.filter(is_active=True).select_related('user'))
+        PayrollRun.objects.filter(pk=run_pk).update(
+            status=PayrollRun.STATUS_RUNNING, total=len(employees), updated_at=timezone.now()
+        )
+
+        chunk_size = settings.PAYROLL_JOBS.get('CHUNK_SIZE', 500)
+        snapshot = []
+        for start in range(0, len(employees), chunk_size):
+            chunk = employees[start:start + chunk_size]
+            snapshot.extend(_snapshot_row(salary) for salary in calculate_monthly_salaries(run.month, chunk))
+            PayrollRun.objects.filter(pk=run_pk).update(progress=len(snapshot), updated_at=timezone.now())
+
+        PayrollRun.objects.filter(pk=run_pk).update(
+            status=PayrollRun.STATUS_COMPLETED, snapshot=snapshot, progress=len(snapshot),
+            finished_at=timezone.now(), updated_at=timezone.now()
+        )
+        logger.info(f"Payroll run for {run.month:%Y-%m} completed for {len(snapshot)} employees")
+    except Exception as e:
+        logger.exception(f"Payroll run {run_pk} failed")
+        PayrollRun.objects.filter(pk=run_pk).update(
+            status=PayrollRun.STATUS_FAILED, error=str(e), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def snapshot_records(run: PayrollRun) -> List[dict]:
+    """
+    Report rows from a completed run's snapshot.
+
+    Returns:
+        List[dict]: Rows shaped like the live report's ``salary_records``
+    """
+    records = []
+    for row in run.snapshot:
+        salary = {field: Decimal(row[field]) for field in ['base_salary', 'total_deductions'] + SALARY_FIELDS}
+        records.append({
+            'employee': {'employee_id': row['employee_id'], 'get_full_name': row['name']},
+            'salary': salary,
+            'error': None,
+        })
+    return records
@@ -0,0 +1,33 @@
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
+from core.bulk import adjust_base_salaries
+from core.models import Employee
+
+class Command(BaseCommand):
+    help = 'Raise or lower base salaries by a percentage in one update per chunk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--percent', required=True,
+                          help='Change in percent, negative to lower (e.g. 3.5)')
+        parser.add_argument('--designation', default=None,
+                          help='Only adjust employees with this designation')
+        parser.add_argument('--include-inactive', action='store_true',
+                          help='Also adjust inactive employees')
+
+    def handle(self, *args, **options):
+        try:
+            percent = Decimal(options['percent'])
+        except InvalidOperation:
+            raise CommandError(f"Invalid percentage {options['percent']!r}")
+
+        employees = Employee.objects.all()
+        if not options['include_inactive']:
+            employees = employees.filter(is_active=True)
+        if options['designation']:
+            employees = employees.filter(designation=options['designation'])
+
+        try:
+            count = adjust_base_salaries(employees, percent)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Adjusted base salaries of {count} employees by {percent}%'))
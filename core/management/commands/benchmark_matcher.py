@@ -0,0 +1,55 @@
+import os
+import statistics
+import tempfile
+import time
+from django.core.management.base import BaseCommand
+from core.matcher import TemplateMatcher
+from core.template_pack import TEMPLATE_SIZE, write_template_pack
+
+class Command(BaseCommand):
+    help = 'Benchmark identification latency against gallery size and worker count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,50000',
+                          help='Comma separated gallery sizes')
+        parser.add_argument('--workers', default='1,2,4',
+                          help='Comma separated worker counts')
+        parser.add_argument('--repeat', type=int, default=20,
+                          help='Identifications per measurement')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        worker_counts = [int(count) for count in options['workers'].split(',')]
+        repeat = options['repeat']
+
+        self.stdout.write(f'{"templates":>10} {"workers":>8} {"no match ms":>12} {"match ms":>10}')
+
+        with tempfile.TemporaryDirectory() as directory:
+            for size in sizes:
+                path = os.path.join(directory, f'pack_{size}.bin')
+                templates = [os.urandom(TEMPLATE_SIZE) for _ in range(size)]
+                write_template_pack(path, enumerate(templates, start=1))
+
+                # Both rank the whole gallery; without a sensor an unknown finger is simply rejected
+                unknown = os.urandom(TEMPLATE_SIZE)
+                enrolled = templates[size * 3 // 4]
+
+                for workers in worker_counts:
+                    matcher = TemplateMatcher(pack_path=path, workers=workers, parallel_min=0)
+                    try:
+                        # Warm up the pool and the page cache
+                        matcher.identify(unknown)
+                        no_match = self._measure(matcher, unknown, repeat)
+                        match = self._measure(matcher, enrolled, repeat)
+                    finally:
+                        matcher.close()
+
+                    self.stdout.write(f'{size:>10} {workers:>8} {no_match:>12.2f} {match:>10.2f}')
+
+    def _measure(self, matcher, probe, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matcher.identify(probe)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
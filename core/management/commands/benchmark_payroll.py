@@ -0,0 +1,123 @@
+import datetime
+import random
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from core.models import Attendance, Employee, SalaryConfiguration, calculate_monthly_salary
+from core.payroll import calculate_monthly_salaries
+
+class Rollback(Exception):
+    pass
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorized payroll against the per-employee loop on synthetic attendance'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000,
+                          help='Attendance records to generate')
+        parser.add_argument('--days', type=int, default=25,
+                          help='Working days per employee in the month')
+
+    def handle(self, *args, **options):
+        # Everything is generated inside a transaction that is rolled back
+        try:
+            with transaction.atomic():
+                self._run(options['records'], options['days'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _reference_totals(self, employee, month, config):
+        """Per-record datetime.combine/Decimal arithmetic the vectorized path replaces"""
+        totals = [Decimal('0.00')] * 3
+        records = Attendance.objects.filter(employee=employee, date__year=month.year, date__month=month.month)
+        for record in records:
+            if not (record.check_in and record.check_out):
+                continue
+            check_in = record.check_in.time()
+            check_out = record.check_out.time()
+            start = datetime.datetime.combine(record.date, config.standard_work_start)
+            end = datetime.datetime.combine(record.date, config.standard_work_end)
+            if check_in > config.standard_work_start:
+                diff = datetime.datetime.combine(record.date, check_in) - start
+                totals[0] += Decimal(diff.total_seconds() / 3600).quantize(Decimal('0.01'))
+            if check_out < config.standard_work_end:
+                diff = end - datetime.datetime.combine(record.date, check_out)
+                totals[1] += Decimal(diff.total_seconds() / 3600).quantize(Decimal('0.01'))
+            if check_out > config.standard_work_end:
+                diff = datetime.datetime.combine(record.date, check_out) - end
+                totals[2] += Decimal(diff.total_seconds() / 3600).quantize(Decimal('0.01'))
+        return totals
+
+    def _run(self, record_count, days):
+        month = datetime.date(2000, 1, 1)
+        employee_count = max(record_count // days, 1)
+        random.seed(0)
+
+        SalaryConfiguration.objects.all().delete()
+        config = SalaryConfiguration.objects.create(
+            hourly_rate=10, late_deduction_rate=5, early_leave_deduction_rate=5, overtime_fixed_rate=15
+        )
+        config.refresh_from_db()
+        Employee.objects.update(is_active=False)
+
+        users = User.objects.bulk_create([
+            User(username=f'benchmark-{index}') for index in range(employee_count)
+        ])
+        employees = Employee.objects.bulk_create([
+            Employee(
+                user=user, employee_id=f'BENCH{index}', designation='Benchmark',
+                date_joined=month, base_salary=Decimal('3000.00'),
+                phone_number='', emergency_contact='', address=''
+            )
+            for index, user in enumerate(users)
+        ])
+
+        records = []
+        for employee in employees:
+            for day in range(1, days + 1):
+                date = month.replace(day=day)
+                midnight = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+                records.append(Attendance(
+                    employee=employee, date=date,
+                    check_in=midnight + datetime.timedelta(seconds=random.randint(8 * 3600, 10 * 3600)),
+                    check_out=midnight + datetime.timedelta(seconds=random.randint(16 * 3600, 18 * 3600)),
+                ))
+        Attendance.objects.bulk_create(records, batch_size=5000)
+        self.stdout.write(f'{len(records)} attendance records for {employee_count} employees')
+
+        started = time.perf_counter()
+        salaries = calculate_monthly_salaries(month, employees)
+        vector_time = time.perf_counter() - started
+        self.stdout.write(f'calculate_monthly_salaries: {vector_time:.2f}s')
+
+        started = time.perf_counter()
+        for employee in employees:
+            calculate_monthly_salary(employee, month)
+        loop_time = time.perf_counter() - started
+        self.stdout.write(f'calculate_monthly_salary loop: {loop_time:.2f}s')
+
+        started = time.perf_counter()
+        sample = employees[:200]
+        reference = {employee.pk: self._reference_totals(employee, month, config) for employee in sample}
+        reference_time = (time.perf_counter() - started) * len(employees) / len(sample)
+        self.stdout.write(f'per-record Decimal loop (extrapolated): {reference_time:.2f}s')
+
+        mismatches = 0
+        for salary in salaries:
+            expected = reference.get(salary.employee_id)
+            if expected and expected != [
+                salary.total_late_hours, salary.total_early_leave_hours, salary.total_overtime_hours
+            ]:
+                mismatches += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Speedup {loop_time / vector_time:.1f}x over calculate_monthly_salary, '
+                f'{reference_time / vector_time:.1f}x over the per-record arithmetic; '
+                f'{mismatches} of {len(reference)} sampled employees differ'
+            )
+        )
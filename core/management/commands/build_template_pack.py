@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.template_pack import TemplatePack, TemplatePackError, build_template_pack, get_pack_path
+
+class Command(BaseCommand):
+    help = 'Compile all enrolled fingerprint templates into a memory-mapped template pack'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None,
+                          help='Pack file to write (defaults to FINGERPRINT_MATCHER["TEMPLATE_PACK"])')
+        parser.add_argument('--verify', action='store_true',
+                          help='Verify an existing pack against its content hash instead of rebuilding')
+
+    def handle(self, *args, **options):
+        path = options['output'] or get_pack_path()
+
+        if options['verify']:
+            try:
+                pack = TemplatePack.open(path)
+            except TemplatePackError as e:
+                raise CommandError(str(e))
+
+            if not pack.verify():
+                raise CommandError(f'Template pack {path} does not match its content hash')
+
+            self.stdout.write(
+                self.style.SUCCESS(f'{path}: {len(pack)} templates, hash {pack.content_hash}')
+            )
+            return
+
+        started = time.perf_counter()
+        count = build_template_pack(path)
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pack = TemplatePack.open(path)
+        pack.index
+        load_time = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Packed {count} templates into {path} in {elapsed:.2f}s '
+                f'(load + index: {load_time * 1000:.1f}ms, hash {pack.content_hash})'
+            )
+        )
@@ -0,0 +1,22 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.bulk import close_payroll_month
+
+class Command(BaseCommand):
+    help = 'Calculate outstanding salaries for a month and close it against recalculation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', required=True,
+                          help='Month to close (YYYY-MM)')
+
+    def handle(self, *args, **options):
+        try:
+            month = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f"Invalid month {options['month']!r}, expected YYYY-MM")
+
+        try:
+            closed = close_payroll_month(month)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'Closed {closed} salaries for {month:%Y-%m}'))
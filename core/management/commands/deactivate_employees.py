@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.bulk import deactivate_employees
+from core.models import Employee
+
+class Command(BaseCommand):
+    help = 'Deactivate employees in bulk without saving them one by one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('employee_ids', nargs='*',
+                          help='Employee IDs to deactivate (e.g. EMP0001)')
+        parser.add_argument('--designation', default=None,
+                          help='Deactivate every employee with this designation')
+
+    def handle(self, *args, **options):
+        if not options['employee_ids'] and not options['designation']:
+            raise CommandError('Give employee IDs or --designation')
+
+        employees = Employee.objects.all()
+        if options['employee_ids']:
+            employees = employees.filter(employee_id__in=options['employee_ids'])
+            missing = set(options['employee_ids']) - set(employees.values_list('employee_id', flat=True))
+            if missing:
+                raise CommandError(f"Unknown employee IDs: {', '.join(sorted(missing))}")
+        if options['designation']:
+            employees = employees.filter(designation=options['designation'])
+
+        count = deactivate_employees(employees)
+        self.stdout.write(self.style.SUCCESS(f'Deactivated {count} employees'))
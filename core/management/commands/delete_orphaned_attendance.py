@@ -0,0 +1,29 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.bulk import delete_attendance, orphaned_attendance
+
+class Command(BaseCommand):
+    help = 'Delete attendance rows that no punch event backs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default=None,
+                          help='First attendance date to check (YYYY-MM-DD)')
+        parser.add_argument('--end', default=None,
+                          help='Last attendance date to check (YYYY-MM-DD)')
+        parser.add_argument('--dry-run', action='store_true',
+                          help='Only count the orphaned rows')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else None
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        records = orphaned_attendance(start, end)
+        if options['dry_run']:
+            self.stdout.write(f'{records.count()} orphaned attendance records')
+            return
+
+        deleted = delete_attendance(records)
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} orphaned attendance records'))
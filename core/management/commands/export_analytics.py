@@ -0,0 +1,48 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from core.analytics import export_month
+from core.models import Attendance
+
+class Command(BaseCommand):
+    help = 'Export attendance into monthly columnar partitions for analytics (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', default=None,
+                          help='First month to export (YYYY-MM, default: last month)')
+        parser.add_argument('--all', action='store_true',
+                          help='Export every month with attendance')
+        parser.add_argument('--store', default=None,
+                          help='Store directory (default: ANALYTICS["STORE"])')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        end = today.replace(day=1)
+        if options['all']:
+            bounds = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+            if bounds['first'] is None:
+                self.stdout.write('No attendance to export')
+                return
+            start, end = bounds['first'].replace(day=1), max(bounds['last'].replace(day=1), end)
+        elif options['since']:
+            try:
+                start = datetime.datetime.strptime(options['since'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f"Invalid month {options['since']!r}, expected YYYY-MM")
+        else:
+            # Last month still changes while late punches and corrections arrive
+            start = (end - datetime.timedelta(days=1)).replace(day=1)
+
+        started = time.perf_counter()
+        month, months, records = start, 0, 0
+        while month <= end:
+            records += export_month(month, options['store'])
+            months += 1
+            month = (month + datetime.timedelta(days=32)).replace(day=1)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Exported {records} attendance records in {months} months in {elapsed:.2f}s')
+        )
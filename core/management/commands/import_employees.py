@@ -0,0 +1,55 @@
+import csv
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.employee_import import IMPORT_CHUNK_SIZE, EmployeeImportError, import_employees, read_employee_csv
+
+class Command(BaseCommand):
+    help = 'Create employees and their users in bulk from a CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, or - for standard input')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                          help='Rows per INSERT')
+        parser.add_argument('--dry-run', action='store_true',
+                          help='Validate the file without creating anything')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        started = time.perf_counter()
+
+        handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8-sig')
+        try:
+            result = import_employees(
+                read_employee_csv(handle),
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run']
+            )
+        except (EmployeeImportError, OSError, UnicodeDecodeError, csv.Error) as e:
+            raise CommandError(str(e))
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+        for error in result['errors']:
+            messages = '; '.join(
+                f"{field}: {' '.join(field_messages)}" for field, field_messages in error['errors'].items()
+            )
+            self.stderr.write(f"Line {error['line']} ({error['employee_id'] or 'no id'}): {messages}")
+
+        elapsed = time.perf_counter() - started
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Checked {result['read']} rows in {elapsed:.2f}s: {result['valid']} valid, "
+                    f"{result['invalid']} invalid"
+                )
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['created']} of {result['read']} employees in {elapsed:.2f}s "
+                f"({result['read'] / max(elapsed, 1e-6):,.0f} rows/s), {result['invalid']} invalid"
+            )
+        )
@@ -0,0 +1,50 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.ingest import IngestError, ingest_punch_stream, read_punch_stream
+
+class Command(BaseCommand):
+    help = 'Import historical or third-party punches from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Punch file, or - for standard input')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                          help='Input format (default: from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                          help='Punches written per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        started = time.perf_counter()
+
+        def progress(totals):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"{totals['read']} punches read, {totals['created']} attendance rows created, "
+                f"{totals['updated']} updated, {totals['invalid']} invalid "
+                f"({totals['read'] / elapsed:,.0f} punches/s)"
+            )
+
+        handle = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            totals = ingest_punch_stream(
+                read_punch_stream(handle, format),
+                chunk_size=options['chunk_size'],
+                progress=progress
+            )
+        except (IngestError, OSError) as e:
+            raise CommandError(str(e))
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {totals['read']} punches in {elapsed:.2f}s: {totals['created']} attendance rows created, "
+                f"{totals['updated']} updated, {totals['removed']} merged away, "
+                f"{totals['duplicates']} duplicates, {totals['invalid']} invalid, "
+                f"{totals['unknown']} of unknown employees"
+            )
+        )
@@ -0,0 +1,40 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.projector import project_events, rebuild_attendance
+
+class Command(BaseCommand):
+    help = 'Apply new punch events to attendance, or rebuild attendance from the event log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                          help='Delete derived attendance and replay the event log')
+        parser.add_argument('--since', default=None,
+                          help='With --rebuild, only rebuild attendance from this date (YYYY-MM-DD)')
+        parser.add_argument('--batch-size', type=int, default=50000,
+                          help='Events applied per transaction')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            if not options['rebuild']:
+                raise CommandError('--since needs --rebuild')
+            try:
+                since = datetime.date.fromisoformat(options['since'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        started = time.perf_counter()
+        if options['rebuild']:
+            totals = rebuild_attendance(since, options['batch_size'])
+        else:
+            totals = project_events(options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Applied {totals['events']} punch events in {elapsed:.2f}s "
+                f"({totals['events'] / max(elapsed, 1e-9):,.0f} events/s): {totals['created']} sessions created, "
+                f"{totals['updated']} updated, {totals['removed']} removed"
+            )
+        )
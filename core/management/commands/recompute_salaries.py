@@ -0,0 +1,139 @@
+import datetime
+import json
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from core.models import Employee, EmployeeSalary, PayrollRun, SalaryConfiguration
+from core.payroll import calculate_monthly_salaries, get_config_version
+
+def _recompute_chunk(month, employee_pks):
+    """Recompute one month for a chunk of employees in a worker process"""
+    employees = list(Employee.objects.filter(pk__in=employee_pks))
+    return len(calculate_monthly_salaries(month, employees))
+
+def _parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month {value!r}, expected YYYY-MM')
+
+class Command(BaseCommand):
+    help = 'Recompute stored salaries for a range of months across a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True,
+                          help='First month to recompute (YYYY-MM)')
+        parser.add_argument('--end', default=None,
+                          help='Last month to recompute (YYYY-MM, default: current month)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                          help='Worker processes')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                          help='Employees recomputed per task')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / 'recompute_salaries.checkpoint.json'),
+                          help='File recording finished tasks so an interrupted run can resume')
+        parser.add_argument('--fresh', action='store_true',
+                          help='Ignore an existing checkpoint and recompute everything')
+
+    def handle(self, *args, **options):
+        start = _parse_month(options['start'])
+        end = _parse_month(options['end']) if options['end'] else timezone.localdate().replace(day=1)
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        configs = SalaryConfiguration.objects.index(recheck=True)
+        if not configs:
+            raise CommandError('Salary configuration not found')
+
+        # Only months and employees that already have open salary rows are recomputed
+        by_month = defaultdict(list)
+        for month, employee_pk in EmployeeSalary.objects.filter(
+            month__range=(start, end), closed_at__isnull=True
+        ).order_by('month', 'employee_id').values_list('month', 'employee_id'):
+            by_month[month].append(employee_pk)
+
+        chunk_size = options['chunk_size']
+        tasks = {}
+        for month, employee_pks in by_month.items():
+            for index in range(0, len(employee_pks), chunk_size):
+                chunk = employee_pks[index:index + chunk_size]
+                tasks[f'{month:%Y-%m}:{chunk[0]}-{chunk[-1]}'] = (month, chunk)
+
+        checkpoint_path = options['checkpoint']
+        run_key = {'start': f'{start:%Y-%m}', 'end': f'{end:%Y-%m}', 'config_version': get_config_version(configs.versions)}
+        done = set()
+        if not options['fresh'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as handle:
+                checkpoint = json.load(handle)
+            if checkpoint.get('run') == run_key:
+                done = set(checkpoint['done']) & set(tasks)
+                self.stdout.write(f'Resuming: {len(done)} of {len(tasks)} tasks already finished')
+            else:
+                self.stdout.write('Checkpoint is for a different run, starting over')
+
+        def save_checkpoint():
+            tmp_path = f'{checkpoint_path}.tmp'
+            with open(tmp_path, 'w') as handle:
+                json.dump({'run': run_key, 'done': sorted(done)}, handle)
+            os.replace(tmp_path, checkpoint_path)
+
+        pending = {key: task for key, task in tasks.items() if key not in done}
+        total_rows = sum(len(chunk) for _, chunk in pending.values())
+        self.stdout.write(
+            f'Recomputing {total_rows} salaries in {len(pending)} tasks over {len(by_month)} months '
+            f'with {options["workers"]} workers'
+        )
+
+        started = time.perf_counter()
+        recomputed = 0
+        failed = []
+
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('fork')
+        ) as executor:
+            futures = {
+                executor.submit(_recompute_chunk, month, chunk): key
+                for key, (month, chunk) in pending.items()
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    recomputed += future.result()
+                except Exception as e:
+                    failed.append(key)
+                    self.stderr.write(f'Task {key} failed: {str(e)}')
+                    continue
+
+                done.add(key)
+                save_checkpoint()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{recomputed}/{total_rows} salaries recomputed ({recomputed / elapsed:,.0f} salaries/s)'
+                )
+
+        elapsed = time.perf_counter() - started
+        if failed:
+            raise CommandError(
+                f'{len(failed)} tasks failed after recomputing {recomputed} salaries; '
+                f'run the command again to resume from {checkpoint_path}'
+            )
+
+        if os.path.exists(checkpoint_path):
+            os.unlink(checkpoint_path)
+        # Stored report snapshots for these months are out of date
+        PayrollRun.objects.filter(month__range=(start, end)).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recomputed {recomputed} salaries over {len(by_month)} months in {elapsed:.2f}s '
+                f'({recomputed / max(elapsed, 1e-9):,.0f} salaries/s)'
+            )
+        )
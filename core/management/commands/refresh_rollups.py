@@ -0,0 +1,31 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.rollups import refresh_rollups
+
+class Command(BaseCommand):
+    help = 'Recompute the daily attendance rollups and monthly bitmaps behind the heatmap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True,
+                          help='First attendance date to recompute (YYYY-MM-DD)')
+        parser.add_argument('--end', default=None,
+                          help='Last attendance date to recompute (YYYY-MM-DD, default: today)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start'])
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+        except ValueError as e:
+            raise CommandError(str(e))
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        started = time.perf_counter()
+        stats = refresh_rollups(start, end)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Recomputed {stats['days']} days and {stats['bitmaps']} bitmaps in {elapsed:.2f}s")
+        )
@@ -0,0 +1,36 @@
+import datetime
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.pairing import repair_attendance
+
+class Command(BaseCommand):
+    help = 'Re-pair stored punches into sessions, merging night shifts split at midnight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True,
+                          help='First attendance date to repair (YYYY-MM-DD)')
+        parser.add_argument('--end', default=None,
+                          help='Last attendance date to repair (YYYY-MM-DD, default: today)')
+        parser.add_argument('--employee', type=int, action='append', default=None,
+                          help='Only repair this employee pk (repeatable)')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start'])
+            end = datetime.date.fromisoformat(options['end']) if options['end'] else timezone.localdate()
+        except ValueError as e:
+            raise CommandError(str(e))
+        if start > end:
+            raise CommandError('--start must not be after --end')
+
+        started = time.perf_counter()
+        stats = repair_attendance(start, end, options['employee'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Repaired {stats['employees']} employees in {elapsed:.2f}s: {stats['created']} sessions created, "
+                f"{stats['updated']} updated, {stats['removed']} merged away"
+            )
+        )
@@ -0,0 +1,109 @@
+import time
+import uuid
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from core.fingerprint_utils import FingerprintError, sensor_compare
+from core.matcher import TemplateMatcher
+from core.punch_journal import PunchJournal
+from core.scanner_health import ScannerMonitor, ScannerUnavailable, get_health_path
+from core.template_pack import TemplatePack, TemplatePackError
+from core.terminal import TerminalSync
+
+class Command(BaseCommand):
+    help = 'Run a door terminal: identify punches locally, journal them and sync with the server'
+
+    def add_arguments(self, parser):
+        sync = settings.ATTENDANCE_SYNC
+        parser.add_argument('--server', default=sync['SERVER_URL'],
+                          help='Base URL of the attendance server')
+        parser.add_argument('--terminal', default=settings.FINGERPRINT_SCANNER.get('TERMINAL', 'default'),
+                          help='Name recorded with every punch from this terminal')
+        parser.add_argument('--journal', default=str(sync['JOURNAL']),
+                          help='Local punch journal')
+        parser.add_argument('--pack', default=str(sync['PACK_CACHE']),
+                          help='Local copy of the template pack')
+
+    def handle(self, *args, **options):
+        token = settings.ATTENDANCE_SYNC.get('TOKEN')
+        if not token:
+            raise CommandError('ATTENDANCE_SYNC["TOKEN"] must be set to run a terminal')
+
+        terminal = options['terminal']
+        journal = PunchJournal(options['journal'])
+        sync = TerminalSync(
+            options['server'], token, journal, options['pack'],
+            batch_size=settings.ATTENDANCE_SYNC.get('BATCH_SIZE', 500)
+        )
+
+        sync.refresh_pack()
+        try:
+            TemplatePack.open(options['pack'])
+        except TemplatePackError as e:
+            raise CommandError(f'No template pack available: {str(e)}')
+
+        matcher = TemplateMatcher(pack_path=options['pack'])
+        scanner_config = settings.FINGERPRINT_SCANNER
+        # The monitor reconnects in the background, so a missing scanner only delays punching
+        monitor = ScannerMonitor(
+            interval=scanner_config.get('HEALTH_INTERVAL', 5),
+            failure_limit=scanner_config.get('HEALTH_FAILURES', 3),
+            backoff_max=scanner_config.get('RECONNECT_BACKOFF_MAX', 30),
+            health_path=get_health_path()
+        )
+        if not monitor.start():
+            self.stdout.write(self.style.WARNING(f'Scanner not connected yet: {monitor.health()["last_error"]}'))
+
+        dedup_seconds = settings.FINGERPRINT_MATCHER.get('PUNCH_DEDUP_SECONDS', 0)
+        sync_interval = settings.ATTENDANCE_SYNC.get('SYNC_INTERVAL', 30)
+        last_punch = {}
+        last_sync = 0.0
+
+        self.stdout.write(f'Terminal {terminal} running, {journal.pending_count()} punches waiting to sync')
+
+        try:
+            while True:
+                punched = False
+                template = match = None
+                try:
+                    with monitor.session() as scanner:
+                        template = scanner.capture_template()
+                        # The sensor confirms the best candidates of the pack search
+                        match = matcher.identify(template, compare=sensor_compare(scanner))
+                except ScannerUnavailable:
+                    # Keep syncing while the monitor reconnects
+                    monitor.wait_connected(timeout=sync_interval)
+                except FingerprintError:
+                    # No finger before the read timed out
+                    pass
+
+                if template:
+                    if match is None:
+                        self.stdout.write(self.style.ERROR('No matching fingerprint found'))
+                    else:
+                        employee_pk, score = match
+                        now = time.monotonic()
+                        if now - last_punch.get(employee_pk, -dedup_seconds) < dedup_seconds:
+                            self.stdout.write(f'Repeat punch for employee {employee_pk} ignored')
+                        else:
+                            last_punch[employee_pk] = now
+                            journal.append({
+                                'id': uuid.uuid4().hex,
+                                'employee': employee_pk,
+                                'timestamp': timezone.now().isoformat(),
+                                'terminal': terminal,
+                                'score': round(score, 4),
+                            })
+                            punched = True
+                            self.stdout.write(self.style.SUCCESS(f'Punch recorded for employee {employee_pk}'))
+
+                if punched or time.monotonic() - last_sync >= sync_interval:
+                    last_sync = time.monotonic()
+                    sync.push()
+                    if sync.online and not punched:
+                        sync.refresh_pack()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping terminal')
+        finally:
+            monitor.stop()
+            matcher.close()
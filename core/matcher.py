@@ -0,0 +1,302 @@
+# core/matcher.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from core.template_pack import TEMPLATE_SIZE, TemplatePack, TemplatePackError, get_pack_path
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block while ranking
+BLOCK_SIZE = 1024
+
+# Number of set bits for every byte value
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint16)
+
+
+def _probe_array(probe: bytes) -> np.ndarray:
+    """Zero-pad a probe template to the pack's record width."""
+    array = np.zeros(TEMPLATE_SIZE, dtype=np.uint8)
+    data = np.frombuffer(bytes(probe)[:TEMPLATE_SIZE], dtype=np.uint8)
+    array[:len(data)] = data
+    return array
+
+
+def score_templates(probe: np.ndarray, templates: np.ndarray) -> np.ndarray:
+    """
+    Score a probe against a block of templates by bit agreement.
+
+    Character files encode minutiae relative to where the finger lay on
+    the sensor, so a shifted or rotated placement of the same finger can
+    score low here. The score is only good for ordering the gallery; a
+    match is decided by the sensor's own matcher (see
+    ``TemplateMatcher.identify``).
+
+    Args:
+        probe (np.ndarray): Padded probe template
+        templates (np.ndarray): (n, TEMPLATE_SIZE) uint8 template block
+
+    Returns:
+        np.ndarray: Similarity per template, 1.0 for identical templates
+    """
+    distance = POPCOUNT[np.bitwise_xor(templates, probe)].sum(axis=1, dtype=np.uint32)
+    return 1.0 - distance / float(TEMPLATE_SIZE * 8)
+
+
+def template_similarity(first: bytes, second: bytes) -> float:
+    """Similarity of two templates on the same scale as identification scores."""
+    return float(score_templates(_probe_array(first), _probe_array(second)[np.newaxis, :])[0])
+
+
+def rank_rows(templates: np.ndarray, probe: np.ndarray, start: int, stop: int,
+              exclude_row: int = -1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Order templates[start:stop] by score, best first.
+
+    Rows are scored a block at a time so the XOR temporaries stay small.
+    ``exclude_row`` is never returned.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Rows and their scores
+    """
+    rows = np.arange(start, stop, dtype=np.intp)
+    scores = np.empty(len(rows))
+    for block_start in range(start, stop, BLOCK_SIZE):
+        block_stop = min(block_start + BLOCK_SIZE, stop)
+        scores[block_start - start:block_stop - start] = score_templates(probe, templates[block_start:block_stop])
+
+    if start <= exclude_row < stop:
+        keep = rows != exclude_row
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(-scores, kind='stable')
+    return rows[order], scores[order]
+
+
+# Per-process state for pool workers
+_worker_packs: Dict[str, Tuple[bytes, TemplatePack]] = {}
+
+
+def _worker_pack(path: str, digest: bytes) -> TemplatePack:
+    """Map the pack once per worker and remap only when its content changes."""
+    cached = _worker_packs.get(path)
+    if cached is None or cached[0] != digest:
+        pack = TemplatePack.open(path)
+        _worker_packs[path] = (pack.digest, pack)
+        return pack
+    return cached[1]
+
+
+def _rank_shard(path: str, digest: bytes, probe: bytes, start: int, stop: int,
+                exclude_row: int) -> Tuple[np.ndarray, np.ndarray]:
+    pack = _worker_pack(path, digest)
+    return rank_rows(pack.templates, _probe_array(probe), start, min(stop, len(pack)), exclude_row)
+
+
+# Scores a probe against a stored template on the sensor, such as
+# FingerprintScanner.compare_templates
+Compare = Callable[[bytes, bytes], float]
+
+
+class ProbeCache:
+    """
+    Probes identified recently at each terminal, kept in process memory.
+
+    A repeat scan is matched against these probes before the gallery is
+    searched. Entries expire after ``ttl`` seconds and the oldest are
+    evicted beyond ``max_entries``. Each process keeps its own cache, so a
+    repeat scan served by another worker just takes the full search.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple[str, int], Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recent(self, terminal: str) -> List[Tuple[int, bytes]]:
+        """Employee pks and probes identified at a terminal within ``ttl``, newest first."""
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+                del self._entries[key]
+            return [
+                (employee_pk, probe) for (entry_terminal, employee_pk), (_, probe) in reversed(self._entries.items())
+                if entry_terminal == terminal
+            ]
+
+    def add(self, terminal: str, employee_pk: int, probe: bytes) -> None:
+        """Remember the latest probe an employee was identified by at a terminal."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop((terminal, employee_pk), None)
+            self._entries[(terminal, employee_pk)] = (time.monotonic() + self.ttl, probe)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class TemplateMatcher:
+    """
+    1:N identification against the template pack.
+
+    Large galleries are split into shards ranked by a process pool. Workers
+    map the same pack file, so the template array lives once in the page
+    cache and is shared by every process instead of being copied to each.
+    """
+
+    def __init__(self, pack_path: Optional[str] = None, workers: Optional[int] = None,
+                 threshold: Optional[float] = None, parallel_min: Optional[int] = None,
+                 sensor_threshold: Optional[float] = None, confirm_batch_size: Optional[int] = None):
+        config = settings.FINGERPRINT_MATCHER
+        self.pack_path = str(pack_path or get_pack_path())
+        self.workers = workers or config.get('WORKERS') or os.cpu_count() or 1
+        self.threshold = threshold if threshold is not None else config.get('ACCEPT_THRESHOLD', 0.85)
+        self.parallel_min = parallel_min if parallel_min is not None else config.get('PARALLEL_MIN_TEMPLATES', 4096)
+        self.sensor_threshold = (
+            sensor_threshold if sensor_threshold is not None else config.get('SENSOR_ACCEPT_SCORE', 50)
+        )
+        self.confirm_batch_size = confirm_batch_size or config.get('CONFIRM_BATCH_SIZE', 64)
+        self.probe_cache = ProbeCache(config.get('PROBE_CACHE_TTL', 0), config.get('PROBE_CACHE_SIZE', 256))
+
+        self._pack: Optional[TemplatePack] = None
+        self._pack_stat = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def pack(self) -> TemplatePack:
+        """
+        The current pack, remapped whenever the file has been rewritten or appended to.
+
+        Raises:
+            TemplatePackError: If the pack is missing or invalid
+        """
+        try:
+            stat = os.stat(self.pack_path)
+        except FileNotFoundError:
+            raise TemplatePackError(f"Template pack not found at {self.pack_path}")
+        stat_key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if self._pack is None or stat_key != self._pack_stat:
+            self._pack = TemplatePack.open(self.pack_path)
+            self._pack_stat = stat_key
+        return self._pack
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._pool
+
+    def identify(self, probe: bytes, exclude: Optional[int] = None, candidates: Optional[List[int]] = None,
+                 compare: Optional[Compare] = None) -> Optional[Tuple[int, float]]:
+        """
+        Identify a probe template against every packed template.
+
+        The gallery is ranked by bit agreement with ``candidates`` first.
+        With ``compare`` the sensor decides: templates are compared on the
+        sensor in ranked order, a batch at a time, until one reaches
+        ``sensor_threshold``. The ranking only decides how soon a match is
+        found, so a shifted placement that scores poorly bit by bit is
+        still compared and recognised. Without ``compare`` the best
+        candidate, then the best gallery template, must reach
+        ``threshold``, which misses shifted placements and only suits
+        benchmarks and tests.
+
+        Args:
+            probe (bytes): Template captured by the scanner
+            exclude (int, optional): Employee pk whose template is skipped
+            candidates (List[int], optional): Employee pks likely to match
+            compare (Compare, optional): Sensor match of the probe against a stored template
+
+        Returns:
+            Optional[Tuple[int, float]]: Matched employee pk and score, the
+            sensor's score with ``compare``, or None
+
+        Raises:
+            TemplatePackError: If the pack is missing or invalid
+        """
+        with self._lock:
+            pack = self.pack
+            if not len(pack):
+                return None
+            exclude_row = pack.index.get(exclude, -1) if exclude is not None else -1
+            rows, scores = self._rank(pack, probe, candidates or [], exclude_row)
+
+        if compare is None:
+            accepted = np.flatnonzero(scores >= self.threshold)
+            if not accepted.size:
+                return None
+            return int(pack.employees[rows[accepted[0]]]), float(scores[accepted[0]])
+
+        # Sensor round trips happen outside the lock; the mapped pack stays
+        # valid for this search even if the file is replaced meanwhile
+        for batch_start in range(0, len(rows), self.confirm_batch_size):
+            records = pack.records[rows[batch_start:batch_start + self.confirm_batch_size]]
+            for record in records:
+                score = compare(probe, record['template'][:record['length']].tobytes())
+                if score >= self.sensor_threshold:
+                    return int(record['employee']), float(score)
+        return None
+
+    def _rank(self, pack: TemplatePack, probe: bytes, candidates: List[int],
+              exclude_row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Rank candidate rows, then the rest of the gallery, each best first."""
+        if self.workers > 1 and len(pack) >= self.parallel_min:
+            rows, scores = self._rank_parallel(pack, probe, exclude_row)
+        else:
+            rows, scores = rank_rows(pack.templates, _probe_array(probe), 0, len(pack), exclude_row)
+
+        index = pack.index
+        candidate_rows = [index[pk] for pk in candidates if pk in index]
+        if not candidate_rows:
+            return rows, scores
+
+        # Rows stay in score order within each group
+        first = np.isin(rows, candidate_rows)
+        order = np.concatenate([np.flatnonzero(first), np.flatnonzero(~first)])
+        return rows[order], scores[order]
+
+    def _rank_parallel(self, pack: TemplatePack, probe: bytes,
+                       exclude_row: int) -> Tuple[np.ndarray, np.ndarray]:
+        pool = self._get_pool()
+
+        # More shards than workers keeps cores busy while stragglers finish
+        shard_size = -(-len(pack) // (self.workers * 4))
+        futures = [
+            pool.submit(_rank_shard, pack.path, pack.digest, probe, start, start + shard_size, exclude_row)
+            for start in range(0, len(pack), shard_size)
+        ]
+        shards = [future.result() for future in futures]
+        rows = np.concatenate([shard_rows for shard_rows, _ in shards])
+        scores = np.concatenate([shard_scores for _, shard_scores in shards])
+        order = np.argsort(-scores, kind='stable')
+        return rows[order], scores[order]
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+_matcher: Optional[TemplateMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher() -> TemplateMatcher:
+    """Return the process-wide matcher, creating it on first use."""
+    global _matcher
+    with _matcher_lock:
+        if _matcher is None:
+            _matcher = TemplateMatcher()
+        return _matcher
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 05:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_employeesalary_final_salary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='fingerprint_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_employee_fingerprint_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendance',
+            name='terminal',
+            field=models.CharField(blank=True, help_text='Terminal the check-in was recorded at', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['terminal', 'date'], name='core_attend_termina_41c482_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_payrollrun'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employeesalary',
+            index=models.Index(fields=['month', 'employee'], name='core_employ_month_3dcfe8_idx'),
+        ),
+    ]
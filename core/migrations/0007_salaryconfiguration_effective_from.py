@@ -0,0 +1,52 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:12
+
+import datetime
+from django.db import migrations, models
+
+
+BASELINE_EFFECTIVE_FROM = datetime.date(2000, 1, 1)
+
+
+def number_versions(apps, schema_editor):
+    """
+    Give existing configurations distinct effective dates.
+
+    Payroll used the first configuration, so it takes effect on the
+    baseline date and keeps applying to every real date; any others become
+    earlier versions, a day apart, that no attendance falls under.
+    """
+    SalaryConfiguration = apps.get_model('core', 'SalaryConfiguration')
+    for offset, pk in enumerate(SalaryConfiguration.objects.order_by('pk').values_list('pk', flat=True)):
+        SalaryConfiguration.objects.filter(pk=pk).update(
+            effective_from=BASELINE_EFFECTIVE_FROM - datetime.timedelta(days=offset)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_employeesalary_month_index'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='salaryconfiguration',
+            options={'ordering': ['effective_from'], 'verbose_name': 'Salary Configuration', 'verbose_name_plural': 'Salary Configurations'},
+        ),
+        migrations.AddField(
+            model_name='salaryconfiguration',
+            name='effective_from',
+            field=models.DateField(default=BASELINE_EFFECTIVE_FROM, help_text='Date from which these rates apply'),
+        ),
+        migrations.RunPython(number_versions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='salaryconfiguration',
+            name='effective_from',
+            field=models.DateField(default=datetime.date(2000, 1, 1), help_text='Date from which these rates apply', unique=True),
+        ),
+        migrations.AddField(
+            model_name='salaryconfiguration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
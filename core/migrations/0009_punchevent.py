@@ -0,0 +1,41 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_shifts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PunchEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('terminal', models.CharField(blank=True, max_length=50)),
+                ('score', models.FloatField(blank=True, help_text='Match score of the identification', null=True)),
+                ('recorded_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='punch_events', to='core.employee')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['timestamp'], name='core_punche_timesta_815b97_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='punchevent',
+            constraint=models.UniqueConstraint(fields=('employee', 'timestamp'), name='unique_punch_event'),
+        ),
+    ]
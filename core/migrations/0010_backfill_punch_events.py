@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+def backfill_punch_events(apps, schema_editor):
+    """Log the punches behind existing attendance so it can be rebuilt from events"""
+    Attendance = apps.get_model('core', 'Attendance')
+    PunchEvent = apps.get_model('core', 'PunchEvent')
+    ProjectionCheckpoint = apps.get_model('core', 'ProjectionCheckpoint')
+
+    events = []
+    rows = Attendance.objects.filter(check_in__isnull=False).values_list('employee_id', 'check_in', 'check_out', 'terminal')
+    for employee_id, check_in, check_out, terminal in rows.iterator(chunk_size=5000):
+        events.append(PunchEvent(employee_id=employee_id, timestamp=check_in, terminal=terminal))
+        if check_out:
+            events.append(PunchEvent(employee_id=employee_id, timestamp=check_out, terminal=terminal))
+        if len(events) >= 5000:
+            PunchEvent.objects.bulk_create(events, ignore_conflicts=True)
+            events = []
+    PunchEvent.objects.bulk_create(events, ignore_conflicts=True)
+
+    # Existing attendance already reflects these events
+    last = PunchEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    ProjectionCheckpoint.objects.update_or_create(name='attendance', defaults={'last_event_id': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_punchevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_punch_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_backfill_punch_events'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'employee'], name='core_attend_date_d2a428_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_attendance_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeesalary',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, help_text='Set when the payroll month is closed; closed salaries are not recalculated', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_employeesalary_closed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='fingerprint_quality',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Mean image quality of the enrollment scans the template was built from', null=True),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='fingerprint_samples',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -1,11 +1,16 @@
+import bisect
 import datetime
+import time
 from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.core.validators import RegexValidator
 
+from core.report_cache import invalidate_months
+
 # class Department(models.Model):
 #     name = models.CharField(max_length=100, unique=True)
 #     description = models.TextField(blank=True)
@@ -45,6 +50,13 @@ class Employee(models.Model):
     # Biometric Data
     fingerprint_data = models.BinaryField(null=True, blank=True)
     fingerprint_template_id = models.IntegerField(null=True, blank=True)
+    fingerprint_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    fingerprint_quality = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Mean image quality of the enrollment scans the template was built from"
+    )
+    fingerprint_samples = models.PositiveSmallIntegerField(default=0)
     
     # Status
     is_active = models.BooleanField(default=True)
@@ -61,8 +73,102 @@ class Employee(models.Model):
 
 # models.py
 
+class SalaryConfigurationIndex:
+    """
+    Salary configuration versions searchable by date.
+
+    Versions are sorted by ``effective_from`` and looked up with bisect, so
+    resolving the rates for a date costs O(log n) and no query.
+    """
+
+    def __init__(self, versions):
+        self.versions = sorted(versions, key=lambda version: version.effective_from)
+        self.dates = [version.effective_from for version in self.versions]
+
+    def __len__(self):
+        return len(self.versions)
+
+    @staticmethod
+    def _as_date(date):
+        # Versions are keyed by date; a datetime cannot be compared with them
+        return date.date() if isinstance(date, datetime.datetime) else date
+
+    def position(self, date):
+        """Index of the version effective on ``date``; the earliest version covers dates before it"""
+        return max(bisect.bisect_right(self.dates, self._as_date(date)) - 1, 0)
+
+    def for_date(self, date):
+        """Version effective on ``date``, or None if there are no versions"""
+        if not self.versions:
+            return None
+        return self.versions[self.position(date)]
+
+    def between(self, start, end):
+        """Versions effective at any point from ``start`` to ``end`` inclusive"""
+        if not self.versions:
+            return []
+        return self.versions[self.position(start):bisect.bisect_right(self.dates, self._as_date(end))] or [self.for_date(start)]
+
+
+# Seconds between checks for configuration versions edited by other processes
+CONFIGURATION_CHECK_INTERVAL = 30
+
+
+class SalaryConfigurationManager(models.Manager):
+    _index = None
+    _stamp = None
+    _checked = 0.0
+
+    def index(self, recheck=False):
+        """
+        In-process index of all versions.
+
+        Lookups are served from memory. At most every
+        CONFIGURATION_CHECK_INTERVAL seconds, or whenever ``recheck`` is
+        set, one aggregate query checks whether any version was added,
+        changed or removed since the index was built, so every process
+        sees edits. Edits made in this process are seen immediately.
+        """
+        manager = SalaryConfigurationManager
+        now = time.monotonic()
+        if manager._index is not None and not recheck and now - manager._checked < CONFIGURATION_CHECK_INTERVAL:
+            return manager._index
+
+        stamp = tuple(self.aggregate(count=models.Count('id'), updated=models.Max('updated_at')).values())
+        if manager._index is None or stamp != manager._stamp:
+            manager._index = SalaryConfigurationIndex(self.all())
+            manager._stamp = stamp
+        manager._checked = now
+        return manager._index
+
+    @staticmethod
+    def expire():
+        """Make the next ``index`` call check for edits"""
+        SalaryConfigurationManager._checked = 0.0
+
+    def for_date(self, date=None):
+        """Version effective on ``date`` (default today), or None if none exist"""
+        return self.index().for_date(date or timezone.localdate())
+
+
+def get_standard_window(config):
+    """Standard working hours of a configuration as seconds since midnight"""
+    start = config.standard_work_start
+    end = config.standard_work_end
+    return (
+        start.hour * 3600 + start.minute * 60 + start.second,
+        end.hour * 3600 + end.minute * 60 + end.second,
+    )
+
+
 class SalaryConfiguration(models.Model):
-    """Global salary configuration settings"""
+    """Salary configuration settings, versioned by the date they take effect"""
+    effective_from = models.DateField(
+        default=datetime.date(2000, 1, 1),
+        unique=True,
+        help_text="Date from which these rates apply"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
     standard_work_start = models.TimeField(default='09:00')
     standard_work_end = models.TimeField(default='17:00')
     working_hours_per_day = models.DecimalField(max_digits=4, decimal_places=2, default=8.00)
@@ -71,93 +177,15 @@ class SalaryConfiguration(models.Model):
     early_leave_deduction_rate = models.DecimalField(max_digits=6, decimal_places=2, help_text="Deduction rate per hour of early leaving")
     overtime_fixed_rate = models.DecimalField(max_digits=6, decimal_places=2, help_text="Fixed rate per overtime hour")
     
+    objects = SalaryConfigurationManager()
+
     class Meta:
+        ordering = ['effective_from']
         verbose_name = "Salary Configuration"
         verbose_name_plural = "Salary Configurations"
 
-def calculate_monthly_salary(employee, month_date):
-    """
-    Calculate monthly salary with deductions for missed hours and overtime compensation
-    
-    Args:
-        employee (Employee): Employee instance
-        month_date (date): Month for salary calculation
-    
-    Returns:
-        EmployeeSalary: Calculated salary record
-    """
-    # Get salary configuration
-    config = SalaryConfiguration.objects.first()
-    if not config:
-        raise ValueError("Salary configuration not found")
-    
-    # Get or create salary record for the month
-    salary_record, created = EmployeeSalary.objects.get_or_create(
-        employee=employee,
-        month=month_date.replace(day=1),
-        defaults={'base_salary': employee.base_salary}
-    )
-    
-    # Get attendance records for the month
-    attendance_records = Attendance.objects.filter(
-        employee=employee,
-        date__year=month_date.year,
-        date__month=month_date.month
-    )
-    
-    # Initialize totals
-    total_late_hours = Decimal('0.00')
-    total_early_leave_hours = Decimal('0.00')
-    total_overtime_hours = Decimal('0.00')
-    
-    # Calculate totals from attendance records
-    for record in attendance_records:
-        if record.check_in and record.check_out:
-            # Calculate late hours
-            check_in_time = record.check_in.time()
-            if check_in_time > config.standard_work_start:
-                time_diff = datetime.datetime.combine(record.date, check_in_time) - \
-                           datetime.datetime.combine(record.date, config.standard_work_start)
-                total_late_hours += Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-            
-            # Calculate early leave hours
-            check_out_time = record.check_out.time()
-            if check_out_time < config.standard_work_end:
-                time_diff = datetime.datetime.combine(record.date, config.standard_work_end) - \
-                           datetime.datetime.combine(record.date, check_out_time)
-                total_early_leave_hours += Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-            
-            # Calculate overtime hours
-            if check_out_time > config.standard_work_end:
-                time_diff = datetime.datetime.combine(record.date, check_out_time) - \
-                           datetime.datetime.combine(record.date, config.standard_work_end)
-                total_overtime_hours += Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-    
-    # Update salary record with totals
-    salary_record.total_late_hours = total_late_hours
-    salary_record.total_early_leave_hours = total_early_leave_hours
-    salary_record.total_overtime_hours = total_overtime_hours
-    
-    # Calculate deductions
-    late_deductions = total_late_hours * config.late_deduction_rate
-    early_leave_deductions = total_early_leave_hours * config.early_leave_deduction_rate
-    
-    # Calculate overtime compensation (fixed rate per hour)
-    overtime_compensation = total_overtime_hours * config.overtime_fixed_rate
-    
-    # Calculate final salary
-    salary_record.late_deductions = late_deductions
-    salary_record.early_leave_deductions = early_leave_deductions
-    salary_record.overtime_additions = overtime_compensation
-    salary_record.final_salary = (
-        salary_record.base_salary - 
-        late_deductions - 
-        early_leave_deductions + 
-        overtime_compensation
-    )
-    
-    salary_record.save()
-    return salary_record
+    def __str__(self):
+        return f"Salary configuration from {self.effective_from}"
 
 class EmployeeSalary(models.Model):
     """Employee base salary and monthly calculations"""
@@ -171,15 +199,20 @@ class EmployeeSalary(models.Model):
     early_leave_deductions = models.DecimalField(max_digits=8, decimal_places=2, default=0)
     overtime_additions = models.DecimalField(max_digits=8, decimal_places=2, default=0)
     final_salary = models.DecimalField(max_digits=10, decimal_places=2, default=100000)
+    closed_at = models.DateTimeField(null=True, blank=True, help_text="Set when the payroll month is closed; closed salaries are not recalculated")
     
     class Meta:
         unique_together = ['employee', 'month']
         ordering = ['-month']
         verbose_name_plural = 'Employee salaries'
+        indexes = [
+            # Roll-ups select a range of months across all employees
+            models.Index(fields=['month', 'employee']),
+        ]
 
     def calculate_final_salary(self):
         """Calculate final salary after deductions and additions"""
-        config = SalaryConfiguration.objects.first()
+        config = SalaryConfiguration.objects.for_date(self.month)
         
         # Calculate deductions
         self.late_deductions = self.total_late_hours * config.late_deduction_rate
@@ -197,6 +230,155 @@ class EmployeeSalary(models.Model):
         )
         self.save()
 
+class Shift(models.Model):
+    """Working hours of a shift; a shift ending before it starts runs past midnight"""
+    name = models.CharField(max_length=50, unique=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['start_time']
+
+    def __str__(self):
+        return f"{self.name} ({self.start_time:%H:%M}-{self.end_time:%H:%M})"
+
+    @property
+    def crosses_midnight(self):
+        return self.end_time <= self.start_time
+
+
+class ShiftAssignment(models.Model):
+    """An employee working a shift from ``start_date`` until ``end_date``"""
+    employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name='shift_assignments')
+    shift = models.ForeignKey(Shift, on_delete=models.PROTECT, related_name='assignments')
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True, help_text="Last day on this shift, blank if open-ended")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['employee', 'start_date']
+        indexes = [
+            models.Index(fields=['start_date', 'end_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee.employee_id} on {self.shift.name} from {self.start_date}"
+
+
+class PunchEvent(models.Model):
+    """
+    A fingerprint punch as it happened. Events are only ever appended;
+    Attendance sessions are derived from them by ``core.projector``.
+    """
+    employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name='punch_events')
+    timestamp = models.DateTimeField()
+    terminal = models.CharField(max_length=50, blank=True)
+    score = models.FloatField(null=True, blank=True, help_text="Match score of the identification")
+    recorded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Re-sent punches are ignored on insert
+            models.UniqueConstraint(fields=['employee', 'timestamp'], name='unique_punch_event'),
+        ]
+        indexes = [
+            models.Index(fields=['timestamp']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} punched at {self.timestamp}"
+
+
+class ProjectionCheckpoint(models.Model):
+    """Last PunchEvent a projector has applied"""
+    name = models.CharField(max_length=50, unique=True)
+    last_event_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} at event {self.last_event_id}"
+
+
+class DataVersionManager(models.Manager):
+    def current(self, name):
+        """Version stored under ``name``, or None if it was never bumped"""
+        return self.filter(name=name).values_list('version', flat=True).first()
+
+    def current_many(self, names):
+        """Versions of those ``names`` that were ever bumped"""
+        return dict(self.filter(name__in=list(names)).values_list('name', 'version'))
+
+    def ensure(self, names):
+        """Versions of ``names``, starting one for each name never bumped"""
+        names = list(names)
+        versions = self.current_many(names)
+        missing = [name for name in names if name not in versions]
+        if missing:
+            version = time.time_ns()
+            self.bulk_create([self.model(name=name, version=version) for name in missing], ignore_conflicts=True)
+            versions.update(self.current_many(missing))
+        return versions
+
+    def bump(self, names):
+        """Move every name in ``names`` to a new version, in the current transaction"""
+        version = time.time_ns()
+        # One upsert whether or not the names exist yet
+        self.bulk_create(
+            [self.model(name=name, version=version) for name in names],
+            update_conflicts=True, unique_fields=['name'], update_fields=['version', 'updated_at']
+        )
+        return version
+
+
+class DataVersion(models.Model):
+    """
+    Version of data that processes keep derived state for, such as the
+    employee directory or a month's report fragments. Readers compare it
+    to the version they built from.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DataVersionManager()
+
+    def __str__(self):
+        return f"{self.name} at {self.version}"
+
+
+class DailyAttendanceRollup(models.Model):
+    """Company-wide attendance for one date, refreshed as sessions close"""
+    date = models.DateField(unique=True)
+    present_count = models.PositiveIntegerField(default=0)
+    late_count = models.PositiveIntegerField(default=0)
+    average_check_in = models.TimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.date}: {self.present_count} present, {self.late_count} late"
+
+
+class AttendanceBitmap(models.Model):
+    """
+    An employee's month as bitmasks; bit ``day - 1`` is set when the
+    employee completed a session on that day, or arrived late on it.
+    """
+    employee = models.ForeignKey('Employee', on_delete=models.CASCADE, related_name='attendance_bitmaps')
+    month = models.DateField()
+    present = models.BigIntegerField(default=0)
+    late = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['month', 'employee']
+
+    def __str__(self):
+        return f"{self.employee_id} in {self.month:%Y-%m}"
+
+
 # Update Attendance model to include work hour calculations
 class Attendance(models.Model):
     """Enhanced attendance model with work hour calculations"""
@@ -204,69 +386,129 @@ class Attendance(models.Model):
     date = models.DateField()
     check_in = models.DateTimeField(null=True)
     check_out = models.DateTimeField(null=True)
+    terminal = models.CharField(max_length=50, blank=True, help_text="Terminal the check-in was recorded at")
     late_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
     early_leave_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
     overtime_hours = models.DecimalField(max_digits=4, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['terminal', 'date']),
+            models.Index(fields=['date', 'employee']),
+        ]
     
     def calculate_hours(self):
-        """Calculate late, early leave, and overtime hours"""
+        """Calculate late, early leave, and overtime hours against the employee's shift and save them"""
         if not (self.check_in and self.check_out):
             return
-            
-        config = SalaryConfiguration.objects.first()
-        
-        # Convert times to datetime.time for comparison
-        check_in_time = self.check_in.time()
-        check_out_time = self.check_out.time()
-        
-        # Calculate late hours
-        if check_in_time > config.standard_work_start:
-            time_diff = datetime.combine(self.date, check_in_time) - datetime.combine(self.date, config.standard_work_start)
-            self.late_hours = Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-        
-        # Calculate early leave hours
-        if check_out_time < config.standard_work_end:
-            time_diff = datetime.combine(self.date, config.standard_work_end) - datetime.combine(self.date, check_out_time)
-            self.early_leave_hours = Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-        
-        # Calculate overtime hours
-        if check_out_time > config.standard_work_end:
-            time_diff = datetime.combine(self.date, check_out_time) - datetime.combine(self.date, config.standard_work_end)
-            self.overtime_hours = Decimal(time_diff.total_seconds() / 3600).quantize(Decimal('0.01'))
-        
+        self.compute_hours()
         self.save()
 
-def calculate_monthly_salary(employee, month_date):
-    """Calculate monthly salary based on attendance"""
-    # Get or create salary record for the month
-    salary_record, created = EmployeeSalary.objects.get_or_create(
-        employee=employee,
-        month=month_date.replace(day=1),
-        defaults={'base_salary': employee.base_salary}
-    )
-    
-    # Get all attendance records for the month
-    attendance_records = Attendance.objects.filter(
-        employee=employee,
-        date__year=month_date.year,
-        date__month=month_date.month
-    )
-    
-    # Calculate totals
-    salary_record.total_late_hours = sum(record.late_hours for record in attendance_records)
-    salary_record.total_early_leave_hours = sum(record.early_leave_hours for record in attendance_records)
-    salary_record.total_overtime_hours = sum(record.overtime_hours for record in attendance_records)
-    
-    # Calculate final salary
-    salary_record.calculate_final_salary()
-    
-    return salary_record
-    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
-    date = models.DateField(auto_now_add=True)
-    check_in = models.DateTimeField(null=True)
-    check_out = models.DateTimeField(null=True)
-    
+    def compute_hours(self):
+        """Set late, early leave, and overtime hours against the employee's shift, without saving"""
+        if not (self.check_in and self.check_out):
+            return
+
+        from core.schedules import get_schedule
+
+        window = get_schedule().window(self.employee_id, self.date)
+        if window is None:
+            config = SalaryConfiguration.objects.for_date(self.date)
+            window = get_standard_window(config)
+        work_start, work_end = window
+
+        # Seconds since local midnight of the attendance date, so a
+        # check-out after midnight counts past 24 hours
+        midnight = timezone.make_aware(datetime.datetime.combine(self.date, datetime.time.min))
+        check_in = (self.check_in - midnight).total_seconds()
+        check_out = (self.check_out - midnight).total_seconds()
+
+        self.late_hours = Decimal(max(check_in - work_start, 0) / 3600).quantize(Decimal('0.01'))
+        self.early_leave_hours = Decimal(max(work_end - check_out, 0) / 3600).quantize(Decimal('0.01'))
+        self.overtime_hours = Decimal(max(check_out - work_end, 0) / 3600).quantize(Decimal('0.01'))
+
     def get_duration(self):
         if self.check_in and self.check_out:
             return self.check_out - self.check_in
-        return None
\ No newline at end of file
+        return None
+
+def calculate_monthly_salary(employee, month_date):
+    """
+    Calculate an employee's monthly salary with deductions for missed hours and overtime compensation
+
+    Each day is paid at the rates of the configuration version effective
+    on it, through the same code as ``core.payroll.calculate_monthly_salaries``.
+
+    Args:
+        employee (Employee): Employee instance
+        month_date (date): Month for salary calculation
+
+    Returns:
+        EmployeeSalary: Calculated salary record
+
+    Raises:
+        ValueError: If no salary configuration exists
+    """
+    from core.payroll import calculate_monthly_salaries
+
+    return calculate_monthly_salaries(month_date, [employee])[0]
+
+class PayrollRun(models.Model):
+    """A background salary calculation and the report snapshot it produced"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    month = models.DateField()  # Store first day of the month
+    config_version = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    snapshot = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ['month', 'config_version']
+        ordering = ['-month']
+
+    def __str__(self):
+        return f"Payroll {self.month:%Y-%m} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+
+@receiver([post_save, post_delete], sender=Attendance)
+@receiver([post_save, post_delete], sender=EmployeeSalary)
+def invalidate_report_cache(sender, instance, **kwargs):
+    """Cached report fragments of the month go stale; bulk writers invalidate explicitly"""
+    invalidate_months([instance.date if sender is Attendance else instance.month])
+
+
+@receiver([post_save, post_delete], sender=SalaryConfiguration)
+def expire_salary_configuration_index(sender, **kwargs):
+    """Rates of every date may have moved"""
+    SalaryConfigurationManager.expire()
+
+
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=User)
+def invalidate_employee_directory(sender, update_fields=None, **kwargs):
+    """The punch path's employee directory holds names and active flags"""
+    # Logins save the user's last_login only
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    from core.directory import invalidate_directory
+    invalidate_directory()
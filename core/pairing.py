@@ -0,0 +1,210 @@
+# core/pairing.py
+import datetime
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Attendance
+from core.rollups import refresh_rollups
+from core.schedules import ShiftSchedule, get_schedule
+
+logger = logging.getLogger(__name__)
+
+# Attendance fields re-pairing changes on stored sessions
+SESSION_FIELDS = ['date', 'check_out', 'updated_at']
+
+
+class Session(NamedTuple):
+    """A check-in and its check-out, or None if the session was left open"""
+    check_in: datetime.datetime
+    check_out: Optional[datetime.datetime]
+
+
+def pairing_limits() -> Tuple[datetime.timedelta, datetime.timedelta]:
+    """MAX_SESSION_HOURS and REPEAT_PUNCH_SECONDS from ATTENDANCE_PAIRING"""
+    config = settings.ATTENDANCE_PAIRING
+    return (
+        datetime.timedelta(hours=config.get('MAX_SESSION_HOURS', 16)),
+        datetime.timedelta(seconds=config.get('REPEAT_PUNCH_SECONDS', 60)),
+    )
+
+
+def pair_punches(timestamps: Iterable[datetime.datetime],
+                 max_session: Optional[datetime.timedelta] = None,
+                 repeat: Optional[datetime.timedelta] = None) -> Iterator[Session]:
+    """
+    Pair one employee's punches into work sessions in a single pass.
+
+    Punches alternate between check-in and check-out regardless of the
+    calendar date, so a shift from 22:00 to 06:00 is one session. A punch
+    more than ``max_session`` after an open check-in starts a new session
+    and leaves the previous one open. Punches within ``repeat`` of the
+    previous punch are double scans and are dropped.
+
+    Args:
+        timestamps (Iterable[datetime]): Punches in timestamp order
+        max_session (timedelta, optional): Longest possible session
+        repeat (timedelta, optional): Window for ignoring double scans
+
+    Returns:
+        Iterator[Session]: Sessions in check-in order
+    """
+    default_session, default_repeat = pairing_limits()
+    max_session = max_session or default_session
+    repeat = default_repeat if repeat is None else repeat
+
+    check_in = last = None
+    for timestamp in timestamps:
+        if last is not None and timestamp - last <= repeat:
+            continue
+        last = timestamp
+
+        if check_in is None:
+            check_in = timestamp
+        elif timestamp - check_in > max_session:
+            yield Session(check_in, None)
+            check_in = timestamp
+        else:
+            yield Session(check_in, timestamp)
+            check_in = None
+
+    if check_in is not None:
+        yield Session(check_in, None)
+
+
+def session_date(employee_pk: int, check_in: datetime.datetime, schedule: Optional[ShiftSchedule] = None) -> datetime.date:
+    """
+    Attendance date a session belongs to.
+
+    This is the local date of the check-in, unless the check-in falls
+    inside the employee's shift from the previous day that runs past
+    midnight; a late arrival for a night shift counts toward the shift's date.
+    """
+    local = timezone.localtime(check_in)
+    date = local.date()
+    if schedule is None:
+        schedule = get_schedule()
+
+    previous = date - datetime.timedelta(days=1)
+    window = schedule.window(employee_pk, previous)
+    if window is not None and window[1] > 86400:
+        seconds = local.hour * 3600 + local.minute * 60 + local.second + 86400
+        if seconds < window[1]:
+            return previous
+    return date
+
+
+def reconcile_sessions(employee_pk: int, rows: List[Attendance], punches: Iterable[dict],
+                       schedule: Optional[ShiftSchedule] = None) -> Tuple[List[Attendance], List[Attendance], List[Attendance], Dict[str, int]]:
+    """
+    Re-pair an employee's stored sessions together with new punches.
+
+    The stored rows must be whole sessions, so the merged stream starts
+    with a check-in. Rows are matched to the re-paired sessions by their
+    check-in timestamp.
+
+    Args:
+        employee_pk (int): Employee the rows and punches belong to
+        rows (List[Attendance]): Stored sessions around the punches
+        punches (Iterable[dict]): New punches with ``timestamp`` and ``terminal``
+        schedule (ShiftSchedule, optional): Shifts used to date sessions
+
+    Returns:
+        Tuple: Rows to create, rows to update, rows to delete, and counts of
+        ``duplicates`` (punches already stored)
+    """
+    known = {}
+    for row in rows:
+        for timestamp in (row.check_in, row.check_out):
+            if timestamp is not None:
+                known[timestamp] = row.terminal
+
+    stats = {'duplicates': 0}
+    for punch in punches:
+        if punch['timestamp'] in known:
+            stats['duplicates'] += 1
+        else:
+            known[punch['timestamp']] = punch['terminal']
+
+    by_check_in = {row.check_in: row for row in rows}
+    created, updated = [], []
+    for session in pair_punches(sorted(known)):
+        date = session_date(employee_pk, session.check_in, schedule)
+        row = by_check_in.pop(session.check_in, None)
+        if row is None:
+            created.append(Attendance(
+                employee_id=employee_pk,
+                date=date,
+                check_in=session.check_in,
+                check_out=session.check_out,
+                terminal=known[session.check_in]
+            ))
+        elif (row.date, row.check_out) != (date, session.check_out):
+            # bulk_update does not touch auto_now fields
+            row.date, row.check_out, row.updated_at = date, session.check_out, timezone.now()
+            updated.append(row)
+
+    # Rows whose check-in now closes an earlier session
+    return created, updated, list(by_check_in.values()), stats
+
+
+def load_sessions(employee_pks: Iterable[int], start: datetime.date, end: datetime.date) -> Dict[int, List[Attendance]]:
+    """Lock and load stored sessions per employee, in check-in order. Call inside a transaction."""
+    employee_pks = set(employee_pks)
+    records = Attendance.objects.select_for_update().filter(
+        date__range=(start, end), check_in__isnull=False
+    ).order_by('check_in')
+    # Long IN lists cost more than loading the range and filtering
+    if len(employee_pks) <= 500:
+        records = records.filter(employee_id__in=employee_pks)
+
+    sessions = defaultdict(list)
+    for record in records:
+        if record.employee_id in employee_pks:
+            sessions[record.employee_id].append(record)
+    return sessions
+
+
+def repair_attendance(start: datetime.date, end: datetime.date,
+                      employee_pks: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    Re-pair stored attendance over a date range.
+
+    Rows split at midnight by per-day pairing are merged back into single
+    sessions. Each employee's punches are paired in one pass, in one
+    transaction per employee.
+
+    Args:
+        start (date): First attendance date to repair
+        end (date): Last attendance date to repair
+        employee_pks (Iterable[int], optional): Defaults to every employee with attendance
+
+    Returns:
+        Dict[str, int]: Counts of employees, created, updated and removed rows
+    """
+    if employee_pks is None:
+        employee_pks = Attendance.objects.filter(date__range=(start, end)).values_list('employee_id', flat=True).distinct()
+    employee_pks = list(employee_pks)
+    schedule = ShiftSchedule.load(start - datetime.timedelta(days=1), end)
+
+    stats = {'employees': 0, 'created': 0, 'updated': 0, 'removed': 0}
+    for employee_pk in employee_pks:
+        with transaction.atomic():
+            rows = load_sessions([employee_pk], start, end).get(employee_pk, [])
+            created, updated, removed = reconcile_sessions(employee_pk, rows, [], schedule)[:3]
+            Attendance.objects.filter(pk__in=[row.pk for row in removed]).delete()
+            Attendance.objects.bulk_create(created)
+            Attendance.objects.bulk_update(updated, SESSION_FIELDS)
+
+        stats['employees'] += 1
+        stats['created'] += len(created)
+        stats['updated'] += len(updated)
+        stats['removed'] += len(removed)
+
+    refresh_rollups(start, end, employee_pks)
+    logger.info(f"Repaired attendance from {start} to {end}: {stats}")
+    return stats
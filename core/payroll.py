@@ -0,0 +1,479 @@
+# core/payroll.py
+import datetime
+import hashlib
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from core.models import Attendance, Employee, EmployeeSalary, SalaryConfiguration, SalaryConfigurationIndex
+from core.report_cache import invalidate_months
+from core.schedules import ShiftSchedule
+
+CENT = Decimal('0.01')
+
+# Hours are accumulated as integer hundredths of an hour (36 seconds)
+SECONDS_PER_HUNDREDTH = 36.0
+
+
+def _seconds(value: datetime.time) -> float:
+    return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+
+
+def _hundredths(seconds: np.ndarray) -> np.ndarray:
+    """
+    Round durations to whole hundredths of an hour.
+
+    Exact ties are rare (one second value in 36), so they are settled one
+    by one with ``Decimal(seconds / 3600).quantize`` to round exactly as the
+    per-record calculation did.
+    """
+    scaled = seconds / SECONDS_PER_HUNDREDTH
+    hundredths = np.rint(scaled)
+    for row in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-9):
+        hundredths[row] = int(Decimal(float(seconds[row]) / 3600).quantize(CENT).scaleb(2))
+    return hundredths
+
+
+def _month_range(month_date: datetime.date):
+    start = month_date.replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    return start, end
+
+
+def load_month_attendance(month_date: datetime.date, employee_ids: Optional[Iterable[int]] = None) -> Dict[str, np.ndarray]:
+    """
+    Load a month of completed attendance into NumPy columns.
+
+    Args:
+        month_date (date): Any day in the month
+        employee_ids (Iterable[int], optional): Restrict to these employees
+
+    Returns:
+        Dict[str, np.ndarray]: ``employee`` pks, ``day`` ordinals, and
+        ``check_in``/``check_out`` as seconds since midnight of the record's date
+    """
+    start, end = _month_range(month_date)
+    records = Attendance.objects.filter(
+        date__range=(start, end),
+        check_in__isnull=False,
+        check_out__isnull=False
+    )
+    if employee_ids is not None:
+        employee_ids = list(employee_ids)
+        # Long IN lists cost more than loading the month and masking
+        if len(employee_ids) <= 500:
+            records = records.filter(employee_id__in=employee_ids)
+
+    columns = attendance_columns(records.values_list('employee_id', 'date', 'check_in', 'check_out'))
+    if employee_ids is not None and len(employee_ids) > 500:
+        mask = np.isin(columns['employee'], np.asarray(employee_ids, dtype=np.int64))
+        columns = {name: column[mask] for name, column in columns.items()}
+    return columns
+
+
+def attendance_columns(rows: Iterable[Tuple[int, datetime.date, datetime.datetime, datetime.datetime]]) -> Dict[str, np.ndarray]:
+    """
+    Convert completed sessions into NumPy columns.
+
+    Args:
+        rows (Iterable[Tuple]): ``(employee_id, date, check_in, check_out)``
+
+    Returns:
+        Dict[str, np.ndarray]: Columns as returned by load_month_attendance
+    """
+    rows = list(rows)
+    count = len(rows)
+
+    employee = np.fromiter((row[0] for row in rows), dtype=np.int64, count=count)
+    day = np.fromiter((row[1].toordinal() for row in rows), dtype=np.int64, count=count)
+    check_in = np.fromiter((row[2].timestamp() for row in rows), dtype=np.float64, count=count)
+    check_out = np.fromiter((row[3].timestamp() for row in rows), dtype=np.float64, count=count)
+
+    # Local midnight is resolved once per distinct date, not per record
+    days, day_index = np.unique(day, return_inverse=True)
+    midnight = np.array([
+        timezone.make_aware(datetime.datetime.combine(datetime.date.fromordinal(int(ordinal)), datetime.time.min)).timestamp()
+        for ordinal in days
+    ], dtype=np.float64)[day_index] if count else np.zeros(0)
+
+    return {
+        'employee': employee,
+        'day': day,
+        'check_in': check_in - midnight,
+        'check_out': check_out - midnight,
+    }
+
+
+HOUR_FIELDS = ['total_late_hours', 'total_early_leave_hours', 'total_overtime_hours']
+
+
+def work_windows(employee: np.ndarray, day: np.ndarray, configs: SalaryConfigurationIndex,
+                 schedule: Optional[ShiftSchedule] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Expected working hours for attendance columns.
+
+    Args:
+        employee (np.ndarray): Employee pks
+        day (np.ndarray): Date ordinals
+        configs (SalaryConfigurationIndex): Configuration versions
+        schedule (ShiftSchedule, optional): Shift assignments, which take
+            precedence over the standard hours
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Position of the version
+        effective on each date, and start and end as seconds since midnight
+    """
+    ordinals = np.array([date.toordinal() for date in configs.dates], dtype=np.int64)
+    version = np.maximum(np.searchsorted(ordinals, day, side='right') - 1, 0)
+    work_start = np.array([_seconds(config.standard_work_start) for config in configs.versions])[version]
+    work_end = np.array([_seconds(config.standard_work_end) for config in configs.versions])[version]
+    if schedule is not None and len(schedule):
+        shift_start, shift_end, scheduled = schedule.windows(employee, day)
+        work_start = np.where(scheduled, shift_start, work_start)
+        work_end = np.where(scheduled, shift_end, work_end)
+    return version, work_start, work_end
+
+
+def compute_hour_totals(columns: Dict[str, np.ndarray], configs: SalaryConfigurationIndex,
+                        schedule: Optional[ShiftSchedule] = None) -> Dict[int, Dict[int, Dict[str, Decimal]]]:
+    """
+    Total late, early leave and overtime hours per employee and configuration version.
+
+    Each record is measured against the employee's scheduled shift, or the
+    standard working hours of the version effective on its date, and
+    rounded to the hundredth of an hour before summing, as
+    ``Attendance.calculate_hours`` does, but all records are processed with
+    array operations and only the totals become Decimals.
+
+    Args:
+        columns (Dict[str, np.ndarray]): Output of ``load_month_attendance``
+        configs (SalaryConfigurationIndex): Configuration versions to measure against
+        schedule (ShiftSchedule, optional): Shift assignments covering the records
+
+    Returns:
+        Dict[int, Dict[int, Dict[str, Decimal]]]: Hours per employee pk, keyed
+        by the position of the version in ``configs.versions``
+    """
+    if not len(columns['employee']):
+        return {}
+
+    version, work_start, work_end = work_windows(columns['employee'], columns['day'], configs, schedule)
+    check_in, check_out = columns['check_in'], columns['check_out']
+
+    hours = [
+        _hundredths(np.maximum(check_in - work_start, 0)),
+        _hundredths(np.maximum(work_end - check_out, 0)),
+        _hundredths(np.maximum(check_out - work_end, 0)),
+    ]
+
+    # Records are grouped by (employee, version) pairs
+    groups, index = np.unique(columns['employee'] * len(configs) + version, return_inverse=True)
+    sums = [np.bincount(index, weights=values, minlength=len(groups)).tolist() for values in hours]
+
+    totals: Dict[int, Dict[int, Dict[str, Decimal]]] = {}
+    for position, group in enumerate(groups.tolist()):
+        employee, config_position = divmod(group, len(configs))
+        totals.setdefault(employee, {})[config_position] = {
+            field: Decimal(int(values[position])).scaleb(-2)
+            for field, values in zip(HOUR_FIELDS, sums)
+        }
+    return totals
+
+
+def apply_rates(salary: EmployeeSalary, parts: Iterable[Tuple[SalaryConfiguration, Dict[str, Decimal]]]) -> EmployeeSalary:
+    """
+    Fill in hours, deductions, additions and the final salary.
+
+    Args:
+        salary (EmployeeSalary): Salary record to update
+        parts (Iterable[Tuple[SalaryConfiguration, Dict[str, Decimal]]]): Hours
+            worked under each configuration version during the month
+
+    Returns:
+        EmployeeSalary: The updated record
+    """
+    for field in HOUR_FIELDS + ['late_deductions', 'early_leave_deductions', 'overtime_additions']:
+        setattr(salary, field, Decimal('0.00'))
+
+    for config, hours in parts:
+        salary.total_late_hours += hours['total_late_hours']
+        salary.total_early_leave_hours += hours['total_early_leave_hours']
+        salary.total_overtime_hours += hours['total_overtime_hours']
+        salary.late_deductions += (hours['total_late_hours'] * config.late_deduction_rate).quantize(CENT)
+        salary.early_leave_deductions += (hours['total_early_leave_hours'] * config.early_leave_deduction_rate).quantize(CENT)
+        salary.overtime_additions += (hours['total_overtime_hours'] * config.overtime_fixed_rate).quantize(CENT)
+
+    salary.final_salary = (
+        salary.base_salary -
+        salary.late_deductions -
+        salary.early_leave_deductions +
+        salary.overtime_additions
+    )
+    return salary
+
+
+def get_config_version(configs: Iterable[SalaryConfiguration], schedule: Optional[ShiftSchedule] = None) -> str:
+    """Fingerprint of the configuration versions and shifts a salary calculation depends on."""
+    values = (schedule.fingerprint if schedule is not None else '') + '|'.join(
+        str(getattr(config, field))
+        for config in configs
+        for field in (
+            'effective_from', 'standard_work_start', 'standard_work_end', 'working_hours_per_day', 'hourly_rate',
+            'late_deduction_rate', 'early_leave_deduction_rate', 'overtime_fixed_rate',
+        )
+    )
+    return hashlib.sha1(values.encode()).hexdigest()[:16]
+
+
+def get_data_version(month_date: datetime.date) -> str:
+    """
+    Fingerprint of a month's attendance and the active employees' base salaries.
+
+    Read from the database, so a change made by any process, including
+    bulk updates that send no signals, gives a new version.
+    """
+    attendance = Attendance.objects.filter(date__range=_month_range(month_date)).aggregate(
+        count=Count('id'), last=Max('id'), updated=Max('updated_at')
+    )
+    employees = Employee.objects.filter(is_active=True).aggregate(
+        count=Count('id'), last=Max('id'), salaries=Sum('base_salary')
+    )
+    values = '|'.join(str(value) for value in [*attendance.values(), *employees.values()])
+    return hashlib.sha1(values.encode()).hexdigest()[:16]
+
+
+def get_month_version(month_date: datetime.date) -> str:
+    """
+    Version of everything a month's payroll depends on.
+
+    Returns:
+        str: ``get_config_version`` of the configuration versions and
+        shifts in effect during the month and its ``get_data_version``
+    """
+    start, end = _month_range(month_date)
+    config_version = get_config_version(get_month_configs(month_date), ShiftSchedule.load(start, end))
+    return f'{config_version}-{get_data_version(month_date)}'
+
+
+def get_month_configs(month_date: datetime.date) -> List[SalaryConfiguration]:
+    """
+    Configuration versions in effect during a month.
+
+    Raises:
+        ValueError: If no salary configuration exists
+    """
+    configs = SalaryConfiguration.objects.index(recheck=True)
+    if not configs:
+        raise ValueError("Salary configuration not found")
+    return configs.between(*_month_range(month_date))
+
+
+SALARY_FIELDS = [
+    'total_late_hours', 'total_early_leave_hours', 'total_overtime_hours',
+    'late_deductions', 'early_leave_deductions', 'overtime_additions', 'final_salary',
+]
+
+
+def calculate_monthly_salaries(month_date: datetime.date, employees: Optional[Iterable[Employee]] = None) -> List[EmployeeSalary]:
+    """
+    Calculate the monthly salaries of many employees with array operations.
+
+    Attendance on each date is paid at the rates of the configuration
+    version effective that day.
+
+    Args:
+        month_date (date): Any day in the month
+        employees (Iterable[Employee], optional): Employees to calculate,
+            defaults to all active employees
+
+    Returns:
+        List[EmployeeSalary]: Saved salary records in the order of ``employees``;
+        records of a closed month are returned unchanged
+
+    Raises:
+        ValueError: If no salary configuration exists
+    """
+    configs = SalaryConfiguration.objects.index(recheck=True)
+    if not configs:
+        raise ValueError("Salary configuration not found")
+
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True)
+    employees = list(employees)
+    month = month_date.replace(day=1)
+
+    totals = compute_hour_totals(
+        load_month_attendance(month, [e.pk for e in employees]),
+        configs,
+        ShiftSchedule.load(*_month_range(month))
+    )
+
+    with transaction.atomic():
+        employee_pks = {employee.pk for employee in employees}
+        existing = {
+            salary.employee_id: salary
+            for salary in EmployeeSalary.objects.filter(month=month)
+            if salary.employee_id in employee_pks
+        }
+
+        records, missing, changed = [], [], []
+        for employee in employees:
+            salary = existing.get(employee.pk)
+            before = None
+            if salary is None:
+                salary = EmployeeSalary(employee=employee, month=month, base_salary=employee.base_salary)
+                missing.append(salary)
+            elif salary.closed_at is not None:
+                salary.employee = employee
+                records.append(salary)
+                continue
+            else:
+                salary.employee = employee
+                before = [getattr(salary, field) for field in ['base_salary'] + SALARY_FIELDS]
+                # Open months pay the current base salary
+                salary.base_salary = employee.base_salary
+
+            apply_rates(salary, [
+                (configs.versions[position], hours)
+                for position, hours in sorted(totals.get(employee.pk, {}).items())
+            ])
+
+            # Rows whose figures did not move are not written again
+            if before is not None and [getattr(salary, field) for field in ['base_salary'] + SALARY_FIELDS] != before:
+                changed.append(salary)
+            records.append(salary)
+
+        EmployeeSalary.objects.bulk_create(missing, batch_size=1000)
+        EmployeeSalary.objects.bulk_update(changed, ['base_salary'] + SALARY_FIELDS, batch_size=1000)
+        if missing or changed:
+            invalidate_months([month])
+
+    return records
+
+
+ROLLUP_PERIODS = ['month', 'quarter', 'ytd', 'rolling12']
+
+
+def _add_months(month: datetime.date, count: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def period_months(period: str, reference: datetime.date) -> Tuple[datetime.date, datetime.date]:
+    """
+    First and last month of a roll-up period ending at ``reference``.
+
+    Args:
+        period (str): One of ``ROLLUP_PERIODS``
+        reference (date): Any day in the last month of the period
+
+    Returns:
+        Tuple[date, date]: First days of the first and last months, inclusive
+
+    Raises:
+        ValueError: If the period is unknown
+    """
+    end = reference.replace(day=1)
+    if period == 'month':
+        return end, end
+    if period == 'quarter':
+        return end.replace(month=(end.month - 1) // 3 * 3 + 1), end
+    if period == 'ytd':
+        return end.replace(month=1), end
+    if period == 'rolling12':
+        return _add_months(end, -11), end
+    raise ValueError(f"Unknown roll-up period {period!r}")
+
+
+def ensure_monthly_salaries(start: datetime.date, end: datetime.date,
+                            employees: Optional[Iterable[Employee]] = None) -> int:
+    """
+    Calculate the salary rows a range is missing.
+
+    Months after the current one and months before an employee joined are
+    left alone. Existing rows are not recalculated.
+
+    Args:
+        start (date): First month of the range
+        end (date): Last month of the range
+        employees (Iterable[Employee], optional): Defaults to all active employees
+
+    Returns:
+        int: Number of salary rows calculated
+    """
+    if employees is None:
+        employees = Employee.objects.filter(is_active=True)
+    employees = list(employees)
+    employee_pks = {employee.pk for employee in employees}
+
+    existing = {
+        (employee_pk, month)
+        for employee_pk, month in EmployeeSalary.objects.filter(month__range=(start, end)).values_list('employee_id', 'month')
+        if employee_pk in employee_pks
+    }
+
+    calculated = 0
+    month, last = start.replace(day=1), min(end, timezone.localdate().replace(day=1))
+    while month <= last:
+        month_end = _month_range(month)[1]
+        missing = [
+            employee for employee in employees
+            if (employee.pk, month) not in existing and employee.date_joined <= month_end
+        ]
+        if missing:
+            calculated += len(calculate_monthly_salaries(month, missing))
+        month = _add_months(month, 1)
+    return calculated
+
+
+def rollup_salaries(start: datetime.date, end: datetime.date, employees: Optional[Iterable[Employee]] = None,
+                  fill_missing: bool = True) -> List[dict]:
+    """
+    Per-employee salary totals over a range of months.
+
+    Monthly ``EmployeeSalary`` rows are the precomputed aggregates, so a
+    roll-up over any range is one grouped query summing them.
+
+    Args:
+        start (date): First month of the range
+        end (date): Last month of the range
+        employees (Iterable[Employee], optional): Defaults to all active employees
+        fill_missing (bool): Calculate missing monthly rows first
+
+    Returns:
+        List[dict]: One row per employee with ``months`` and summed salary fields
+    """
+    start, end = start.replace(day=1), end.replace(day=1)
+    if employees is not None:
+        employees = list(employees)
+    if fill_missing:
+        ensure_monthly_salaries(start, end, employees)
+
+    salaries = EmployeeSalary.objects.filter(month__range=(start, end))
+    if employees is None:
+        salaries = salaries.filter(employee__is_active=True)
+    else:
+        salaries = salaries.filter(employee__in=[employee.pk for employee in employees])
+
+    fields = ['base_salary'] + SALARY_FIELDS
+    rows = salaries.values(
+        'employee', 'employee__employee_id', 'employee__user__first_name', 'employee__user__last_name'
+    ).annotate(
+        months=Count('id'),
+        **{f'sum_{field}': Sum(field) for field in fields}
+    ).order_by('employee__employee_id')
+
+    return [
+        {
+            'employee': row['employee'],
+            'employee_id': row['employee__employee_id'],
+            'name': f"{row['employee__user__first_name']} {row['employee__user__last_name']}".strip(),
+            'months': row['months'],
+            **{field: Decimal(row[f'sum_{field}']).quantize(CENT) for field in fields},
+        }
+        for row in rows
+    ]
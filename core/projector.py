@@ -0,0 +1,276 @@
+# core/projector.py
+import datetime
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Min
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from core.models import Attendance, ProjectionCheckpoint, PunchEvent
+from core.pairing import SESSION_FIELDS, load_sessions, reconcile_sessions
+from core.report_cache import invalidate_months, invalidate_range
+from core.rollups import defer_rollups, refresh_bitmaps, refresh_daily_rollups
+from core.schedules import ShiftSchedule
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = 'attendance'
+
+# Punches per executemany when appending to the event log
+APPEND_BATCH_SIZE = 5000
+
+# Columns the projector reads from each event
+EVENT_FIELDS = ('id', 'employee_id', 'timestamp', 'terminal')
+
+
+def append_punch_events(punches: Iterable[dict]) -> int:
+    """
+    Append punches to the event log.
+
+    Punches already logged for the same employee and timestamp are
+    skipped by the unique constraint, so re-sending a batch is harmless.
+    Rows are written with one ``executemany`` of an INSERT that ignores
+    conflicts, bypassing per-object ORM preparation, which dominated
+    bulk imports.
+
+    Args:
+        punches (Iterable[dict]): Punches with ``employee``, ``timestamp``,
+            ``terminal`` and optional ``score``
+
+    Returns:
+        int: Number of punches that were already logged
+    """
+    punches = list(punches)
+    if not punches:
+        return 0
+
+    ops = connection.ops
+    recorded_at = ops.adapt_datetimefield_value(timezone.now())
+    rows, seen = [], set()
+    for punch in punches:
+        key = (punch['employee'], punch['timestamp'])
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.append((
+            punch['employee'],
+            ops.adapt_datetimefield_value(punch['timestamp']),
+            punch.get('terminal', ''),
+            punch.get('score'),
+            recorded_at,
+        ))
+
+    columns = ['employee_id', 'timestamp', 'terminal', 'score', 'recorded_at']
+    fields = [PunchEvent._meta.get_field(column if column != 'employee_id' else 'employee') for column in columns]
+    sql = (
+        f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {ops.quote_name(PunchEvent._meta.db_table)} "
+        f"({', '.join(ops.quote_name(column) for column in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"{ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}"
+    ).strip()
+
+    inserted = 0
+    # One transaction, or autocommit would commit every row on its own
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), APPEND_BATCH_SIZE):
+            cursor.executemany(sql, rows[start:start + APPEND_BATCH_SIZE])
+            # Rows ignored as conflicts are not counted
+            inserted += cursor.rowcount
+    return len(punches) - inserted
+
+
+def _insert_sessions(rows: List[Attendance]) -> None:
+    """
+    Insert new attendance sessions with one ``executemany`` per batch.
+
+    Like ``append_punch_events`` this skips ``bulk_create``'s per-object
+    preparation, which dominated large projections. The rows get no pks.
+    """
+    if not rows:
+        return
+
+    ops = connection.ops
+    fields = [field for field in Attendance._meta.concrete_fields if not field.primary_key]
+    adapters = {
+        'DateTimeField': ops.adapt_datetimefield_value,
+        'DateField': ops.adapt_datefield_value,
+        'DecimalField': ops.adapt_decimalfield_value,
+    }
+    adapt = [adapters.get(field.get_internal_type(), lambda value: value) for field in fields]
+    # auto_now would otherwise be resolved once per row
+    updated_at = ops.adapt_datetimefield_value(timezone.now())
+    values = [
+        tuple(
+            updated_at if field.attname == 'updated_at' else adapt_value(getattr(row, field.attname))
+            for field, adapt_value in zip(fields, adapt)
+        )
+        for row in rows
+    ]
+    sql = (
+        f"INSERT INTO {ops.quote_name(Attendance._meta.db_table)} "
+        f"({', '.join(ops.quote_name(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), APPEND_BATCH_SIZE):
+            cursor.executemany(sql, values[start:start + APPEND_BATCH_SIZE])
+
+
+def _apply_events(events: List, defer: bool = False,
+                  changed: Optional[List[Attendance]] = None) -> Dict[str, int]:
+    """
+    Pair event rows (``EVENT_FIELDS``) into the stored sessions around them.
+
+    Call inside a transaction. Rollups of the touched dates are refreshed
+    in place, or after the commit in the background with ``defer``.
+    Attendance rows created or updated are appended to ``changed`` if given.
+    """
+    by_employee: Dict[int, List[dict]] = defaultdict(list)
+    for event in events:
+        by_employee[event.employee_id].append({'timestamp': event.timestamp, 'terminal': event.terminal})
+
+    stats = {'created': 0, 'updated': 0, 'removed': 0}
+    if not by_employee:
+        return stats
+
+    dates = {timezone.localdate(event.timestamp) for event in events}
+    start = min(dates) - datetime.timedelta(days=1)
+    end = max(dates) + datetime.timedelta(days=1)
+    schedule = ShiftSchedule.load(start - datetime.timedelta(days=1), end)
+
+    sessions = load_sessions(by_employee, start, end)
+    created, updated, removed = [], [], []
+    # Dates whose completed sessions change, before and after re-pairing
+    touched, touched_employees = set(), set()
+    for employee_pk, punches in by_employee.items():
+        rows = sessions.get(employee_pk, [])
+        previous = {row.pk: row.date for row in rows}
+        new, moved, stale, _ = reconcile_sessions(employee_pk, rows, punches, schedule)
+        created.extend(new)
+        updated.extend(moved)
+        removed.extend(stale)
+        for row in [row for row in new if row.check_out] + moved + stale:
+            touched.update((row.date, previous.get(row.pk, row.date)))
+            touched_employees.add(employee_pk)
+
+    Attendance.objects.filter(pk__in=[row.pk for row in removed]).delete()
+    if changed is None:
+        _insert_sessions(created)
+    else:
+        # Callers of ``changed`` need the new rows' pks
+        Attendance.objects.bulk_create(created, batch_size=1000)
+    Attendance.objects.bulk_update(updated, SESSION_FIELDS, batch_size=1000)
+
+    invalidate_months(touched | {row.date for row in created})
+    # Heatmap rollups follow completed sessions
+    if defer:
+        defer_rollups(touched, touched_employees)
+    else:
+        refresh_daily_rollups(touched)
+        for month in {date.replace(day=1) for date in touched}:
+            refresh_bitmaps(month, touched_employees)
+    if changed is not None:
+        changed.extend(created + updated)
+
+    stats.update(created=len(created), updated=len(updated), removed=len(removed))
+    return stats
+
+
+def project_events(batch_size: int = 50000, defer: bool = False,
+                   changed: Optional[List[Attendance]] = None) -> Dict[str, int]:
+    """
+    Apply punch events logged since the projector's checkpoint to attendance.
+
+    Each batch is applied and the checkpoint advanced in one transaction,
+    with the checkpoint row locked, so concurrent projectors never apply
+    an event twice and an interrupted run resumes where it stopped.
+
+    Args:
+        batch_size (int): Events applied per transaction
+        defer (bool): Refresh heatmap rollups in the background
+            after each commit, keeping them out of a punch request
+        changed (List[Attendance], optional): Receives the attendance rows
+            created or updated
+
+    Returns:
+        Dict[str, int]: Counts of events applied and attendance rows
+        created, updated and removed
+    """
+    totals = {'events': 0, 'created': 0, 'updated': 0, 'removed': 0}
+    ProjectionCheckpoint.objects.get_or_create(name=CHECKPOINT)
+
+    while True:
+        with transaction.atomic():
+            checkpoint = ProjectionCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+            events = list(PunchEvent.objects.filter(
+                id__gt=checkpoint.last_event_id
+            ).order_by('id').values_list(*EVENT_FIELDS, named=True)[:batch_size])
+            if not events:
+                break
+
+            for key, value in _apply_events(events, defer, changed).items():
+                totals[key] += value
+            totals['events'] += len(events)
+
+            checkpoint.last_event_id = events[-1].id
+            checkpoint.save(update_fields=['last_event_id', 'updated_at'])
+
+        if len(events) < batch_size:
+            break
+
+    if totals['events']:
+        logger.debug(f"Projected punch events: {totals}")
+    return totals
+
+
+def rebuild_attendance(since: Optional[datetime.date] = None, batch_size: int = 50000) -> Dict[str, int]:
+    """
+    Rebuild attendance from the event log.
+
+    Attendance dated on or after ``since`` (all of it by default) is
+    deleted and the events from that date on are replayed in timestamp
+    order, then any events logged meanwhile are projected as usual.
+
+    Args:
+        since (date, optional): First attendance date to rebuild
+        batch_size (int): Events replayed per transaction
+
+    Returns:
+        Dict[str, int]: Counts of events replayed and attendance rows created
+    """
+    totals = {'events': 0, 'created': 0, 'updated': 0, 'removed': 0}
+    ProjectionCheckpoint.objects.get_or_create(name=CHECKPOINT)
+
+    with transaction.atomic():
+        checkpoint = ProjectionCheckpoint.objects.select_for_update().get(name=CHECKPOINT)
+        attendance = Attendance.objects.all()
+        events = PunchEvent.objects.filter(id__lte=checkpoint.last_event_id)
+        if since is not None:
+            attendance = attendance.filter(date__gte=since)
+            events = events.filter(timestamp__gte=timezone.make_aware(
+                datetime.datetime.combine(since, datetime.time.min)
+            ))
+        first = attendance.aggregate(first=Min('date'))['first']
+        deleted, _ = attendance.delete()
+        if first is not None:
+            invalidate_range(first, timezone.localdate())
+        logger.info(f"Rebuilding attendance{f' from {since}' if since else ''}: {deleted} rows deleted")
+
+        batch = []
+        for event in events.order_by('timestamp', 'id').values_list(*EVENT_FIELDS, named=True).iterator(chunk_size=batch_size):
+            batch.append(event)
+            if len(batch) >= batch_size:
+                for key, value in _apply_events(batch).items():
+                    totals[key] += value
+                totals['events'] += len(batch)
+                batch = []
+        for key, value in _apply_events(batch).items():
+            totals[key] += value
+        totals['events'] += len(batch)
+
+    for key, value in project_events(batch_size).items():
+        totals[key] += value
+    return totals
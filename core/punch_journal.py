@@ -0,0 +1,101 @@
+# core/punch_journal.py
+import json
+import os
+import threading
+from typing import List, Tuple
+
+
+class PunchJournal:
+    """
+    Append-only local journal of punches recorded by a terminal.
+
+    Each punch is one JSON line, fsynced before the door is released. A
+    separate cursor file records how far the journal has been synced to the
+    server, so unsynced punches survive restarts and outages.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self.cursor_path = f'{self.path}.cursor'
+        self._lock = threading.Lock()
+
+    def append(self, punch: dict) -> None:
+        """Durably append a punch to the journal."""
+        line = json.dumps(punch, separators=(',', ':')) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as handle:
+                handle.write(line)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def _read_cursor(self) -> int:
+        try:
+            with open(self.cursor_path, encoding='utf-8') as handle:
+                return int(handle.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def pending(self, limit: int = 500) -> Tuple[List[dict], int]:
+        """
+        Read punches not yet synced.
+
+        Args:
+            limit (int): Maximum number of punches to return
+
+        Returns:
+            Tuple[List[dict], int]: Punches and the offset to commit once they are synced
+        """
+        with self._lock:
+            offset = self._read_cursor()
+            punches = []
+            try:
+                with open(self.path, 'rb') as handle:
+                    handle.seek(offset)
+                    while len(punches) < limit:
+                        line = handle.readline()
+                        # A partial last line is still being written
+                        if not line.endswith(b'\n'):
+                            break
+                        offset += len(line)
+                        if line.strip():
+                            punches.append(json.loads(line))
+            except FileNotFoundError:
+                pass
+            return punches, offset
+
+    def commit(self, offset: int) -> None:
+        """Mark everything before ``offset`` as synced."""
+        with self._lock:
+            tmp_path = f'{self.cursor_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as handle:
+                handle.write(str(offset))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(tmp_path, self.cursor_path)
+
+    def quarantine(self, punches: List[dict]) -> None:
+        """
+        Set punches the server rejected aside in the ``.rejected`` file.
+
+        They are kept for inspection but no longer sent, so one bad punch
+        cannot hold up the journal behind it.
+        """
+        if not punches:
+            return
+        lines = ''.join(json.dumps(punch, separators=(',', ':')) + '\n' for punch in punches)
+        with self._lock:
+            with open(f'{self.path}.rejected', 'a', encoding='utf-8') as handle:
+                handle.write(lines)
+                handle.flush()
+                os.fsync(handle.fileno())
+
+    def pending_count(self) -> int:
+        """Number of punches waiting to be synced."""
+        with self._lock:
+            offset = self._read_cursor()
+            try:
+                with open(self.path, 'rb') as handle:
+                    handle.seek(offset)
+                    return sum(1 for line in handle if line.endswith(b'\n') and line.strip())
+            except FileNotFoundError:
+                return 0
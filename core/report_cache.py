@@ -0,0 +1,66 @@
+# core/report_cache.py
+import datetime
+from typing import Iterable
+
+from django.conf import settings
+
+
+def _key(month: datetime.date) -> str:
+    return f'report-version:{month:%Y-%m}'
+
+
+def get_cache_timeout() -> int:
+    """Seconds rendered report fragments are kept, from REPORT_CACHE['TIMEOUT']"""
+    return settings.REPORT_CACHE.get('TIMEOUT', 86400)
+
+
+def month_version(month_date: datetime.date) -> int:
+    """
+    Data version of a month's attendance and salaries.
+
+    Cached report fragments include the version in their key, so a new
+    version makes every fragment of the month miss without deleting it.
+    Versions live in the DataVersion table, where every process sees the
+    same one; a month that never had one is given a new version rather
+    than a fixed default.
+    """
+    from core.models import DataVersion
+
+    key = _key(month_date.replace(day=1))
+    return DataVersion.objects.ensure([key])[key]
+
+
+def range_version(start: datetime.date, end: datetime.date) -> str:
+    """Versions of every month in a date range, for fragments spanning months"""
+    keys, month = [], start.replace(day=1)
+    while month <= end:
+        keys.append(_key(month))
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    from core.models import DataVersion
+
+    versions = DataVersion.objects.ensure(keys)
+    return '-'.join(str(versions[key]) for key in keys)
+
+
+def invalidate_months(dates: Iterable[datetime.date]):
+    """
+    Give the months of the given dates a new data version.
+
+    The version is written in the surrounding transaction, so other
+    processes see it together with the data it covers and cannot cache
+    the old data under the new version.
+    """
+    from core.models import DataVersion
+
+    keys = sorted({_key(date.replace(day=1)) for date in dates})
+    if keys:
+        DataVersion.objects.bump(keys)
+
+
+def invalidate_range(start: datetime.date, end: datetime.date):
+    """Give every month from ``start`` to ``end`` a new data version"""
+    months, month = [], start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+    invalidate_months(months)
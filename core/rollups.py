@@ -0,0 +1,284 @@
+# core/rollups.py
+import datetime
+import json
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from core.models import Attendance, AttendanceBitmap, DailyAttendanceRollup, Employee, SalaryConfiguration
+from core.payroll import attendance_columns, load_month_attendance, work_windows
+from core.report_cache import invalidate_months, month_version
+from core.schedules import ShiftSchedule
+
+logger = logging.getLogger(__name__)
+
+# Seconds a rendered heatmap is served from the cache; refreshed rollups
+# invalidate it immediately, this only bounds staleness of the employee list
+HEATMAP_CACHE_TTL = 300
+
+
+def _first_sessions(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Reduce sessions to each employee's first check-in per day, flagged late
+    when it is after the start of the employee's working hours.
+    """
+    if not len(columns['employee']):
+        return {'employee': np.zeros(0, dtype=np.int64), 'day': np.zeros(0, dtype=np.int64),
+                'check_in': np.zeros(0), 'late': np.zeros(0, dtype=bool)}
+
+    order = np.lexsort((columns['check_in'], columns['day'], columns['employee']))
+    employee, day, check_in = columns['employee'][order], columns['day'][order], columns['check_in'][order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (employee[1:] != employee[:-1]) | (day[1:] != day[:-1])
+    employee, day, check_in = employee[first], day[first], check_in[first]
+
+    late = np.zeros(len(employee), dtype=bool)
+    configs = SalaryConfiguration.objects.index()
+    if configs:
+        schedule = ShiftSchedule.load(datetime.date.fromordinal(int(day.min())), datetime.date.fromordinal(int(day.max())))
+        _, work_start, _ = work_windows(employee, day, configs, schedule)
+        late = check_in > work_start
+    return {'employee': employee, 'day': day, 'check_in': check_in, 'late': late}
+
+
+def refresh_daily_rollups(dates: Iterable[datetime.date]) -> int:
+    """
+    Recompute the company-wide rollups of the given dates.
+
+    Args:
+        dates (Iterable[date]): Dates to recompute
+
+    Returns:
+        int: Number of dates recomputed
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return 0
+
+    sessions = _first_sessions(attendance_columns(Attendance.objects.filter(
+        date__in=dates, check_in__isnull=False, check_out__isnull=False
+    ).values_list('employee_id', 'date', 'check_in', 'check_out')))
+
+    rollups = []
+    for date in dates:
+        on_date = sessions['day'] == date.toordinal()
+        present = int(on_date.sum())
+        average = None
+        if present:
+            seconds = int(sessions['check_in'][on_date].mean()) % 86400
+            average = datetime.time(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+        rollups.append(DailyAttendanceRollup(
+            date=date,
+            present_count=present,
+            late_count=int(sessions['late'][on_date].sum()),
+            average_check_in=average
+        ))
+
+    with transaction.atomic():
+        DailyAttendanceRollup.objects.filter(date__in=dates).delete()
+        DailyAttendanceRollup.objects.bulk_create(rollups, batch_size=1000)
+        invalidate_months(dates)
+    return len(rollups)
+
+
+def refresh_bitmaps(month_date: datetime.date, employee_pks: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute employees' presence and lateness bitmaps for a month.
+
+    Args:
+        month_date (date): Any day in the month
+        employee_pks (Iterable[int], optional): Defaults to every employee
+
+    Returns:
+        int: Number of bitmaps stored
+    """
+    month = month_date.replace(day=1)
+    if employee_pks is not None:
+        employee_pks = list(employee_pks)
+    sessions = _first_sessions(load_month_attendance(month, employee_pks))
+
+    employees, index = np.unique(sessions['employee'], return_inverse=True)
+    bits = np.left_shift(np.int64(1), sessions['day'] - month.toordinal())
+    present = np.zeros(len(employees), dtype=np.int64)
+    late = np.zeros(len(employees), dtype=np.int64)
+    np.bitwise_or.at(present, index, bits)
+    np.bitwise_or.at(late, index, np.where(sessions['late'], bits, 0))
+
+    with transaction.atomic():
+        stale = AttendanceBitmap.objects.filter(month=month)
+        if employee_pks is not None:
+            stale = stale.filter(employee_id__in=employee_pks)
+        stale.delete()
+        AttendanceBitmap.objects.bulk_create([
+            AttendanceBitmap(employee_id=int(pk), month=month, present=int(present_bits), late=int(late_bits))
+            for pk, present_bits, late_bits in zip(employees, present, late)
+        ], batch_size=5000)
+        invalidate_months([month])
+    return len(employees)
+
+
+def refresh_rollups(start: datetime.date, end: datetime.date, employee_pks: Optional[Iterable[int]] = None) -> Dict[str, int]:
+    """
+    Recompute daily rollups and monthly bitmaps over a date range.
+
+    Daily rollups are recomputed for every date in the range; bitmaps for
+    the months the range touches, of ``employee_pks`` only if given.
+
+    Returns:
+        Dict[str, int]: Counts of ``days`` and ``bitmaps`` stored
+    """
+    if employee_pks is not None:
+        employee_pks = list(employee_pks)
+    stats = {
+        'days': refresh_daily_rollups(start + datetime.timedelta(days=offset) for offset in range((end - start).days + 1)),
+        'bitmaps': 0,
+    }
+    month = start.replace(day=1)
+    while month <= end:
+        stats['bitmaps'] += refresh_bitmaps(month, employee_pks)
+        month = (month + datetime.timedelta(days=32)).replace(day=1)
+
+    logger.info(f"Refreshed attendance rollups from {start} to {end}: {stats}")
+    return stats
+
+
+_pending_dates: Set[datetime.date] = set()
+_pending_bitmaps: Set[Tuple[datetime.date, int]] = set()
+_pending_lock = threading.Lock()
+# True from submitting a refresh until it takes the pending sets
+_refresh_queued = False
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _pending_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rollups')
+        return _executor
+
+
+def defer_rollups(dates: Iterable[datetime.date], employee_pks: Iterable[int]):
+    """
+    Refresh rollups in a background thread once the current transaction commits.
+
+    The daily rollups of ``dates`` are recomputed, and the bitmaps of
+    ``employee_pks`` for the months of ``dates``. Refreshes queued while
+    one is waiting are merged into it, so a burst of punches costs one
+    recompute per date rather than one per punch. Dates of a failed
+    refresh stay pending and are retried with the next one queued.
+    """
+    dates, employee_pks = set(dates), set(employee_pks)
+    if not dates:
+        return
+
+    def queue():
+        global _refresh_queued
+        with _pending_lock:
+            _pending_dates.update(dates)
+            _pending_bitmaps.update((date.replace(day=1), pk) for date in dates for pk in employee_pks)
+            submit, _refresh_queued = not _refresh_queued, True
+        if submit:
+            _get_executor().submit(_refresh_in_background)
+
+    transaction.on_commit(queue)
+
+
+def refresh_pending_rollups() -> Dict[str, int]:
+    """
+    Recompute the rollups queued by ``defer_rollups``.
+
+    If the refresh fails, the dates and bitmaps it took are put back so
+    the next refresh retries them.
+
+    Returns:
+        Dict[str, int]: Counts of ``days`` and ``bitmaps`` stored
+    """
+    global _refresh_queued
+    with _pending_lock:
+        dates, bitmaps = set(_pending_dates), set(_pending_bitmaps)
+        _pending_dates.clear()
+        _pending_bitmaps.clear()
+        _refresh_queued = False
+
+    try:
+        by_month = defaultdict(set)
+        for month, employee_pk in bitmaps:
+            by_month[month].add(employee_pk)
+        stats = {'days': refresh_daily_rollups(dates), 'bitmaps': 0}
+        for month, employee_pks in by_month.items():
+            stats['bitmaps'] += refresh_bitmaps(month, employee_pks)
+    except Exception:
+        with _pending_lock:
+            _pending_dates.update(dates)
+            _pending_bitmaps.update(bitmaps)
+        raise
+    return stats
+
+
+def _refresh_in_background() -> None:
+    close_old_connections()
+    try:
+        refresh_pending_rollups()
+    except Exception:
+        logger.exception("Deferred rollup refresh failed")
+    finally:
+        close_old_connections()
+
+
+def build_heatmap(month_date: datetime.date) -> dict:
+    """
+    Daily rollups and every active employee's bitmaps for a month.
+
+    Employees are returned as columns rather than one object each, which
+    keeps the payload for thousands of employees compact.
+    """
+    month = month_date.replace(day=1)
+    days = ((month + datetime.timedelta(days=32)).replace(day=1) - month).days
+
+    bitmaps = {
+        pk: (present, late) for pk, present, late in
+        AttendanceBitmap.objects.filter(month=month).values_list('employee_id', 'present', 'late')
+    }
+    employees = list(Employee.objects.filter(is_active=True).order_by('employee_id').values_list('pk', 'employee_id'))
+    empty = (0, 0)
+
+    return {
+        'status': 'success',
+        'month': f'{month:%Y-%m}',
+        'days': days,
+        'daily': [
+            {
+                'date': date.isoformat(),
+                'present': present,
+                'late': late,
+                'average_check_in': average.strftime('%H:%M') if average else None,
+            }
+            for date, present, late, average in DailyAttendanceRollup.objects.filter(
+                date__range=(month, month + datetime.timedelta(days=days - 1))
+            ).values_list('date', 'present_count', 'late_count', 'average_check_in')
+        ],
+        'employees': {
+            'employee': [pk for pk, _ in employees],
+            'employee_id': [employee_id for _, employee_id in employees],
+            'present': [bitmaps.get(pk, empty)[0] for pk, _ in employees],
+            'late': [bitmaps.get(pk, empty)[1] for pk, _ in employees],
+        }
+    }
+
+
+def get_heatmap_json(month_date: datetime.date) -> str:
+    """Serialized build_heatmap, cached until the month's rollups are refreshed"""
+    month = month_date.replace(day=1)
+    key = f'heatmap:{month:%Y-%m}:{month_version(month)}'
+    content = cache.get(key)
+    if content is None:
+        content = json.dumps(build_heatmap(month))
+        cache.set(key, content, HEATMAP_CACHE_TTL)
+    return content
@@ -0,0 +1,284 @@
+# core/scanner_health.py
+import collections
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.fingerprint_utils import FingerprintError, FingerprintScanner
+
+logger = logging.getLogger(__name__)
+
+# Probes kept for latency percentiles and the error rate
+HEALTH_WINDOW = 100
+
+
+class ScannerUnavailable(FingerprintError):
+    """Raised when the scanner is disconnected and the monitor is reconnecting"""
+    pass
+
+
+def get_health_path() -> str:
+    """Return the configured scanner health file location."""
+    return str(settings.FINGERPRINT_SCANNER['HEALTH_FILE'])
+
+
+def connect_configured_scanner() -> FingerprintScanner:
+    """Open the scanner configured in FINGERPRINT_SCANNER"""
+    config = settings.FINGERPRINT_SCANNER
+    return FingerprintScanner(port=config['PORT'], baudrate=config['BAUDRATE'], timeout=config['TIMEOUT'])
+
+
+class ScannerMonitor:
+    """
+    Owns a scanner connection and keeps it healthy from a background thread.
+
+    The thread issues STATUS every ``interval`` seconds while the scanner
+    is idle, tracks probe latency and failures, and reconnects with
+    exponential backoff once the port disappears or ``failure_limit``
+    probes in a row fail. Callers borrow the connection through
+    ``session()``, which fails at once while the scanner is down instead
+    of paying for a reconnect. Health is written to ``health_path`` every
+    ``interval`` seconds for ``read_health`` in other processes.
+    """
+
+    def __init__(self, connect: Callable[[], FingerprintScanner] = connect_configured_scanner,
+                 interval: float = 5, failure_limit: int = 3, backoff_max: float = 30,
+                 health_path: Optional[str] = None):
+        self.connect = connect
+        self.interval = interval
+        self.failure_limit = failure_limit
+        self.backoff_max = backoff_max
+        self.health_path = health_path
+
+        self._scanner: Optional[FingerprintScanner] = None
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._connected = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._latencies = collections.deque(maxlen=HEALTH_WINDOW)
+        self._outcomes = collections.deque(maxlen=HEALTH_WINDOW)
+        self._consecutive_failures = 0
+        self._disconnects = 0
+        self._last_ok = 0.0
+        self._last_error = ''
+        self._down_since: Optional[float] = time.monotonic()
+        self._backoff = 1.0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def wait_connected(self, timeout: Optional[float] = None) -> bool:
+        """Block until the scanner is connected or ``timeout`` passes"""
+        return self._connected.wait(timeout)
+
+    def start(self) -> bool:
+        """
+        Connect and start the monitor thread.
+
+        Returns:
+            bool: True if the first connection attempt succeeded; otherwise
+            the thread keeps retrying in the background
+        """
+        connected = self._try_connect()
+        self._thread = threading.Thread(target=self._run, name='scanner-monitor', daemon=True)
+        self._thread.start()
+        return connected
+
+    def stop(self) -> None:
+        """Stop the monitor thread and close the scanner"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 15)
+        with self._lock:
+            if self._scanner is not None:
+                self._scanner.clean_scanner()
+                self._scanner = None
+            self._connected.clear()
+
+    @contextlib.contextmanager
+    def session(self) -> Iterator[FingerprintScanner]:
+        """
+        Borrow the connected scanner for a command exchange.
+
+        A FingerprintError raised inside the block is re-raised; if the
+        port has gone with it the scanner is marked down for the monitor
+        to reconnect. Timeouts with the port still present, such as no
+        finger on the sensor, do not count against health.
+
+        Raises:
+            ScannerUnavailable: If the scanner is disconnected
+        """
+        with self._lock:
+            scanner = self._scanner
+            if scanner is None:
+                raise ScannerUnavailable(f"Scanner unavailable: {self._last_error or 'not connected'}")
+            try:
+                yield scanner
+            except FingerprintError as e:
+                if not scanner.is_connected():
+                    self._close(str(e))
+                raise
+            else:
+                self._last_ok = time.monotonic()
+
+    def _try_connect(self) -> bool:
+        try:
+            scanner = self.connect()
+        except FingerprintError as e:
+            with self._state_lock:
+                self._last_error = str(e)
+            return False
+
+        with self._lock:
+            self._scanner = scanner
+            with self._state_lock:
+                down_for = time.monotonic() - self._down_since if self._down_since else 0.0
+                self._down_since = None
+                self._consecutive_failures = 0
+                self._last_ok = time.monotonic()
+                self._backoff = 1.0
+                if self._disconnects or down_for > self.interval:
+                    logger.info(f"Scanner reconnected after {down_for:.1f}s")
+            self._connected.set()
+        return True
+
+    def _close(self, reason: str) -> None:
+        """Drop the connection; callers hold ``_lock``"""
+        if self._scanner is None:
+            return
+        self._scanner.clean_scanner()
+        self._scanner = None
+        self._connected.clear()
+        with self._state_lock:
+            self._down_since = time.monotonic()
+            self._last_error = reason
+            self._disconnects += 1
+        logger.error(f"Scanner disconnected: {reason}")
+
+    def probe(self) -> bool:
+        """
+        Issue STATUS and record its latency and outcome.
+
+        Returns:
+            bool: True if the scanner answered
+        """
+        # Captures in progress hold the port; a recent exchange is proof enough
+        if not self._lock.acquire(timeout=1):
+            return True
+        try:
+            if self._scanner is None:
+                return False
+            started = time.perf_counter()
+            status = self._scanner.get_scanner_status()
+            latency = time.perf_counter() - started
+            ok = status.get('scanner_connected', False)
+
+            with self._state_lock:
+                self._outcomes.append(ok)
+                if ok:
+                    self._latencies.append(latency)
+                    self._consecutive_failures = 0
+                    self._last_ok = time.monotonic()
+                else:
+                    self._consecutive_failures += 1
+                    self._last_error = status.get('error', 'Invalid status response')
+                failures = self._consecutive_failures
+
+            if not self._scanner.is_connected():
+                self._close(f"Port {self._scanner.serial.port} disappeared")
+            elif failures >= self.failure_limit:
+                self._close(f"{failures} status probes failed: {self._last_error}")
+            return ok
+        finally:
+            self._lock.release()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self._scanner is None:
+                if self._try_connect():
+                    delay = self.interval
+                else:
+                    delay = self._backoff
+                    self._backoff = min(self._backoff * 2, self.backoff_max)
+            else:
+                if time.monotonic() - self._last_ok >= self.interval:
+                    self.probe()
+                delay = self.interval
+            self._write_health(stale_after=3 * delay)
+            self._stop.wait(delay)
+
+    def health(self) -> dict:
+        """
+        Current health metrics.
+
+        Returns:
+            dict: Connection state, STATUS latency percentiles in
+            milliseconds, error rate over the last HEALTH_WINDOW probes,
+            consecutive failures, disconnect count and the last error
+        """
+        now = time.monotonic()
+        with self._state_lock:
+            latencies = sorted(self._latencies)
+            outcomes = list(self._outcomes)
+
+            def percentile(fraction: float) -> Optional[float]:
+                if not latencies:
+                    return None
+                return round(latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000, 1)
+
+            return {
+                'connected': self.connected,
+                'updated_at': timezone.now().isoformat(),
+                'down_for': round(now - self._down_since, 1) if self._down_since else 0.0,
+                'seconds_since_ok': round(now - self._last_ok, 1) if self._last_ok else None,
+                'latency_ms_p50': percentile(0.5),
+                'latency_ms_p95': percentile(0.95),
+                'error_rate': round(outcomes.count(False) / len(outcomes), 3) if outcomes else 0.0,
+                'consecutive_failures': self._consecutive_failures,
+                'disconnects': self._disconnects,
+                'last_error': self._last_error,
+            }
+
+    def _write_health(self, stale_after: float) -> None:
+        if not self.health_path:
+            return
+        health = {**self.health(), 'stale_after': stale_after}
+        directory = os.path.dirname(os.path.abspath(self.health_path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.scanner_health-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+                json.dump(health, handle)
+            os.replace(tmp_path, self.health_path)
+        except OSError as e:
+            logger.warning(f"Could not write scanner health: {str(e)}")
+
+
+def read_health(path: Optional[str] = None) -> Optional[dict]:
+    """
+    Read the health last written by a running monitor.
+
+    Returns:
+        Optional[dict]: Health metrics with ``stale`` set if the monitor has
+        missed several writes, or None if there is no health file
+    """
+    path = path or get_health_path()
+    try:
+        with open(path, encoding='utf-8') as handle:
+            health = json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    age = time.time() - os.path.getmtime(path)
+    health['stale'] = age > health.get('stale_after', 15)
+    return health
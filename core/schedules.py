@@ -0,0 +1,181 @@
+# core/schedules.py
+import datetime
+import hashlib
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from django.db.models import Count, Max, Q
+
+from core.models import ShiftAssignment
+
+# Assignments are searched by employee pk * ORDINAL_SPAN + start date ordinal
+ORDINAL_SPAN = 10 ** 7
+OPEN_ENDED = datetime.date.max.toordinal()
+
+
+def _seconds(value: datetime.time) -> int:
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class ShiftSchedule:
+    """
+    Compiled (employee, date) to shift window lookup.
+
+    Assignments are flattened into sorted NumPy arrays once, so resolving
+    a shift is a binary search and whole attendance columns are resolved
+    with a single ``searchsorted``. When assignments overlap, the one that
+    started most recently applies for as long as it lasts.
+
+    Windows are seconds since midnight of the date; a shift that runs past
+    midnight ends after 86400.
+    """
+
+    def __init__(self, assignments: Iterable[Tuple[int, datetime.date, Optional[datetime.date], datetime.time, datetime.time]]):
+        rows = sorted(
+            (employee, start_date.toordinal(), end_date.toordinal() if end_date else OPEN_ENDED, _seconds(start), _seconds(end))
+            for employee, start_date, end_date, start, end in assignments
+        )
+
+        # Flatten each employee's assignments into disjoint date ranges; an
+        # assignment covers earlier ones only while it lasts
+        segments = []
+        for row in rows:
+            employee, first, last = row[:3]
+            kept = []
+            while segments and segments[-1][0] == employee:
+                segment = segments.pop()
+                if segment[2] < first or segment[1] > last:
+                    kept.append(segment)
+                    continue
+                if segment[1] < first:
+                    kept.append((employee, segment[1], first - 1) + segment[3:])
+                if segment[2] > last:
+                    kept.append((employee, last + 1, segment[2]) + segment[3:])
+            kept.append(row)
+            segments.extend(sorted(kept))
+
+        columns = np.array(segments, dtype=np.int64).reshape(-1, 5)
+        self.employee = columns[:, 0]
+        self.start_date = columns[:, 1]
+        self.end_date = columns[:, 2]
+        self.start = columns[:, 3].astype(np.float64)
+        self.end = columns[:, 4].astype(np.float64)
+        self.end[self.end <= self.start] += 86400
+        self._keys = self.employee * ORDINAL_SPAN + self.start_date
+
+    def __len__(self):
+        return len(self._keys)
+
+    @classmethod
+    def load(cls, start: Optional[datetime.date] = None, end: Optional[datetime.date] = None) -> 'ShiftSchedule':
+        """
+        Compile the assignments overlapping a date range in one query.
+
+        Args:
+            start (date, optional): First date needed, defaults to all history
+            end (date, optional): Last date needed, defaults to open-ended
+        """
+        assignments = ShiftAssignment.objects.all()
+        if end is not None:
+            assignments = assignments.filter(start_date__lte=end)
+        if start is not None:
+            assignments = assignments.filter(Q(end_date__isnull=True) | Q(end_date__gte=start))
+        return cls(assignments.values_list(
+            'employee_id', 'start_date', 'end_date', 'shift__start_time', 'shift__end_time'
+        ))
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the compiled assignments, for keying cached results"""
+        digest = hashlib.sha1()
+        for column in (self.employee, self.start_date, self.end_date, self.start, self.end):
+            digest.update(column.tobytes())
+        return digest.hexdigest()[:16]
+
+    def _rows(self, employee: np.ndarray, day: np.ndarray) -> np.ndarray:
+        """Row of the assignment in effect for each (employee, day), -1 for none"""
+        if not len(self._keys):
+            return np.full(len(employee), -1, dtype=np.int64)
+        rows = np.searchsorted(self._keys, employee * ORDINAL_SPAN + day, side='right') - 1
+        clipped = np.maximum(rows, 0)
+        valid = (rows >= 0) & (self.employee[clipped] == employee) & (self.end_date[clipped] >= day)
+        return np.where(valid, rows, -1)
+
+    def windows(self, employee: np.ndarray, day: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Shift windows for attendance columns.
+
+        Args:
+            employee (np.ndarray): Employee pks
+            day (np.ndarray): Date ordinals
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Start and end seconds,
+            and a mask of the records that have a scheduled shift
+        """
+        rows = self._rows(np.asarray(employee, dtype=np.int64), np.asarray(day, dtype=np.int64))
+        scheduled = rows >= 0
+        clipped = np.maximum(rows, 0)
+        if not len(self._keys):
+            zeros = np.zeros(len(rows))
+            return zeros, zeros, scheduled
+        return self.start[clipped], self.end[clipped], scheduled
+
+    def window(self, employee_pk: int, date: datetime.date) -> Optional[Tuple[float, float]]:
+        """Shift window of one employee on one date, or None if unscheduled"""
+        row = int(self._rows(np.array([employee_pk]), np.array([date.toordinal()]))[0])
+        if row < 0:
+            return None
+        return float(self.start[row]), float(self.end[row])
+
+    def employees_near(self, date: datetime.date, seconds: float, margin: float) -> List[int]:
+        """
+        Employees whose shift on ``date`` starts or ends within ``margin`` seconds of ``seconds``.
+
+        Shifts that started the day before and run past midnight are
+        included, so night-shift check-outs are found too.
+        """
+        near = set()
+        for day, offset in ((date, 0), (date - datetime.timedelta(days=1), 86400)):
+            ordinal = day.toordinal()
+            active = (self.start_date <= ordinal) & (self.end_date >= ordinal)
+            employees = np.unique(self.employee[active])
+            starts, ends, scheduled = self.windows(employees, np.full(len(employees), ordinal))
+            moment = seconds + offset
+            hit = scheduled & ((np.abs(starts - moment) <= margin) | (np.abs(ends - moment) <= margin))
+            near.update(employees[hit].tolist())
+        return sorted(near)
+
+
+# Seconds between checks for edited shifts or assignments
+SCHEDULE_CHECK_INTERVAL = 30
+
+_schedule: Optional[ShiftSchedule] = None
+_schedule_stamp = None
+_schedule_checked = 0.0
+_schedule_lock = threading.Lock()
+
+
+def get_schedule() -> ShiftSchedule:
+    """
+    Process-wide compiled schedule of all assignments.
+
+    Lookups are served from memory. At most every SCHEDULE_CHECK_INTERVAL
+    seconds one aggregate query checks whether shifts or assignments
+    changed, and the schedule is recompiled if they did.
+    """
+    global _schedule, _schedule_stamp, _schedule_checked
+    with _schedule_lock:
+        if _schedule is not None and time.monotonic() - _schedule_checked < SCHEDULE_CHECK_INTERVAL:
+            return _schedule
+
+        stamp = tuple(ShiftAssignment.objects.aggregate(
+            count=Count('id'), updated=Max('updated_at'), shift_updated=Max('shift__updated_at')
+        ).values())
+        if _schedule is None or stamp != _schedule_stamp:
+            _schedule = ShiftSchedule.load()
+            _schedule_stamp = stamp
+        _schedule_checked = time.monotonic()
+        return _schedule
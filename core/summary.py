@@ -0,0 +1,67 @@
+# core/summary.py
+import datetime
+from typing import Iterable, List, Optional
+
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+from core.models import Attendance, Employee
+
+WORKED = ExpressionWrapper(F('check_out') - F('check_in'), output_field=DurationField())
+
+
+def summarize_attendance(start: datetime.date, end: datetime.date,
+                         employee_pks: Optional[Iterable[int]] = None) -> List[dict]:
+    """
+    Present days, worked duration and attendance percentage per employee.
+
+    Attendance is aggregated in one grouped query, with durations summed
+    by the database, so the cost does not grow with Python-side loops over
+    records. Employees without attendance in the range are included with
+    zero present days.
+
+    Args:
+        start (date): First date of the range
+        end (date): Last date of the range
+        employee_pks (Iterable[int], optional): Defaults to all active employees
+
+    Returns:
+        List[dict]: One row per employee with ``present_days``,
+        ``absent_days``, ``worked`` (timedelta) and ``attendance_percentage``
+    """
+    employees = Employee.objects.all()
+    records = Attendance.objects.filter(date__range=(start, end))
+    if employee_pks is None:
+        employees = employees.filter(is_active=True)
+        records = records.filter(employee__is_active=True)
+    else:
+        employee_pks = list(employee_pks)
+        employees = employees.filter(pk__in=employee_pks)
+        records = records.filter(employee_id__in=employee_pks)
+
+    # Several sessions on one date are one present day
+    totals = {
+        row['employee']: row
+        for row in records.values('employee').annotate(
+            present_days=Count('date', distinct=True),
+            worked=Sum(WORKED, filter=Q(check_in__isnull=False, check_out__isnull=False)),
+        ).order_by()
+    }
+
+    total_days = max((end - start).days + 1, 0)
+    summary = []
+    for pk, employee_id, first_name, last_name in employees.order_by('employee_id').values_list(
+        'pk', 'employee_id', 'user__first_name', 'user__last_name'
+    ):
+        row = totals.get(pk, {})
+        present_days = row.get('present_days', 0)
+        summary.append({
+            'employee': pk,
+            'employee_id': employee_id,
+            'name': f"{first_name} {last_name}".strip(),
+            'total_days': total_days,
+            'present_days': present_days,
+            'absent_days': total_days - present_days,
+            'worked': row.get('worked') or datetime.timedelta(),
+            'attendance_percentage': (present_days / total_days) * 100 if total_days > 0 else 0,
+        })
+    return summary
@@ -0,0 +1,379 @@
+# core/template_pack.py
+import contextlib
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+PACK_MAGIC = b'BATP'
+PACK_VERSION = 1
+
+# Sensor character files are 512 bytes; shorter templates are zero padded
+TEMPLATE_SIZE = 512
+
+# magic, version, template size, record count, content hash
+HEADER_FORMAT = '<4sHHQ32s'
+HEADER_SIZE = 64
+
+RECORD_DTYPE = np.dtype([
+    ('employee', '<i8'),
+    ('length', '<u4'),
+    ('template', 'u1', (TEMPLATE_SIZE,)),
+])
+
+EMPTY_DIGEST = b'\x00' * 32
+
+
+class TemplatePackError(Exception):
+    """Raised when a template pack is missing, corrupt or of the wrong version"""
+    pass
+
+
+def get_pack_path() -> str:
+    """Return the configured template pack location."""
+    return str(settings.FINGERPRINT_MATCHER['TEMPLATE_PACK'])
+
+
+def _chain_digest(digest: bytes, data: bytes) -> bytes:
+    """
+    Extend the running content hash with a block of records.
+
+    The hash is chained record by record so that appending one template
+    only hashes the new record, whatever block sizes wrote the rest.
+    """
+    view = memoryview(data)
+    for start in range(0, len(view), RECORD_DTYPE.itemsize):
+        digest = hashlib.sha256(digest + view[start:start + RECORD_DTYPE.itemsize]).digest()
+    return digest
+
+
+def _pack_header(count: int, digest: bytes) -> bytes:
+    header = struct.pack(HEADER_FORMAT, PACK_MAGIC, PACK_VERSION, TEMPLATE_SIZE, count, digest)
+    return header.ljust(HEADER_SIZE, b'\x00')
+
+
+def _read_header(handle) -> Tuple[int, bytes]:
+    """
+    Read and validate a pack header.
+
+    Returns:
+        Tuple[int, bytes]: Record count and content hash
+
+    Raises:
+        TemplatePackError: If the header is not a supported pack header
+    """
+    raw = handle.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        raise TemplatePackError("Template pack header is truncated")
+
+    magic, version, template_size, count, digest = struct.unpack_from(HEADER_FORMAT, raw)
+    if magic != PACK_MAGIC:
+        raise TemplatePackError("Not a template pack")
+    if version != PACK_VERSION or template_size != TEMPLATE_SIZE:
+        raise TemplatePackError(
+            f"Unsupported template pack version {version} (template size {template_size})"
+        )
+    return count, digest
+
+
+def _to_records(items: Iterable[Tuple[int, bytes]]) -> np.ndarray:
+    """Convert (employee pk, template) pairs into fixed-width records."""
+    items = list(items)
+    records = np.zeros(len(items), dtype=RECORD_DTYPE)
+    for row, (employee_pk, template) in enumerate(items):
+        template = bytes(template)
+        if len(template) > TEMPLATE_SIZE:
+            raise TemplatePackError(
+                f"Template for employee {employee_pk} is {len(template)} bytes, "
+                f"pack records hold {TEMPLATE_SIZE}"
+            )
+        records[row]['employee'] = employee_pk
+        records[row]['length'] = len(template)
+        records[row]['template'][:len(template)] = np.frombuffer(template, dtype=np.uint8)
+    return records
+
+
+@contextlib.contextmanager
+def pack_lock(path: str) -> Iterator[None]:
+    """
+    Hold the exclusive lock every writer of a pack takes.
+
+    The lock is on a sibling ``.lock`` file rather than the pack itself:
+    a rewrite replaces the pack's inode, so a lock on the old inode would
+    not stop an append from writing into the file being replaced.
+    """
+    with open(f'{path}.lock', 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def write_template_pack(path: str, items: Iterable[Tuple[int, bytes]], chunk_size: int = 2000) -> int:
+    """
+    Write a new template pack, atomically replacing any existing file.
+
+    Args:
+        path (str): Destination file
+        items (Iterable[Tuple[int, bytes]]): Employee pk and template pairs
+        chunk_size (int): Number of records converted per write
+
+    Returns:
+        int: Number of records written
+    """
+    with pack_lock(path):
+        return _write_pack(path, items, chunk_size)
+
+
+def _write_pack(path: str, items: Iterable[Tuple[int, bytes]], chunk_size: int = 2000) -> int:
+    """``write_template_pack`` for callers already holding ``pack_lock``"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.template_pack-')
+    count = 0
+    digest = EMPTY_DIGEST
+
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(_pack_header(0, digest))
+            chunk = []
+            for item in items:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    data = _to_records(chunk).tobytes()
+                    handle.write(data)
+                    digest = _chain_digest(digest, data)
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                data = _to_records(chunk).tobytes()
+                handle.write(data)
+                digest = _chain_digest(digest, data)
+                count += len(chunk)
+
+            handle.seek(0)
+            handle.write(_pack_header(count, digest))
+            handle.flush()
+            os.fsync(handle.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    logger.info(f"Wrote template pack with {count} templates to {path}")
+    return count
+
+
+def build_template_pack(path: Optional[str] = None) -> int:
+    """
+    Compile every enrolled template from the database into a pack.
+
+    Templates are ordered by enrollment quality, best first, so full
+    gallery scans reach the templates that clear the accept threshold
+    reliably before the marginal ones. Enrollments appended since the last
+    build stay at the end until the next one.
+
+    Args:
+        path (str, optional): Destination file, defaults to the configured pack
+
+    Returns:
+        int: Number of templates packed
+    """
+    from core.models import Employee
+
+    templates = Employee.objects.filter(
+        is_active=True,
+        fingerprint_data__isnull=False
+    ).order_by(F('fingerprint_quality').desc(nulls_last=True), 'pk').values_list('pk', 'fingerprint_data')
+
+    return write_template_pack(path or get_pack_path(), templates.iterator(chunk_size=2000))
+
+
+def append_template(employee_pk: int, template: bytes, path: Optional[str] = None) -> None:
+    """
+    Add or replace a single template in an existing pack.
+
+    New enrollments are appended and only the new record is hashed. A
+    re-enrollment overwrites the employee's record in place, which
+    requires rehashing the pack. Runs under ``pack_lock``, like every
+    other pack writer.
+
+    Args:
+        employee_pk (int): Primary key of the enrolled employee
+        template (bytes): Template returned by the scanner
+        path (str, optional): Pack file, defaults to the configured pack
+    """
+    path = path or get_pack_path()
+    data = _to_records([(employee_pk, template)]).tobytes()
+
+    with pack_lock(path):
+        if not os.path.exists(path):
+            _write_pack(path, [(employee_pk, template)])
+            return
+
+        with open(path, 'r+b') as handle:
+            count, digest = _read_header(handle)
+            if count:
+                records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+                existing = np.flatnonzero(records['employee'] == employee_pk)
+                del records
+            else:
+                existing = np.zeros(0, dtype=np.intp)
+
+            if existing.size:
+                handle.seek(HEADER_SIZE + int(existing[0]) * RECORD_DTYPE.itemsize)
+                handle.write(data)
+                handle.flush()
+                handle.seek(HEADER_SIZE)
+                digest = _hash_records(handle, count)
+            else:
+                handle.seek(HEADER_SIZE + count * RECORD_DTYPE.itemsize)
+                handle.write(data)
+                handle.truncate()
+                digest = _chain_digest(digest, data)
+                count += 1
+
+            handle.flush()
+            os.fsync(handle.fileno())
+
+            # Readers size their mapping from the header, so it goes last
+            handle.seek(0)
+            handle.write(_pack_header(count, digest))
+            handle.flush()
+
+
+def remove_template(employee_pk: int, path: Optional[str] = None) -> bool:
+    """
+    Drop an employee's template from the pack by rewriting it.
+
+    Returns:
+        bool: True if the employee had a record in the pack
+    """
+    path = path or get_pack_path()
+    with pack_lock(path):
+        if not os.path.exists(path):
+            return False
+
+        pack = TemplatePack.open(path)
+        row = pack.index.get(employee_pk)
+        if row is None:
+            return False
+
+        keep = [
+            (int(record['employee']), record['template'][:record['length']].tobytes())
+            for record in pack.records
+            if record['employee'] != employee_pk
+        ]
+        pack.close()
+        _write_pack(path, keep)
+    return True
+
+
+def _hash_records(handle, count: int, chunk_size: int = 2000) -> bytes:
+    """Recompute the chained content hash from the handle's current position."""
+    digest = EMPTY_DIGEST
+    remaining = count
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        digest = _chain_digest(digest, handle.read(size * RECORD_DTYPE.itemsize))
+        remaining -= size
+    return digest
+
+
+class TemplatePack:
+    """
+    Read-only, memory-mapped view of a compiled template pack.
+
+    ``templates`` and ``employees`` are zero-copy views into the mapped file,
+    so opening a pack costs the same for ten templates as for fifty thousand.
+    """
+
+    def __init__(self, path: str, count: int, digest: bytes, records: np.ndarray):
+        self.path = path
+        self.count = count
+        self.digest = digest
+        self.records = records
+        self._index: Optional[Dict[int, int]] = None
+
+    @classmethod
+    def open(cls, path: Optional[str] = None) -> 'TemplatePack':
+        """
+        Map a template pack into memory.
+
+        Args:
+            path (str, optional): Pack file, defaults to the configured pack
+
+        Returns:
+            TemplatePack: The mapped pack
+
+        Raises:
+            TemplatePackError: If the pack is missing or invalid
+        """
+        path = path or get_pack_path()
+        try:
+            with open(path, 'rb') as handle:
+                count, digest = _read_header(handle)
+        except FileNotFoundError:
+            raise TemplatePackError(f"Template pack not found at {path}")
+
+        if count:
+            records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+        else:
+            records = np.zeros(0, dtype=RECORD_DTYPE)
+
+        return cls(path, count, digest, records)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def employees(self) -> np.ndarray:
+        """Employee primary keys, one per record."""
+        return self.records['employee']
+
+    @property
+    def templates(self) -> np.ndarray:
+        """Template bytes as a (count, TEMPLATE_SIZE) uint8 array."""
+        return self.records['template']
+
+    @property
+    def index(self) -> Dict[int, int]:
+        """Offset index mapping employee pk to record row."""
+        if self._index is None:
+            self._index = dict(zip(self.employees.tolist(), range(self.count)))
+        return self._index
+
+    @property
+    def content_hash(self) -> str:
+        return self.digest.hex()
+
+    def get_template(self, employee_pk: int) -> Optional[bytes]:
+        """Return the stored template for an employee, if packed."""
+        row = self.index.get(employee_pk)
+        if row is None:
+            return None
+        record = self.records[row]
+        return record['template'][:record['length']].tobytes()
+
+    def verify(self) -> bool:
+        """Check the mapped records against the content hash in the header."""
+        with open(self.path, 'rb') as handle:
+            handle.seek(HEADER_SIZE)
+            return _hash_records(handle, self.count) == self.digest
+
+    def close(self) -> None:
+        """Drop the mapping; it is unmapped once no views reference it."""
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.count = 0
+        self._index = None
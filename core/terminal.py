@@ -0,0 +1,132 @@
+# core/terminal.py
+import json
+import logging
+import os
+import tempfile
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from core.punch_journal import PunchJournal
+from core.template_pack import TemplatePack, TemplatePackError
+
+logger = logging.getLogger(__name__)
+
+
+class TerminalSync:
+    """
+    Keeps a terminal's journal and template pack in step with the server.
+
+    Both directions are best effort: when the server is unreachable the
+    terminal keeps identifying against its cached pack and journaling
+    punches, and the next successful sync sends the backlog in batches.
+    """
+
+    def __init__(self, server_url: str, token: str, journal: PunchJournal, pack_path: str,
+                 batch_size: int = 500, timeout: int = 10):
+        self.server_url = server_url.rstrip('/')
+        self.token = token
+        self.journal = journal
+        self.pack_path = str(pack_path)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.online = False
+
+    def _request(self, path: str, data: Optional[bytes] = None, headers: Optional[dict] = None):
+        request = urllib.request.Request(
+            f'{self.server_url}{path}',
+            data=data,
+            headers={'X-Sync-Token': self.token, **(headers or {})}
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def push(self) -> int:
+        """
+        Send unsynced journal entries to the server's ingest endpoint.
+
+        Returns:
+            int: Number of punches synced
+        """
+        synced = 0
+        while True:
+            punches, offset = self.journal.pending(self.batch_size)
+            if not punches:
+                break
+
+            body = json.dumps({'punches': punches}).encode()
+            try:
+                with self._request('/attendance/ingest/', body, {'Content-Type': 'application/json'}) as response:
+                    result = json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                # The server answered, so this is not an outage
+                self.online = True
+                if e.code == 400:
+                    logger.error(f"Server rejected a batch of {len(punches)} punches, quarantining it: {str(e)}")
+                    self.journal.quarantine([dict(punch, error=str(e)) for punch in punches])
+                    self.journal.commit(offset)
+                    continue
+                # Bad tokens and server errors need fixing on the server; the batch is kept
+                logger.error(f"Punch sync failed: {str(e)}")
+                break
+            except (urllib.error.URLError, OSError, ValueError) as e:
+                if self.online:
+                    logger.warning(f"Server unreachable, working offline: {str(e)}")
+                self.online = False
+                break
+
+            rejected = {entry.get('id'): entry.get('message', '') for entry in result.get('rejected', [])}
+            if rejected:
+                logger.error(f"Server rejected {len(rejected)} punches, quarantining them: {rejected}")
+                self.journal.quarantine([
+                    dict(punch, error=rejected[punch.get('id')]) for punch in punches if punch.get('id') in rejected
+                ])
+
+            self.journal.commit(offset)
+            self.online = True
+            synced += len(punches) - len(rejected)
+            logger.info(f"Synced {len(punches) - len(rejected)} punches: {result}")
+
+        return synced
+
+    def refresh_pack(self) -> bool:
+        """
+        Download the template pack if the server has a newer one.
+
+        Returns:
+            bool: True if a new pack was installed
+        """
+        headers = {}
+        try:
+            headers['If-None-Match'] = f'"{TemplatePack.open(self.pack_path).content_hash}"'
+        except TemplatePackError:
+            pass
+
+        try:
+            with self._request('/template-pack/', headers=headers) as response:
+                directory = os.path.dirname(os.path.abspath(self.pack_path))
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.template_pack-')
+                with os.fdopen(fd, 'wb') as handle:
+                    while chunk := response.read(1 << 20):
+                        handle.write(chunk)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                self.online = True
+            else:
+                logger.error(f"Template pack download failed: {str(e)}")
+            return False
+        except (urllib.error.URLError, OSError) as e:
+            self.online = False
+            logger.warning(f"Could not refresh template pack, using cached copy: {str(e)}")
+            return False
+
+        try:
+            TemplatePack.open(tmp_path)
+        except TemplatePackError as e:
+            os.unlink(tmp_path)
+            logger.error(f"Downloaded template pack is invalid: {str(e)}")
+            return False
+
+        os.replace(tmp_path, self.pack_path)
+        self.online = True
+        logger.info("Installed updated template pack")
+        return True
@@ -1,3 +1,1143 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import urllib.error
+from concurrent.futures import Future
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.analytics import (
+    AnalyticsError, attendance_percentage, export_month, lateness_distribution, load_columns, overtime_trend
+)
+from core.bulk import adjust_base_salaries, close_payroll_month, deactivate_employees, delete_attendance, orphaned_attendance
+from core.directory import VERSION_KEY, lookup_employee
+from core.employee_import import EmployeeImportError, import_employees, read_employee_csv
+from core.enrollment import EnrollmentError, EnrollmentSample, select_template
+from core.fingerprint_utils import (
+    find_duplicate_enrollment, get_candidate_employees, identify_employee, record_attendance, record_punch
+)
+from core.ingest import ingest_punch_stream
+from core.jobs import start_payroll_run
+from core.matcher import ProbeCache, TemplateMatcher
+from core.models import (
+    Attendance, DailyAttendanceRollup, DataVersion, Employee, EmployeeSalary, PayrollRun, ProjectionCheckpoint,
+    PunchEvent, SalaryConfiguration, Shift, ShiftAssignment, calculate_monthly_salary,
+)
+from core.pairing import pair_punches
+from core.payroll import calculate_monthly_salaries, period_months, rollup_salaries
+from core.projector import CHECKPOINT, append_punch_events, project_events
+from core.punch_journal import PunchJournal
+from core.report_cache import invalidate_months, month_version
+from core.rollups import refresh_bitmaps, refresh_daily_rollups, refresh_pending_rollups
+from core.scanner_health import ScannerMonitor, ScannerUnavailable
+from core.summary import summarize_attendance
+from core.template_pack import TemplatePack, TemplatePackError, append_template, remove_template, write_template_pack
+from core.terminal import TerminalSync
+
+
+def make_employee(employee_id='EMP0001', **fields):
+    user = User.objects.create(username=f'{employee_id.lower()}@example.com', first_name='Test', last_name=employee_id)
+    defaults = {
+        'designation': 'Operator',
+        'date_joined': datetime.date(2024, 1, 1),
+        'base_salary': Decimal('3000.00'),
+        'phone_number': '5550001',
+        'emergency_contact': '5550002',
+        'address': '1 Main St',
+    }
+    defaults.update(fields)
+    return Employee.objects.create(user=user, employee_id=employee_id, **defaults)
+
+
+def make_salary_configuration(**fields):
+    defaults = {
+        'hourly_rate': Decimal('20.00'),
+        'late_deduction_rate': Decimal('5.00'),
+        'early_leave_deduction_rate': Decimal('5.00'),
+        'overtime_fixed_rate': Decimal('30.00'),
+    }
+    defaults.update(fields)
+    return SalaryConfiguration.objects.create(**defaults)
+
+
+class SalaryConfigurationIndexTests(TestCase):
+    def test_versions_resolve_by_effective_date(self):
+        old = make_salary_configuration(effective_from=datetime.date(2024, 1, 1))
+        new = make_salary_configuration(effective_from=datetime.date(2024, 3, 1), hourly_rate=Decimal('25.00'))
+        index = SalaryConfiguration.objects.index()
+
+        self.assertEqual(index.for_date(datetime.date(2023, 6, 1)), old)
+        self.assertEqual(index.for_date(datetime.date(2024, 2, 29)), old)
+        self.assertEqual(index.for_date(datetime.date(2024, 3, 1)), new)
+        self.assertEqual(index.between(datetime.date(2024, 2, 1), datetime.date(2024, 3, 31)), [old, new])
+
+    def test_datetimes_are_looked_up_by_their_date(self):
+        make_salary_configuration(effective_from=datetime.date(2024, 1, 1))
+        index = SalaryConfiguration.objects.index()
+
+        moment = datetime.datetime(2024, 2, 1, 12, 30)
+        self.assertEqual(index.for_date(moment), index.for_date(moment.date()))
+        self.assertEqual(len(index.between(moment, moment + datetime.timedelta(days=29))), 1)
+
+
+@mock.patch('core.jobs._get_executor')
+class SalaryReportViewTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        make_employee()
+
+    def test_salary_report_defaults_to_current_month(self, get_executor):
+        response = self.client.get(reverse('salary_report'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['selected_month'], timezone.localdate().replace(day=1))
+        get_executor.return_value.submit.assert_called_once()
+
+    def test_download_defaults_to_current_month(self, get_executor):
+        response = self.client.get(reverse('download_salary_report'))
+
+        # The run is queued, so the download redirects to the report while it computes
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(PayrollRun.objects.filter(month=timezone.localdate().replace(day=1)).exists())
+
+
+class SharedCacheTests(TestCase):
+    def test_month_versions_are_stored_where_other_processes_read_them(self):
+        month = datetime.date(2024, 3, 1)
+        version = month_version(month)
+        self.assertNotEqual(version, 0)
+        self.assertEqual(month_version(month), version)
+
+        invalidate_months([datetime.date(2024, 3, 17)])
+        self.assertNotEqual(month_version(month), version)
+        self.assertEqual(DataVersion.objects.current('report-version:2024-03'), month_version(month))
+
+    def test_directory_reloads_when_another_process_moves_its_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = make_employee()
+        self.assertEqual(lookup_employee(employee.pk).get_full_name(), 'Test EMP0001')
+
+        # A bulk update in another process, which sends no post_save
+        User.objects.filter(pk=employee.user_id).update(first_name='Renamed')
+        DataVersion.objects.bump([VERSION_KEY])
+        self.assertEqual(lookup_employee(employee.pk).get_full_name(), 'Test EMP0001')
+
+        with mock.patch('core.directory.DIRECTORY_CHECK_INTERVAL', 0):
+            self.assertEqual(lookup_employee(employee.pk).get_full_name(), 'Renamed EMP0001')
+
+    def test_directory_lookups_between_checks_run_no_queries(self):
+        employee = make_employee()
+        with self.captureOnCommitCallbacks(execute=True):
+            Employee.objects.filter(pk=employee.pk).first().save()
+        lookup_employee(employee.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup_employee(employee.pk).pk, employee.pk)
+
+    @override_settings(FINGERPRINT_MATCHER={**settings.FINGERPRINT_MATCHER, 'PUNCH_DEDUP_SECONDS': 60})
+    def test_repeat_scan_is_recorded_once(self):
+        employee = make_employee()
+        attendance, status = record_punch(employee, 'main')
+        repeat, repeat_status = record_punch(employee, 'main')
+
+        self.assertEqual((status, repeat_status), ('check_in', 'duplicate'))
+        self.assertEqual(repeat.pk, attendance.pk)
+        self.assertEqual(PunchEvent.objects.count(), 1)
+
+
+class ReportFragmentCacheTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.attendance = Attendance.objects.create(
+            employee=make_employee(), date=datetime.date(2024, 3, 4),
+            check_in=timezone.make_aware(datetime.datetime(2024, 3, 4, 9)),
+            check_out=timezone.make_aware(datetime.datetime(2024, 3, 4, 17)),
+        )
+
+    def render(self):
+        return self.client.get(reverse('attendance_report'), {'start_date': '2024-03-01', 'end_date': '2024-03-31'})
+
+    def test_cached_table_is_served_until_the_month_changes(self):
+        self.assertContains(self.render(), '17:00')
+
+        # A queryset update sends no post_save, so the cached table is still served
+        Attendance.objects.filter(pk=self.attendance.pk).update(
+            check_out=timezone.make_aware(datetime.datetime(2024, 3, 4, 18))
+        )
+        self.assertContains(self.render(), '17:00')
+
+        invalidate_months([datetime.date(2024, 3, 4)])
+        self.assertContains(self.render(), '18:00')
+
+    def test_saving_attendance_invalidates_its_month(self):
+        self.assertContains(self.render(), '17:00')
+
+        self.attendance.check_out = timezone.make_aware(datetime.datetime(2024, 3, 4, 16))
+        self.attendance.save()
+        response = self.render()
+        self.assertContains(response, '16:00')
+        self.assertNotContains(response, '17:00')
+
+
+@mock.patch('core.jobs._get_executor')
+class PayrollRunKeyTests(TestCase):
+    month = datetime.date(2024, 3, 1)
+
+    def setUp(self):
+        make_salary_configuration()
+        self.employee = make_employee()
+
+    def test_completed_run_is_reused_while_nothing_changes(self, get_executor):
+        run = start_payroll_run(self.month)
+        PayrollRun.objects.filter(pk=run.pk).update(status=PayrollRun.STATUS_COMPLETED)
+
+        self.assertEqual(start_payroll_run(self.month).pk, run.pk)
+        self.assertEqual(get_executor.return_value.submit.call_count, 1)
+
+    def test_new_attendance_queues_a_new_run(self, get_executor):
+        run = start_payroll_run(self.month)
+        Attendance.objects.create(
+            employee=self.employee, date=datetime.date(2024, 3, 4),
+            check_in=timezone.make_aware(datetime.datetime(2024, 3, 4, 9)),
+            check_out=timezone.make_aware(datetime.datetime(2024, 3, 4, 17)),
+        )
+
+        self.assertNotEqual(start_payroll_run(self.month).pk, run.pk)
+
+    def test_adjusted_base_salaries_queue_a_new_run_that_pays_them(self, get_executor):
+        calculate_monthly_salaries(self.month)
+        run = start_payroll_run(self.month)
+        adjust_base_salaries(Employee.objects.all(), Decimal('10'))
+
+        self.assertNotEqual(start_payroll_run(self.month).pk, run.pk)
+        salary, = calculate_monthly_salaries(self.month)
+        self.assertEqual(salary.base_salary, Decimal('3300.00'))
+        self.assertEqual(salary.final_salary, Decimal('3300.00'))
+
+
+@override_settings(ATTENDANCE_SYNC={**settings.ATTENDANCE_SYNC, 'TOKEN': 'secret'})
+class IngestAttendanceViewTests(TestCase):
+    def post(self, punches):
+        return self.client.post(
+            reverse('ingest_attendance'), json.dumps({'punches': punches}),
+            content_type='application/json', HTTP_X_SYNC_TOKEN='secret'
+        )
+
+    def test_unknown_and_malformed_punches_do_not_block_the_batch(self):
+        employee = make_employee()
+        response = self.post([
+            {'id': 'good', 'employee': employee.pk, 'timestamp': '2024-03-04T09:00:00+00:00', 'terminal': 'main'},
+            {'id': 'deleted', 'employee': employee.pk + 1000, 'timestamp': '2024-03-04T09:01:00+00:00'},
+            {'id': 'garbled', 'employee': employee.pk, 'timestamp': 'yesterday'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['unknown'], 1)
+        self.assertEqual(sorted(entry['id'] for entry in result['rejected']), ['deleted', 'garbled'])
+        self.assertEqual(list(PunchEvent.objects.values_list('employee_id', flat=True)), [employee.pk])
+
+    def test_bad_token_is_refused(self):
+        response = self.client.post(reverse('ingest_attendance'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class TerminalSyncTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = PunchJournal(os.path.join(directory.name, 'journal.jsonl'))
+        for index in range(3):
+            self.journal.append({'id': f'p{index}', 'employee': 1, 'timestamp': f'2024-03-04T09:0{index}:00+00:00'})
+        self.sync = TerminalSync('http://server', 'secret', self.journal, os.path.join(directory.name, 'pack.bin'))
+
+    def respond(self, body: dict):
+        response = mock.MagicMock()
+        response.__enter__.return_value.read.return_value = json.dumps(body).encode()
+        return response
+
+    def test_rejected_punches_are_quarantined_and_skipped(self):
+        with mock.patch.object(self.sync, '_request', return_value=self.respond({
+            'status': 'success', 'rejected': [{'id': 'p1', 'message': 'Unknown employee 1'}]
+        })), self.assertLogs('core.terminal', 'ERROR'):
+            self.assertEqual(self.sync.push(), 2)
+
+        self.assertEqual(self.journal.pending_count(), 0)
+        with open(f'{self.journal.path}.rejected', encoding='utf-8') as handle:
+            quarantined = [json.loads(line) for line in handle]
+        self.assertEqual([punch['id'] for punch in quarantined], ['p1'])
+        self.assertEqual(quarantined[0]['error'], 'Unknown employee 1')
+
+    def test_http_errors_are_not_treated_as_offline(self):
+        error = urllib.error.HTTPError('http://server/attendance/ingest/', 403, 'Forbidden', {}, None)
+        with mock.patch.object(self.sync, '_request', side_effect=error), self.assertLogs('core.terminal', 'ERROR'):
+            self.assertEqual(self.sync.push(), 0)
+
+        self.assertTrue(self.sync.online)
+        self.assertEqual(self.journal.pending_count(), 3)
+
+    def test_network_errors_keep_the_batch_for_later(self):
+        with mock.patch.object(self.sync, '_request', side_effect=urllib.error.URLError('refused')):
+            self.assertEqual(self.sync.push(), 0)
+
+        self.assertFalse(self.sync.online)
+        self.assertEqual(self.journal.pending_count(), 3)
+
+
+class AppendPunchEventsTests(TestCase):
+    def test_resent_and_repeated_punches_are_counted_as_duplicates(self):
+        employee = make_employee()
+        moment = timezone.make_aware(datetime.datetime(2024, 3, 4, 9, 0))
+        punches = [
+            {'employee': employee.pk, 'timestamp': moment, 'terminal': 'main', 'score': 0.93},
+            {'employee': employee.pk, 'timestamp': moment + datetime.timedelta(hours=8)},
+            {'employee': employee.pk, 'timestamp': moment},
+        ]
+
+        self.assertEqual(append_punch_events(punches), 1)
+        self.assertEqual(append_punch_events(punches), 3)
+
+        events = list(PunchEvent.objects.order_by('timestamp'))
+        self.assertEqual([event.timestamp for event in events], [moment, moment + datetime.timedelta(hours=8)])
+        self.assertEqual((events[0].terminal, events[0].score), ('main', 0.93))
+        self.assertEqual(events[1].terminal, '')
+        self.assertIsNotNone(events[0].recorded_at)
+
+
+class PunchStreamImportTests(TestCase):
+    def test_stream_is_projected_once_after_every_chunk_is_logged(self):
+        make_salary_configuration()
+        make_employee()
+        rows = [
+            {'employee_id': 'EMP0001', 'timestamp': '2024-03-04T09:00:00+00:00', 'terminal': 'main'},
+            {'employee_id': 'EMP0001', 'timestamp': '2024-03-04T17:00:00+00:00', 'terminal': 'main'},
+            {'employee_id': 'EMP0404', 'timestamp': '2024-03-04T09:00:00+00:00', 'terminal': 'main'},
+            {'employee_id': 'EMP0001', 'timestamp': 'yesterday', 'terminal': 'main'},
+        ]
+        progress = []
+
+        with mock.patch('core.ingest.project_events', wraps=project_events) as project:
+            totals = ingest_punch_stream(rows, chunk_size=1, progress=lambda totals: progress.append(dict(totals)))
+
+        project.assert_called_once()
+        self.assertEqual(
+            {key: totals[key] for key in ('read', 'created', 'updated', 'invalid')},
+            {'read': 4, 'created': 1, 'updated': 0, 'invalid': 2}
+        )
+        self.assertEqual(progress[-1]['created'], 1)
+        attendance = Attendance.objects.get()
+        self.assertEqual((attendance.check_in.hour, attendance.check_out.hour), (9, 17))
+
+
+@mock.patch('core.rollups._get_executor')
+class RecordAttendanceTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.check_in = timezone.make_aware(datetime.datetime(2024, 3, 4, 9))
+        self.check_out = self.check_in + datetime.timedelta(hours=8)
+
+    def punch(self, employee, moment):
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            return record_attendance(employee, 'main')
+
+    def test_punches_leave_rollups_out_of_the_request(self, get_executor):
+        employee = make_employee()
+        with CaptureQueriesContext(connection) as check_in_queries:
+            self.assertEqual(self.punch(employee, self.check_in)[1], 'check_in')
+        with CaptureQueriesContext(connection) as check_out_queries:
+            attendance, status = self.punch(employee, self.check_out)
+
+        self.assertEqual((status, attendance.check_out), ('check_out', self.check_out))
+        # Closing a session costs no more than opening one
+        self.assertEqual(len(check_out_queries), len(check_in_queries))
+        for query in check_out_queries.captured_queries:
+            self.assertNotIn('rollup', query['sql'])
+            self.assertNotIn('bitmap', query['sql'])
+
+    def test_busy_database_after_logging_reports_the_punch_as_recorded(self, get_executor):
+        employee = make_employee()
+        with mock.patch('core.fingerprint_utils.project_events', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('core.fingerprint_utils', 'WARNING'):
+                self.assertEqual(self.punch(employee, self.check_in), (None, 'recorded'))
+        self.assertFalse(Attendance.objects.exists())
+
+        # The next punch projects both
+        attendance, status = self.punch(employee, self.check_out)
+        self.assertEqual((status, attendance.check_in, attendance.check_out), ('check_out', self.check_in, self.check_out))
+
+    def test_failed_rollup_refresh_is_retried(self, get_executor):
+        employee = make_employee()
+        self.punch(employee, self.check_in)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.punch(employee, self.check_out)
+
+        with mock.patch('core.rollups.refresh_daily_rollups', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                refresh_pending_rollups()
+        self.assertEqual(refresh_pending_rollups(), {'days': 1, 'bitmaps': 1})
+        self.assertEqual(DailyAttendanceRollup.objects.get(date=self.check_in.date()).present_count, 1)
+
+    def test_rollups_are_refreshed_after_the_commit(self, get_executor):
+        employee = make_employee()
+        with self.captureOnCommitCallbacks(execute=True):
+            attendance, status = self.punch(employee, self.check_in)
+        self.assertEqual(status, 'check_in')
+        get_executor.return_value.submit.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.punch(employee, self.check_out)
+        get_executor.return_value.submit.assert_called_once()
+        self.assertFalse(DailyAttendanceRollup.objects.exists())
+
+        self.assertEqual(refresh_pending_rollups(), {'days': 1, 'bitmaps': 1})
+        self.assertEqual(DailyAttendanceRollup.objects.get(date=self.check_in.date()).present_count, 1)
+
+
+def make_template(seed: int, size: int = 512) -> bytes:
+    return bytes((seed * 131 + index * 7) % 256 for index in range(size))
+
+
+class TemplateMatcherTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'pack.bin')
+        self.templates = {pk: make_template(pk) for pk in range(1, 21)}
+        write_template_pack(self.path, self.templates.items())
+        self.matcher = TemplateMatcher(pack_path=self.path, workers=1, sensor_threshold=50, confirm_batch_size=4)
+
+    def test_sensor_compares_the_best_ranked_template_first(self):
+        compared = []
+
+        def compare(probe, template):
+            compared.append(template)
+            return 80 if template == self.templates[7] else 10
+
+        self.assertEqual(self.matcher.identify(self.templates[7], compare=compare), (7, 80.0))
+        self.assertEqual(compared, [self.templates[7]])
+
+    def test_sensor_rejection_overrides_bit_agreement(self):
+        self.assertEqual(self.matcher.identify(self.templates[3])[0], 3)
+        self.assertIsNone(self.matcher.identify(self.templates[3], compare=lambda probe, template: 0))
+
+    def test_shifted_placement_is_found_through_candidates(self):
+        # A shifted scan of employee 12 scores poorly bit by bit
+        probe = self.templates[12][5:] + bytes(5)
+        self.assertIsNone(self.matcher.identify(probe))
+
+        match = self.matcher.identify(
+            probe, candidates=[12],
+            compare=lambda first, second: 90 if second == self.templates[12] else 0
+        )
+        self.assertEqual(match, (12, 90.0))
+
+    def test_shifted_placement_is_found_without_candidates(self):
+        compared = []
+
+        def compare(probe, template):
+            compared.append(template)
+            return 90 if template == self.templates[12] else 0
+
+        probe = self.templates[12][5:] + bytes(5)
+        self.assertEqual(self.matcher.identify(probe, compare=compare), (12, 90.0))
+
+        # Rejected by the sensor everywhere means every template was compared
+        compared.clear()
+        self.assertIsNone(self.matcher.identify(probe, exclude=12, compare=compare))
+        self.assertEqual(len(compared), len(self.templates) - 1)
+
+    def test_missing_pack_raises_pack_error(self):
+        os.unlink(self.path)
+        with self.assertRaises(TemplatePackError):
+            self.matcher.identify(self.templates[1])
+
+
+class DuplicateEnrollmentTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'pack.bin')
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 11)]
+        self.templates = {employee.pk: make_template(employee.pk) for employee in self.employees}
+        write_template_pack(path, self.templates.items())
+
+        matcher = TemplateMatcher(pack_path=path, workers=1)
+        patcher = mock.patch('core.fingerprint_utils.get_matcher', return_value=matcher)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_finger_enrolled_at_another_placement_is_a_duplicate(self):
+        enrolled, newcomer = self.employees[3], make_employee('EMP0099')
+        shifted = self.templates[enrolled.pk][7:] + bytes(7)
+
+        duplicate = find_duplicate_enrollment(
+            shifted, 'unrelated-hash', newcomer,
+            compare=lambda probe, template: 90 if template == self.templates[enrolled.pk] else 0
+        )
+        self.assertEqual(duplicate, enrolled)
+
+    def test_own_template_is_not_a_duplicate(self):
+        employee = self.employees[3]
+        self.assertIsNone(find_duplicate_enrollment(
+            self.templates[employee.pk], 'unrelated-hash', employee,
+            compare=lambda probe, template: 90 if template == self.templates[employee.pk] else 0
+        ))
+
+
+class SelectTemplateTests(TestCase):
+    def test_blurred_scans_are_reported(self):
+        samples = [EnrollmentSample(make_template(1), 20), EnrollmentSample(make_template(1), 90)]
+        with self.assertRaisesRegex(EnrollmentError, 'Only 1 of 2 scans were clear enough'):
+            select_template(samples, min_samples=2, min_quality=50)
+
+    def test_scans_of_different_fingers_are_reported(self):
+        samples = [EnrollmentSample(make_template(seed), 90) for seed in (1, 2, 3)]
+        with self.assertRaisesRegex(EnrollmentError, 'Only 1 of 3 scans matched each other'):
+            select_template(samples, min_samples=2, compare=lambda first, second: 0, min_agreement=50)
+
+    def test_clearest_agreeing_scan_is_kept_as_is(self):
+        samples = [
+            EnrollmentSample(make_template(1), 60),
+            EnrollmentSample(make_template(2), 95),
+            EnrollmentSample(make_template(3), 70),
+            EnrollmentSample(make_template(4), 99),
+        ]
+        same_finger = {make_template(seed) for seed in (1, 2, 3)}
+
+        enrolled = select_template(
+            samples, min_samples=2, min_agreement=50,
+            compare=lambda first, second: 90 if {first, second} <= same_finger else 0
+        )
+        self.assertEqual(enrolled.template, make_template(2))
+        self.assertEqual((enrolled.samples, enrolled.rejected, enrolled.quality), (3, 1, 75))
+
+
+class TemplatePackWriterTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'pack.bin')
+
+    def test_concurrent_writers_lose_no_templates(self):
+        def append(pk):
+            append_template(pk, make_template(pk), self.path)
+
+        def rewrite():
+            write_template_pack(self.path, [(100, make_template(100))])
+
+        threads = [threading.Thread(target=append, args=(pk,)) for pk in range(1, 9)]
+        threads.insert(4, threading.Thread(target=rewrite))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Appends that ran before the rewrite are replaced by it, but the
+        # pack is never torn and the rewrite is never written over
+        pack = TemplatePack.open(self.path)
+        self.assertTrue(pack.verify())
+        self.assertEqual(pack.get_template(100), make_template(100))
+        self.assertEqual(len(pack), len(pack.index))
+
+    def test_appends_to_a_missing_pack_are_all_kept(self):
+        threads = [threading.Thread(target=append_template, args=(pk, make_template(pk), self.path)) for pk in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        pack = TemplatePack.open(self.path)
+        self.assertEqual(sorted(pack.index), list(range(1, 9)))
+        self.assertTrue(pack.verify())
+
+    def test_reenrollment_and_removal_keep_the_hash_valid(self):
+        write_template_pack(self.path, [(1, make_template(1)), (2, make_template(2))])
+        append_template(1, make_template(9), self.path)
+        self.assertEqual(TemplatePack.open(self.path).get_template(1), make_template(9))
+
+        self.assertTrue(remove_template(2, self.path))
+        pack = TemplatePack.open(self.path)
+        self.assertEqual(list(pack.index), [1])
+        self.assertTrue(pack.verify())
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime.datetime:
+    return timezone.make_aware(datetime.datetime(2024, 3, day, hour, minute))
+
+
+@mock.patch('core.schedules.SCHEDULE_CHECK_INTERVAL', 0)
+class ShiftScheduleTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.employee = make_employee()
+        night = Shift.objects.create(name='Night', start_time=datetime.time(22), end_time=datetime.time(6))
+        ShiftAssignment.objects.create(employee=self.employee, shift=night, start_date=datetime.date(2024, 3, 1))
+        self.attendance = Attendance.objects.create(
+            employee=self.employee, date=datetime.date(2024, 3, 4), check_in=at(4, 22, 30), check_out=at(5, 7)
+        )
+
+    def test_hours_follow_the_assigned_shift_past_midnight(self):
+        self.attendance.compute_hours()
+        self.assertEqual(
+            (self.attendance.late_hours, self.attendance.early_leave_hours, self.attendance.overtime_hours),
+            (Decimal('0.50'), Decimal('0.00'), Decimal('1.00'))
+        )
+
+    def test_check_out_response_does_not_save_the_session(self):
+        with mock.patch('core.fingerprint_utils.FingerprintScanner'), \
+                mock.patch('core.fingerprint_utils.identify_employee', return_value=(self.employee, 90.0)), \
+                mock.patch('core.fingerprint_utils.record_punch', return_value=(self.attendance, 'check_out')):
+            response = self.client.get(reverse('process_attendance'))
+
+        self.assertEqual(response.json()['message'], 'Check-out recorded. Overtime: 1.00 hours.')
+        self.assertEqual(Attendance.objects.get().overtime_hours, Decimal('0.00'))
+
+
+@mock.patch('core.schedules.SCHEDULE_CHECK_INTERVAL', 0)
+class CandidateEmployeeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 6)]
+        for employee, moment, terminal in (
+            (self.employees[0], at(6, 9, 10), 'gate'),
+            (self.employees[1], at(7, 9), 'gate'),
+            (self.employees[2], at(7, 9), 'dock'),
+            (self.employees[3], at(7, 15), 'gate'),
+        ):
+            Attendance.objects.create(employee=employee, date=moment.date(), check_in=moment, terminal=terminal)
+        morning = Shift.objects.create(name='Morning', start_time=datetime.time(9, 30), end_time=datetime.time(17))
+        ShiftAssignment.objects.create(employee=self.employees[4], shift=morning, start_date=datetime.date(2024, 3, 1))
+
+    def candidates(self, terminal='gate'):
+        with mock.patch('core.fingerprint_utils.timezone.localtime', return_value=at(8, 9, 5)):
+            return get_candidate_employees(terminal)
+
+    def test_recent_check_ins_at_the_terminal_come_first_then_shifts_near_now(self):
+        self.assertEqual(
+            self.candidates(),
+            [self.employees[1].pk, self.employees[0].pk, self.employees[4].pk]
+        )
+
+    def test_candidates_are_cached_per_terminal(self):
+        self.candidates()
+        Attendance.objects.create(employee=self.employees[3], date=datetime.date(2024, 3, 6), check_in=at(6, 9, 20),
+                                  terminal='gate')
+        self.assertNotIn(self.employees[3].pk, self.candidates())
+        self.assertEqual(self.candidates('dock'), [self.employees[2].pk, self.employees[4].pk])
+
+
+class PairPunchesTests(TestCase):
+    def test_night_shift_is_one_session_across_midnight(self):
+        sessions = list(pair_punches([at(4, 22), at(5, 6)]))
+        self.assertEqual([(session.check_in, session.check_out) for session in sessions], [(at(4, 22), at(5, 6))])
+
+    def test_double_scans_are_dropped(self):
+        sessions = list(pair_punches(
+            [at(4, 9), at(4, 9) + datetime.timedelta(seconds=20), at(4, 17)],
+            repeat=datetime.timedelta(seconds=60)
+        ))
+        self.assertEqual([(session.check_in, session.check_out) for session in sessions], [(at(4, 9), at(4, 17))])
+
+    def test_forgotten_check_out_leaves_the_session_open(self):
+        sessions = list(pair_punches([at(4, 9), at(5, 9), at(5, 17)], max_session=datetime.timedelta(hours=16)))
+        self.assertEqual(
+            [(session.check_in, session.check_out) for session in sessions],
+            [(at(4, 9), None), (at(5, 9), at(5, 17))]
+        )
+
+
+class ProjectorTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.employee = make_employee()
+
+    def punch(self, *moments):
+        append_punch_events({'employee': self.employee.pk, 'timestamp': moment, 'terminal': 'main'} for moment in moments)
+
+    def test_checkpoint_applies_each_event_once(self):
+        self.punch(at(4, 22), at(5, 6))
+        self.assertEqual(project_events(), {'events': 2, 'created': 1, 'updated': 0, 'removed': 0})
+        self.assertEqual(
+            ProjectionCheckpoint.objects.get(name=CHECKPOINT).last_event_id,
+            PunchEvent.objects.order_by('-id').values_list('id', flat=True)[0]
+        )
+        self.assertEqual(project_events()['events'], 0)
+
+        # The night shift is one row dated by its check-in
+        attendance = Attendance.objects.get()
+        self.assertEqual((attendance.date, attendance.check_out), (datetime.date(2024, 3, 4), at(5, 6)))
+
+    def test_late_check_out_closes_the_session_in_a_later_batch(self):
+        self.punch(at(4, 9))
+        project_events()
+        self.punch(at(4, 9, 0) + datetime.timedelta(seconds=30), at(4, 17))
+        self.assertEqual(project_events()['updated'], 1)
+
+        attendance = Attendance.objects.get()
+        self.assertEqual((attendance.check_in, attendance.check_out), (at(4, 9), at(4, 17)))
+        self.assertEqual(DailyAttendanceRollup.objects.get(date=datetime.date(2024, 3, 4)).present_count, 1)
+
+
+class PayrollEquivalenceTests(TestCase):
+    def test_vectorized_hours_match_the_per_record_calculation(self):
+        make_salary_configuration()
+        employees = [make_employee(f'EMP{number:04d}') for number in range(1, 4)]
+        shifts = [(9, 0, 17, 0), (9, 45, 16, 30), (8, 30, 19, 15)]
+        records = []
+        for employee, (in_hour, in_minute, out_hour, out_minute) in zip(employees, shifts):
+            for day in (4, 5, 6):
+                records.append(Attendance(
+                    employee=employee, date=datetime.date(2024, 3, day),
+                    check_in=at(day, in_hour, in_minute), check_out=at(day, out_hour, out_minute)
+                ))
+                records[-1].calculate_hours()
+
+        expected = {
+            employee.pk: tuple(
+                sum(getattr(record, field) for record in records if record.employee_id == employee.pk)
+                for field in ('late_hours', 'early_leave_hours', 'overtime_hours')
+            ) for employee in employees
+        }
+        actual = {
+            salary.employee_id: (salary.total_late_hours, salary.total_early_leave_hours, salary.total_overtime_hours)
+            for salary in calculate_monthly_salaries(datetime.date(2024, 3, 1))
+        }
+        self.assertEqual(actual, expected)
+
+    def test_each_day_is_paid_at_the_rates_effective_on_it(self):
+        make_salary_configuration(effective_from=datetime.date(2024, 1, 1))
+        make_salary_configuration(effective_from=datetime.date(2024, 3, 15), late_deduction_rate=Decimal('10.00'))
+        employee = make_employee()
+        for day in (4, 18):
+            Attendance.objects.create(
+                employee=employee, date=datetime.date(2024, 3, day), check_in=at(day, 10), check_out=at(day, 17)
+            )
+
+        salary = calculate_monthly_salary(employee, datetime.date(2024, 3, 1))
+        self.assertEqual((salary.total_late_hours, salary.late_deductions), (Decimal('2.00'), Decimal('15.00')))
+        self.assertEqual(salary.final_salary, Decimal('2985.00'))
+
+    def test_configuration_lookups_between_checks_run_no_queries(self):
+        make_salary_configuration()
+        SalaryConfiguration.objects.index()
+        with self.assertNumQueries(0):
+            for day in range(1, 29):
+                SalaryConfiguration.objects.for_date(datetime.date(2024, 2, day))
+
+
+class SalaryRollupTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.employee = make_employee()
+        Attendance(
+            employee=self.employee, date=datetime.date(2024, 3, 4), check_in=at(4, 9), check_out=at(4, 19)
+        ).calculate_hours()
+
+    def test_periods_end_at_the_reference_month(self):
+        reference = datetime.date(2024, 5, 17)
+        self.assertEqual(period_months('quarter', reference), (datetime.date(2024, 4, 1), datetime.date(2024, 5, 1)))
+        self.assertEqual(period_months('ytd', reference), (datetime.date(2024, 1, 1), datetime.date(2024, 5, 1)))
+        self.assertEqual(period_months('rolling12', reference), (datetime.date(2023, 6, 1), datetime.date(2024, 5, 1)))
+        with self.assertRaises(ValueError):
+            period_months('week', reference)
+
+    def test_missing_months_are_calculated_and_summed(self):
+        calculate_monthly_salaries(datetime.date(2024, 1, 1))
+        rows = rollup_salaries(datetime.date(2024, 1, 1), datetime.date(2024, 3, 1))
+
+        salaries = EmployeeSalary.objects.filter(employee=self.employee)
+        self.assertEqual(salaries.count(), 3)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['months'], 3)
+        self.assertEqual(rows[0]['final_salary'], sum(salary.final_salary for salary in salaries))
+
+    def test_rollup_endpoint_returns_totals(self):
+        response = self.client.get(reverse('salary_rollup'), {'period': 'quarter', 'month': '2024-03'})
+
+        data = response.json()
+        self.assertEqual((data['start'], data['end']), ('2024-01', '2024-03'))
+        self.assertEqual(data['totals']['final_salary'], data['employees'][0]['final_salary'])
+
+    def test_reversed_range_is_rejected(self):
+        response = self.client.get(reverse('salary_rollup'), {'start': '2024-03', 'end': '2024-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class InlineExecutor:
+    """Runs submitted work in the test's own transaction instead of forked workers"""
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+@mock.patch('core.management.commands.recompute_salaries.connections')
+@mock.patch('core.management.commands.recompute_salaries.ProcessPoolExecutor', InlineExecutor)
+class RecomputeSalariesCommandTests(TestCase):
+    def setUp(self):
+        make_salary_configuration(effective_from=datetime.date(2024, 1, 1))
+        self.employee = make_employee()
+        Attendance(
+            employee=self.employee, date=datetime.date(2024, 3, 4), check_in=at(4, 9), check_out=at(4, 19)
+        ).calculate_hours()
+        for month in (datetime.date(2024, 2, 1), datetime.date(2024, 3, 1)):
+            calculate_monthly_salaries(month)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint = os.path.join(directory.name, 'checkpoint.json')
+
+    def recompute(self, **options):
+        stdout = StringIO()
+        call_command('recompute_salaries', start='2024-02', end='2024-03', checkpoint=self.checkpoint, workers=1,
+                     stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_open_salaries_are_repriced_and_closed_ones_kept(self, connections):
+        close_payroll_month(datetime.date(2024, 2, 1))
+        make_salary_configuration(effective_from=datetime.date(2024, 2, 1), overtime_fixed_rate=Decimal('45.00'))
+        march = EmployeeSalary.objects.get(month=datetime.date(2024, 3, 1))
+        self.assertGreater(march.overtime_additions, 0)
+
+        self.assertIn('Recomputed 1 salaries over 1 months', self.recompute())
+        self.assertEqual(
+            EmployeeSalary.objects.get(pk=march.pk).overtime_additions, march.overtime_additions * Decimal('1.5')
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_interrupted_run_resumes_from_its_checkpoint(self, connections):
+        def fail_february(month, employee_pks):
+            if month.month == 2:
+                raise OperationalError('database is locked')
+            return len(employee_pks)
+
+        with mock.patch('core.management.commands.recompute_salaries._recompute_chunk', side_effect=fail_february):
+            with self.assertRaisesRegex(CommandError, '1 tasks failed'):
+                self.recompute(stderr=StringIO())
+        self.assertIn('Resuming: 1 of 2 tasks already finished', self.recompute())
+
+    def test_reversed_range_is_rejected(self, connections):
+        with self.assertRaisesRegex(CommandError, '--start must not be after --end'):
+            call_command('recompute_salaries', start='2024-03', end='2024-02')
+
+
+class AttendanceSummaryTests(TestCase):
+    def setUp(self):
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 3)]
+        for check_in, check_out in ((at(4, 9), at(4, 12)), (at(4, 13), at(4, 17)), (at(5, 9), None)):
+            Attendance.objects.create(employee=self.employees[0], date=check_in.date(), check_in=check_in,
+                                      check_out=check_out)
+
+    def test_sessions_of_a_day_are_one_present_day(self):
+        first, second = summarize_attendance(datetime.date(2024, 3, 4), datetime.date(2024, 3, 7))
+
+        self.assertEqual((first['present_days'], first['absent_days']), (2, 2))
+        self.assertEqual(first['worked'], datetime.timedelta(hours=7))
+        self.assertEqual(first['attendance_percentage'], 50.0)
+        self.assertEqual((second['employee'], second['present_days'], second['worked']),
+                         (self.employees[1].pk, 0, datetime.timedelta()))
+
+    def test_endpoint_returns_worked_hours_for_selected_employees(self):
+        response = self.client.get(reverse('attendance_summary'), {
+            'start_date': '2024-03-04', 'end_date': '2024-03-07', 'employee': self.employees[0].pk
+        })
+
+        employees = response.json()['employees']
+        self.assertEqual([row['employee_id'] for row in employees], ['EMP0001'])
+        self.assertEqual((employees[0]['worked_hours'], employees[0]['attendance_percentage']), (7.0, 50.0))
+
+    def test_invalid_ranges_are_rejected(self):
+        for params in ({'start_date': '2024-03-07', 'end_date': '2024-03-04'}, {'start_date': '03/04/2024'},
+                       {'employee': 'EMP0001'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(reverse('attendance_summary'), params).status_code, 400)
+
+
+class AttendanceHeatmapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_salary_configuration()
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 3)]
+        for check_in, check_out in ((at(4, 9, 30), at(4, 17)), (at(5, 9), at(5, 17))):
+            Attendance.objects.create(employee=self.employees[0], date=check_in.date(), check_in=check_in,
+                                      check_out=check_out)
+        self.refresh()
+
+    def refresh(self):
+        refresh_daily_rollups([datetime.date(2024, 3, day) for day in range(1, 32)])
+        refresh_bitmaps(datetime.date(2024, 3, 1))
+
+    def heatmap(self):
+        return self.client.get(reverse('attendance_heatmap'), {'month': '2024-03'}).json()
+
+    def test_days_are_bits_of_each_employees_masks(self):
+        data = self.heatmap()
+
+        self.assertEqual(data['days'], 31)
+        self.assertEqual(data['employees']['employee_id'], ['EMP0001', 'EMP0002'])
+        self.assertEqual(data['employees']['present'], [0b11000, 0])
+        self.assertEqual(data['employees']['late'], [0b1000, 0])
+        self.assertEqual(data['daily'][3], {'date': '2024-03-04', 'present': 1, 'late': 1, 'average_check_in': '09:30'})
+
+    def test_cached_heatmap_follows_new_attendance(self):
+        self.heatmap()
+        Attendance.objects.create(employee=self.employees[1], date=datetime.date(2024, 3, 4), check_in=at(4, 9),
+                                  check_out=at(4, 17))
+        self.refresh()
+
+        self.assertEqual(self.heatmap()['employees']['present'], [0b11000, 0b1000])
+
+    def test_invalid_month_is_rejected(self):
+        response = self.client.get(reverse('attendance_heatmap'), {'month': 'March'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AnalyticsStoreTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 3)]
+        for employee, check_in, check_out in (
+            (self.employees[0], at(4, 9, 30), at(4, 19)),
+            (self.employees[0], at(5, 9), at(5, 17)),
+            (self.employees[1], at(4, 9), at(4, 17)),
+        ):
+            Attendance.objects.create(employee=employee, date=check_in.date(), check_in=check_in, check_out=check_out)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = directory.name
+        self.month = datetime.date(2024, 3, 1)
+
+    def test_reexport_replaces_the_partition(self):
+        with override_settings(ANALYTICS={'STORE': self.store}):
+            self.assertEqual(export_month(self.month), 3)
+            Attendance.objects.filter(employee=self.employees[1]).delete()
+            self.assertEqual(export_month(self.month), 2)
+
+        self.assertEqual(sorted(os.listdir(self.store)), ['2024-03'])
+        data = load_columns(datetime.date(2024, 3, 1), datetime.date(2024, 3, 31), ['employee'], self.store)
+        self.assertEqual(data['employee'].tolist(), [self.employees[0].pk] * 2)
+
+    def test_columns_are_measured_against_the_working_day(self):
+        export_month(self.month, self.store)
+        data = load_columns(datetime.date(2024, 3, 4), datetime.date(2024, 3, 4), ['employee', 'late', 'overtime'],
+                            self.store)
+
+        first = data['employee'] == self.employees[0].pk
+        self.assertEqual((data['late'][first][0], data['overtime'][first][0]), (1800, 7200))
+        self.assertEqual(len(data['employee']), 2)
+
+    def test_reports_aggregate_the_partitions(self):
+        export_month(self.month, self.store)
+        start, end = datetime.date(2024, 3, 1), datetime.date(2024, 3, 10)
+
+        percentage = attendance_percentage(start, end, self.store)
+        self.assertEqual(percentage['present_days'].tolist(), [2, 1])
+        self.assertEqual(percentage['percentage'].tolist(), [20.0, 10.0])
+        self.assertEqual(lateness_distribution(start, end, store=self.store)['counts'][2], 1)
+        with self.assertLogs('core.analytics', 'WARNING') as logs:
+            trend = overtime_trend(datetime.date(2024, 2, 1), end, self.store)
+        self.assertIn('No analytics partition for 2024-02', logs.output[0])
+        self.assertEqual(trend['total_hours'].tolist(), [0.0, 2.0])
+        self.assertEqual(trend['average_hours'].tolist(), [0.0, 1.0])
+
+    def test_unknown_columns_are_rejected(self):
+        with self.assertRaisesRegex(AnalyticsError, 'Unknown analytics columns: salary'):
+            load_columns(self.month, self.month, ['salary'], self.store)
+
+
+class BulkOperationTests(TestCase):
+    def setUp(self):
+        make_salary_configuration()
+        self.employees = [make_employee(f'EMP{number:04d}') for number in range(1, 4)]
+
+    def test_deactivation_counts_only_active_employees(self):
+        Employee.objects.filter(pk=self.employees[0].pk).update(is_active=False)
+        self.assertEqual(deactivate_employees(Employee.objects.all()), 2)
+        self.assertFalse(Employee.objects.filter(is_active=True).exists())
+
+    def test_closed_month_is_not_recalculated(self):
+        month = datetime.date(2024, 3, 1)
+        self.assertEqual(close_payroll_month(month), 3)
+        Attendance(
+            employee=self.employees[0], date=datetime.date(2024, 3, 4), check_in=at(4, 11), check_out=at(4, 17)
+        ).calculate_hours()
+
+        calculate_monthly_salaries(month)
+        salary = EmployeeSalary.objects.get(employee=self.employees[0], month=month)
+        self.assertEqual(salary.late_deductions, Decimal('0.00'))
+        self.assertIsNotNone(salary.closed_at)
+
+    def test_orphaned_attendance_is_deleted_with_its_rollups(self):
+        append_punch_events([{'employee': self.employees[0].pk, 'timestamp': moment} for moment in (at(4, 9), at(4, 17))])
+        project_events()
+        Attendance.objects.create(employee=self.employees[1], date=datetime.date(2024, 3, 4), check_in=at(4, 8), check_out=at(4, 16))
+
+        orphans = orphaned_attendance()
+        self.assertEqual(list(orphans.values_list('employee_id', flat=True)), [self.employees[1].pk])
+        version = month_version(datetime.date(2024, 3, 1))
+        self.assertEqual(delete_attendance(orphans), 1)
+        self.assertEqual(Attendance.objects.count(), 1)
+        self.assertEqual(DailyAttendanceRollup.objects.get(date=datetime.date(2024, 3, 4)).present_count, 1)
+        self.assertNotEqual(month_version(datetime.date(2024, 3, 1)), version)
+
+    def test_salary_adjustment_invalidates_open_months(self):
+        open_month, closed_month = datetime.date(2024, 3, 1), datetime.date(2024, 2, 1)
+        close_payroll_month(closed_month)
+        calculate_monthly_salaries(open_month)
+        versions = {month: month_version(month) for month in (open_month, closed_month)}
+
+        self.assertEqual(adjust_base_salaries(Employee.objects.filter(pk=self.employees[0].pk), Decimal('10')), 1)
+        self.assertNotEqual(month_version(open_month), versions[open_month])
+        self.assertEqual(month_version(closed_month), versions[closed_month])
+
+
+class EmployeeImportTests(TestCase):
+    HEADER = 'employee_id,first_name,last_name,email,designation,date_joined,phone_number,emergency_contact,address,base_salary'
+
+    def rows(self, *lines):
+        return read_employee_csv([self.HEADER] + list(lines))
+
+    def test_missing_columns_are_reported(self):
+        with self.assertRaisesRegex(EmployeeImportError, 'Missing columns: base_salary'):
+            list(read_employee_csv(['employee_id,first_name,last_name,email,designation,date_joined,'
+                                    'phone_number,emergency_contact,address']))
+
+    def test_invalid_rows_are_reported_by_line_and_field(self):
+        make_employee('EMP0009')
+        result = import_employees(self.rows(
+            'EMP0001,Ada,Lovelace,ada@example.com,Engineer,2024-01-02,555,556,1 Main St,4000',
+            'EMP0002,Alan,Turing,ada@example.com,Engineer,2024-01-02,555,556,1 Main St,4000',
+            'bad,Grace,Hopper,grace@example.com,Engineer,not a date,555,556,1 Main St,-5',
+            'EMP0009,Edsger,Dijkstra,edsger@example.com,Engineer,2024-01-02,555,556,1 Main St,4000',
+        ))
+
+        self.assertEqual((result['read'], result['created'], result['invalid']), (4, 1, 3))
+        errors = {error['line']: error for error in result['errors']}
+        self.assertEqual(sorted(errors), [3, 4, 5])
+        self.assertIn('email', errors[3]['errors'])
+        self.assertEqual(sorted(errors[4]['errors']), ['base_salary', 'date_joined', 'employee_id'])
+        self.assertEqual(errors[5]['errors']['employee_id'], ["Employee with this Employee id already exists."])
+        self.assertEqual(Employee.objects.get(employee_id='EMP0001').user.username, 'ada@example.com')
+
+    def test_dry_run_writes_nothing(self):
+        result = import_employees(self.rows(
+            'EMP0001,Ada,Lovelace,ada@example.com,Engineer,2024-01-02,555,556,1 Main St,4000',
+        ), dry_run=True)
+        self.assertEqual((result['valid'], result['created']), (1, 0))
+        self.assertFalse(Employee.objects.exists())
+
+
+class ProbeCacheTests(TestCase):
+    def test_entries_expire_and_the_oldest_are_evicted(self):
+        probes = ProbeCache(ttl=10, max_entries=2)
+        with mock.patch('core.matcher.time.monotonic', return_value=100.0):
+            probes.add('main', 1, b'first')
+            probes.add('main', 2, b'second')
+            probes.add('side', 3, b'third')
+            self.assertEqual(probes.recent('main'), [(2, b'second')])
+            self.assertEqual(probes.recent('side'), [(3, b'third')])
+
+        with mock.patch('core.matcher.time.monotonic', return_value=110.0):
+            self.assertEqual(probes.recent('side'), [])
+
+    def test_repeat_scan_is_matched_without_searching_the_gallery(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'pack.bin')
+        employee = make_employee()
+        write_template_pack(path, [(employee.pk, make_template(1))])
+        matcher = TemplateMatcher(pack_path=path, workers=1, sensor_threshold=50)
+
+        # Each scan lands a little differently, the sensor still matches them
+        first_scan, repeat_scan = make_template(1)[3:] + bytes(3), make_template(1)[5:] + bytes(5)
+        with mock.patch('core.fingerprint_utils.get_matcher', return_value=matcher):
+            self.assertEqual(identify_employee(first_scan, 'main', lambda probe, template: 90)[0].pk, employee.pk)
+            with mock.patch.object(matcher, 'identify') as identify:
+                match = identify_employee(repeat_scan, 'main', lambda probe, template: 90)
+
+        identify.assert_not_called()
+        self.assertEqual(match[0].pk, employee.pk)
+
+
+class LazyScannerImportTests(SimpleTestCase):
+    def test_web_workers_do_not_load_the_scanner_stack(self):
+        script = (
+            'import sys, django; django.setup(); import core.urls; '
+            'print(",".join(name for name in ("serial", "core.fingerprint_utils", "core.matcher") if name in sys.modules))'
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                check=True)
+        self.assertEqual(result.stdout.strip(), '')
+
+
+class FakeScanner:
+    def __init__(self):
+        self.serial = mock.Mock(port='/dev/null')
+        self.responding = True
+        self.closed = False
+
+    def get_scanner_status(self):
+        return {'scanner_connected': True} if self.responding else {'scanner_connected': False, 'error': 'No reply'}
+
+    def is_connected(self):
+        return not self.closed
+
+    def clean_scanner(self):
+        self.closed = True
+
+
+class ScannerMonitorTests(TestCase):
+    def setUp(self):
+        self.scanners = []
+
+        def connect():
+            self.scanners.append(FakeScanner())
+            return self.scanners[-1]
+
+        self.monitor = ScannerMonitor(connect=connect, interval=60, failure_limit=2)
+        self.assertTrue(self.monitor.start())
+        self.addCleanup(self.monitor.stop)
+
+    def test_failed_probes_disconnect_and_reconnect(self):
+        self.scanners[0].responding = False
+        with self.assertLogs('core.scanner_health', 'ERROR'):
+            self.assertFalse(self.monitor.probe())
+            self.assertFalse(self.monitor.probe())
+
+        self.assertFalse(self.monitor.connected)
+        self.assertTrue(self.scanners[0].closed)
+        with self.assertRaises(ScannerUnavailable):
+            with self.monitor.session():
+                pass
+
+        self.assertTrue(self.monitor._try_connect())
+        with self.monitor.session() as scanner:
+            self.assertIs(scanner, self.scanners[1])
+        health = self.monitor.health()
+        self.assertEqual((health['disconnects'], health['error_rate']), (1, 1.0))
@@ -5,13 +5,22 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('employees/', views.employee_list, name='employee_list'),
     path('employees/create/', views.create_employee, name='create_employee'),
+    path('employees/import/', views.import_employees, name='import_employees'),
     path('employees/<int:pk>/', views.employee_detail, name='employee_detail'),
     path('enroll-fingerprint/<int:employee_id>/', views.enroll_fingerprint, name='enroll_fingerprint'),
     path('process-attendance/', views.process_attendance, name='process_attendance'),
+    path('attendance/ingest/', views.ingest_attendance, name='ingest_attendance'),
+    path('attendance/import/', views.import_attendance, name='import_attendance'),
+    path('template-pack/', views.download_template_pack, name='download_template_pack'),
     path('attendance-report/', views.attendance_report, name='attendance_report'),
+    path('attendance-report/summary/', views.attendance_summary, name='attendance_summary'),
+    path('attendance-report/heatmap/', views.attendance_heatmap, name='attendance_heatmap'),
     path('attendance-report/<int:employee_id>/', views.attendance_report, name='employee_attendance_report'),
     path('scanner-status/', views.scanner_status, name='scanner_status'),
+    path('scanner-health/', views.scanner_health, name='scanner_health'),
     path('salary-report/', views.salary_report, name='salary_report'),
     path('salary-report/download/', views.download_salary_report, name='download_salary_report'),
+    path('salary-report/rollup/', views.salary_rollup, name='salary_rollup'),
+    path('payroll-runs/<int:pk>/', views.payroll_run_status, name='payroll_run_status'),
     path('salary-configuration/', views.salary_configuration, name='salary_configuration'),
 ]
\ No newline at end of file
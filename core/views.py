@@ -1,18 +1,36 @@
 # attendance/views.py
+import codecs
 import csv
 import datetime
+import functools
 import json
+from decimal import Decimal
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, HttpResponse, JsonResponse
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.db import transaction
-from .models import Employee, Attendance, EmployeeSalary, SalaryConfiguration, calculate_monthly_salary
+from .models import Employee, Attendance, EmployeeSalary, PayrollRun, SalaryConfiguration, calculate_monthly_salary
+from .employee_import import EmployeeImportError, import_employees as import_employee_rows, read_employee_csv
 from .forms import EmployeeForm, SalaryConfigurationForm
-from .fingerprint_utils import FingerprintScanner, FingerprintError, record_attendance
+from .ingest import IngestError, ingest_punch_stream, ingest_punches, parse_punch, read_punch_stream, split_known_employees
+from .jobs import snapshot_records, start_payroll_run
+from .payroll import SALARY_FIELDS, period_months, rollup_salaries
+from .report_cache import get_cache_timeout, month_version, range_version
+from .rollups import get_heatmap_json
+from .summary import summarize_attendance
+from .template_pack import TemplatePack, TemplatePackError, append_template
 import logging
 
+# The scanner stack (pyserial, the template matcher) is imported inside the
+# views that talk to a scanner, so web workers that never do start faster
 logger = logging.getLogger(__name__)
 
 # @login_required
@@ -61,6 +79,8 @@ def employee_detail(request, pk):
 # @login_required
 def enroll_fingerprint(request, employee_id):
     """Handle fingerprint enrollment for an employee"""
+    from .enrollment import enroll_template
+    from .fingerprint_utils import FingerprintScanner, FingerprintError, find_duplicate_enrollment, sensor_compare
     employee = get_object_or_404(Employee, id=employee_id)
     
     if request.method == 'POST':
@@ -74,15 +94,53 @@ def enroll_fingerprint(request, employee_id):
                 return JsonResponse({'status': 'success', 'message': 'Enrollment started'})
                 
             elif action == 'complete':
-                # Complete the enrollment process
-                template, template_hash = scanner.enroll_fingerprint()
+                # Scan the finger several times and keep only good, agreeing scans
+                enrolled = enroll_template(scanner)
+                template, template_hash = enrolled.template, enrolled.template_hash
+                
+                try:
+                    duplicate = find_duplicate_enrollment(template, template_hash, employee, sensor_compare(scanner))
+                except (OSError, TemplatePackError) as e:
+                    # No pack yet, so only the hash check applies
+                    logger.warning(f"Duplicate check skipped for {employee.employee_id}: {str(e)}")
+                    duplicate = Employee.objects.filter(
+                        fingerprint_hash=template_hash
+                    ).exclude(pk=employee.pk).first()
+                
+                if duplicate:
+                    logger.warning(
+                        f"Fingerprint for {employee.employee_id} matches {duplicate.employee_id}"
+                    )
+                    if settings.FINGERPRINT_MATCHER.get('REJECT_DUPLICATES', True):
+                        return JsonResponse({
+                            'status': 'error',
+                            'message': f'This fingerprint is already enrolled for {duplicate.employee_id}',
+                            'duplicate_of': duplicate.employee_id
+                        })
                 
                 with transaction.atomic():
                     employee.fingerprint_data = template
                     employee.fingerprint_hash = template_hash
+                    employee.fingerprint_quality = enrolled.quality
+                    employee.fingerprint_samples = enrolled.samples
                     employee.save()
                 
-                return JsonResponse({'status': 'success', 'message': 'Enrollment completed'})
+                try:
+                    append_template(employee.pk, template)
+                except (OSError, TemplatePackError) as e:
+                    # The pack can always be rebuilt from the database
+                    logger.error(f"Failed to add {employee.employee_id} to template pack: {str(e)}")
+                
+                response = {
+                    'status': 'success',
+                    'message': 'Enrollment completed',
+                    'quality': enrolled.quality,
+                    'samples': enrolled.samples,
+                    'rejected': enrolled.rejected,
+                }
+                if duplicate:
+                    response['duplicate_of'] = duplicate.employee_id
+                return JsonResponse(response)
             
         except FingerprintError as e:
             return JsonResponse({'status': 'error', 'message': str(e)})
@@ -97,9 +155,21 @@ def enroll_fingerprint(request, employee_id):
     
     return render(request, 'core/enroll_fingerprint.html', {'employee': employee})
 
+# @login_required
+@require_GET
+def scanner_health(request):
+    """Health metrics of the scanner service on this host"""
+    from .scanner_health import read_health
+    health = read_health()
+    if health is None:
+        return JsonResponse({'status': 'error', 'message': 'Scanner service is not running'}, status=503)
+    healthy = health['connected'] and not health['stale']
+    return JsonResponse({'status': 'success' if healthy else 'error', **health}, status=200 if healthy else 503)
+
 # @login_required
 def scanner_status(request):
     """Check current scanner status during enrollment"""
+    from .fingerprint_utils import FingerprintScanner
     try:
         scanner = FingerprintScanner()
         if scanner.scanner.readImage():
@@ -159,20 +229,34 @@ def scanner_status(request):
 # @login_required
 def process_attendance(request):
     """Enhanced attendance processing with hour calculations"""
+    from .fingerprint_utils import FingerprintScanner, identify_employee, record_punch, sensor_compare
     try:
         scanner = FingerprintScanner()
         
-        # Verify fingerprint and get employee
-        employee = scanner.verify_fingerprint(scanner)
-        if not employee:
+        # Capture a probe and identify it against the template pack
+        match = identify_employee(scanner.capture_template(), compare=sensor_compare(scanner))
+        if not match:
             return JsonResponse({'status': 'error', 'message': 'No matching fingerprint found'})
         
+        employee, score = match
+        
         # Record attendance
-        attendance = record_attendance(employee)
+        attendance, status = record_punch(employee, score=score)
         
-        # Calculate hours if it's a check-out
+        if status == 'duplicate':
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Attendance already recorded.'
+            })
+        if status == 'recorded':
+            return JsonResponse({
+                'status': 'success',
+                'message': 'Punch recorded.'
+            })
+        
+        # Hours for the message only; payroll derives them from the sessions
         if attendance.check_out:
-            attendance.calculate_hours()
+            attendance.compute_hours()
         
         # Prepare response message
         if attendance.check_out:
@@ -196,6 +280,81 @@ def process_attendance(request):
             'status': 'error',
             'message': str(e)
         })
+    
+    finally:
+        if 'scanner' in locals():
+            scanner.clean_scanner()
+
+def _sync_authorized(request):
+    """Terminals authenticate with the shared ATTENDANCE_SYNC token"""
+    token = settings.ATTENDANCE_SYNC.get('TOKEN')
+    return bool(token) and constant_time_compare(request.headers.get('X-Sync-Token', ''), token)
+
+@csrf_exempt
+@require_POST
+def ingest_attendance(request):
+    """Apply a batch of punches journaled by a terminal"""
+    if not _sync_authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Not authorized'}, status=403)
+    
+    try:
+        data = json.loads(request.body)
+        raw_punches = list(data.get('punches', []))
+    except (ValueError, AttributeError, TypeError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    
+    # Bad punches are rejected one by one so they cannot hold up the rest of the batch
+    punches, rejected = [], []
+    for raw in raw_punches:
+        try:
+            punches.append(dict(parse_punch(raw), id=raw.get('id')))
+        except (IngestError, AttributeError) as e:
+            rejected.append({'id': raw.get('id') if isinstance(raw, dict) else None, 'message': str(e)})
+    
+    punches, unknown = split_known_employees(punches)
+    rejected.extend({'id': punch['id'], 'message': f"Unknown employee {punch['employee']}"} for punch in unknown)
+    
+    stats = ingest_punches(punches)
+    return JsonResponse({'status': 'success', **stats, 'unknown': len(unknown), 'rejected': rejected})
+
+@csrf_exempt
+@require_POST
+def import_attendance(request):
+    """Bulk import a CSV or JSONL punch stream from old clocks or other sites"""
+    if not _sync_authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Not authorized'}, status=403)
+    
+    content_type = request.content_type
+    if content_type == 'text/csv':
+        format = 'csv'
+    elif content_type in ('application/x-ndjson', 'application/jsonl'):
+        format = 'jsonl'
+    else:
+        return JsonResponse({'status': 'error', 'message': f'Unsupported content type {content_type}'}, status=415)
+    
+    # Stream the body rather than loading the whole upload into memory
+    stream = codecs.iterdecode(request, 'utf-8')
+    totals = ingest_punch_stream(read_punch_stream(stream, format))
+    return JsonResponse({'status': 'success', **totals})
+
+@require_GET
+def download_template_pack(request):
+    """Serve the template pack to terminals, honouring If-None-Match"""
+    if not _sync_authorized(request):
+        return JsonResponse({'status': 'error', 'message': 'Not authorized'}, status=403)
+    
+    try:
+        pack = TemplatePack.open()
+    except TemplatePackError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=404)
+    
+    etag = f'"{pack.content_hash}"'
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponse(status=304)
+    
+    response = FileResponse(open(pack.path, 'rb'), content_type='application/octet-stream')
+    response['ETag'] = etag
+    return response
 
 def salary_report(request, employee_id=None):
     """Generate salary report for an employee or all employees"""
@@ -216,7 +375,7 @@ def salary_report(request, employee_id=None):
     context = {
         'salary_records': salary_records,
         'month': month_date,
-        'config': SalaryConfiguration.objects.first()
+        'config': SalaryConfiguration.objects.for_date(month_date)
     }
     return render(request, 'attendance/salary_report.html', context)
     """Handle check-in/check-out via fingerprint"""
@@ -300,26 +459,85 @@ def salary_report(request, employee_id=None):
 # @login_required
 def attendance_report(request, employee_id=None):
     """Generate attendance report for an employee or all employees"""
-    start_date = request.GET.get('start_date', timezone.now().date())
-    end_date = request.GET.get('end_date', timezone.now().date())
+    try:
+        start_date = parse_date(request.GET.get('start_date') or '') or timezone.localdate()
+        end_date = parse_date(request.GET.get('end_date') or '') or timezone.localdate()
+    except ValueError as e:
+        messages.error(request, str(e))
+        start_date = end_date = timezone.localdate()
     
     attendance_query = Attendance.objects.filter(
         date__range=[start_date, end_date]
-    ).select_related('employee')
+    ).select_related('employee', 'employee__user')
     
     if employee_id:
         attendance_query = attendance_query.filter(employee_id=employee_id)
     
-    attendance_records = attendance_query.order_by('-date')
+    # Lazy, so the query only runs when the cached table has to be rendered
+    attendance_records = attendance_query.order_by('-date', 'employee__employee_id', 'check_in')
     
     context = {
         'attendance_records': attendance_records,
         'start_date': start_date,
         'end_date': end_date,
-        'employee_id': employee_id
+        'employee_id': employee_id,
+        'report_version': range_version(start_date, end_date),
+        'report_cache_timeout': get_cache_timeout()
     }
     return render(request, 'core/attendance_report.html', context)
 
+# @login_required
+@require_GET
+def attendance_summary(request):
+    """Present days, worked hours and attendance percentage per employee for a date range"""
+    try:
+        start_date = parse_date(request.GET.get('start_date') or timezone.localdate().isoformat())
+        end_date = parse_date(request.GET.get('end_date') or '') or start_date
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    if start_date is None:
+        return JsonResponse({'status': 'error', 'message': 'Dates must be YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'status': 'error', 'message': 'start_date must not be after end_date'}, status=400)
+
+    employee_pks = None
+    if request.GET.getlist('employee'):
+        try:
+            employee_pks = [int(pk) for pk in request.GET.getlist('employee')]
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'employee must be an employee pk'}, status=400)
+
+    rows = summarize_attendance(start_date, end_date, employee_pks)
+    return JsonResponse({
+        'status': 'success',
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'employees': [
+            {
+                **{key: value for key, value in row.items() if key != 'worked'},
+                'worked_hours': round(row['worked'].total_seconds() / 3600, 2),
+                'attendance_percentage': round(row['attendance_percentage'], 2),
+            }
+            for row in rows
+        ]
+    })
+
+# @login_required
+@require_GET
+def attendance_heatmap(request):
+    """
+    Presence and lateness of every employee for each day of a month.
+
+    Bit ``day - 1`` of an employee's ``present`` and ``late`` masks is set
+    for the days they attended or arrived late.
+    """
+    try:
+        selected_month = request.GET.get('month')
+        month = datetime.datetime.strptime(selected_month, '%Y-%m').date() if selected_month else timezone.localdate().replace(day=1)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'month must be YYYY-MM'}, status=400)
+    return HttpResponse(get_heatmap_json(month), content_type='application/json')
+
 # @login_required
 def create_employee(request):
     """Create new employee record"""
@@ -338,6 +556,23 @@ def create_employee(request):
     
     return render(request, 'core/employee_form.html', {'form': form})
 
+# @login_required
+@require_POST
+def import_employees(request):
+    """Create employees in bulk from a CSV body or an uploaded ``file``"""
+    if 'file' in request.FILES:
+        stream = codecs.iterdecode(request.FILES['file'], 'utf-8-sig')
+    elif request.content_type == 'text/csv':
+        stream = codecs.iterdecode(request, 'utf-8-sig')
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Send a CSV body or a file upload'}, status=415)
+    
+    try:
+        result = import_employee_rows(read_employee_csv(stream), dry_run=request.GET.get('dry_run') == '1')
+    except (EmployeeImportError, UnicodeDecodeError, csv.Error) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
 # views.py
 
 # @login_required
@@ -348,36 +583,30 @@ def salary_report(request):
     if selected_month:
         month_date = datetime.datetime.strptime(selected_month, '%Y-%m').date()
     else:
-        today = timezone.now()
-        month_date = today.replace(day=1)
+        month_date = timezone.localdate().replace(day=1)
 
-    # Get all active employees
-    employees = Employee.objects.filter(is_active=True)
-    
-    # Calculate salary for each employee
-    salary_records = []
-    for employee in employees:
-        try:
-            salary_record = calculate_monthly_salary(employee, month_date)
-            salary_records.append({
-                'employee': employee,
-                'salary': salary_record,
-                'error': None
-            })
-        except Exception as e:
-            salary_records.append({
-                'employee': employee,
-                'salary': None,
-                'error': str(e)
-            })
+    # The report is served from the month's payroll run snapshot
+    run, salary_records = None, []
+    try:
+        run = start_payroll_run(month_date, force=bool(request.GET.get('refresh')))
+        if run.status == PayrollRun.STATUS_COMPLETED:
+            # Called by the template only when the cached table is missing
+            salary_records = functools.partial(snapshot_records, run)
+        elif run.status == PayrollRun.STATUS_FAILED:
+            messages.error(request, f'Error calculating salaries: {run.error}')
+    except ValueError as e:
+        messages.error(request, str(e))
 
     # Get salary configuration for reference
-    salary_config = SalaryConfiguration.objects.first()
+    salary_config = SalaryConfiguration.objects.for_date(month_date)
 
     context = {
         'salary_records': salary_records,
+        'payroll_run': run,
         'selected_month': month_date,
         'salary_config': salary_config,
+        'report_version': month_version(month_date),
+        'report_cache_timeout': get_cache_timeout(),
         # Add previous and next month for navigation
         'prev_month': (month_date - datetime.timedelta(days=1)).replace(day=1),
         'next_month': (month_date + datetime.timedelta(days=32)).replace(day=1)
@@ -385,6 +614,18 @@ def salary_report(request):
     
     return render(request, 'core/salary_report.html', context)
 
+# @login_required
+@require_GET
+def payroll_run_status(request, pk):
+    """Progress of a payroll run, polled by the salary report while it computes"""
+    run = get_object_or_404(PayrollRun, pk=pk)
+    return JsonResponse({
+        'status': run.status,
+        'progress': run.progress,
+        'total': run.total,
+        'message': run.error
+    })
+
 # @login_required
 def download_salary_report(request):
     """Download salary report as CSV"""
@@ -392,7 +633,17 @@ def download_salary_report(request):
     if selected_month:
         month_date = datetime.datetime.strptime(selected_month, '%Y-%m').date()
     else:
-        month_date = timezone.now().replace(day=1)
+        month_date = timezone.localdate().replace(day=1)
+
+    try:
+        run = start_payroll_run(month_date)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(f"{reverse('salary_report')}?month={month_date:%Y-%m}")
+
+    if run.status != PayrollRun.STATUS_COMPLETED:
+        messages.info(request, 'The salary report is still being calculated, download it once it is ready')
+        return redirect(f"{reverse('salary_report')}?month={month_date:%Y-%m}")
 
     # Create response with CSV header
     response = HttpResponse(content_type='text/csv')
@@ -412,41 +663,72 @@ def download_salary_report(request):
         'Final Salary'
     ])
 
-    for employee in Employee.objects.filter(is_active=True):
-        try:
-            salary = calculate_monthly_salary(employee, month_date)
-            writer.writerow([
-                employee.employee_id,
-                employee.get_full_name(),
-                salary.base_salary,
-                salary.total_late_hours,
-                salary.total_early_leave_hours,
-                salary.total_overtime_hours,
-                salary.late_deductions,
-                salary.early_leave_deductions,
-                salary.overtime_additions,
-                salary.final_salary
-            ])
-        except Exception as e:
-            writer.writerow([
-                employee.employee_id,
-                employee.get_full_name(),
-                'Error calculating salary',
-                str(e)
-            ])
+    for row in run.snapshot:
+        writer.writerow([
+            row['employee_id'],
+            row['name'],
+            row['base_salary'],
+            row['total_late_hours'],
+            row['total_early_leave_hours'],
+            row['total_overtime_hours'],
+            row['late_deductions'],
+            row['early_leave_deductions'],
+            row['overtime_additions'],
+            row['final_salary']
+        ])
 
     return response
 
+# @login_required
+@require_GET
+def salary_rollup(request):
+    """Per-employee salary totals for a quarter, year to date or other range of months"""
+    try:
+        if request.GET.get('start'):
+            start = datetime.datetime.strptime(request.GET['start'], '%Y-%m').date()
+            end = datetime.datetime.strptime(request.GET.get('end') or request.GET['start'], '%Y-%m').date()
+        else:
+            selected_month = request.GET.get('month')
+            reference = datetime.datetime.strptime(selected_month, '%Y-%m').date() if selected_month else timezone.localdate()
+            start, end = period_months(request.GET.get('period', 'ytd'), reference)
+        if start > end:
+            raise ValueError("start must not be after end")
+        rows = rollup_salaries(start, end)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    fields = ['base_salary'] + SALARY_FIELDS
+    totals = {field: sum((row[field] for row in rows), Decimal('0.00')) for field in fields}
+
+    return JsonResponse({
+        'status': 'success',
+        'start': start.strftime('%Y-%m'),
+        'end': end.strftime('%Y-%m'),
+        'employees': [
+            {**row, **{field: str(row[field]) for field in fields}}
+            for row in rows
+        ],
+        'totals': {field: str(value) for field, value in totals.items()}
+    })
+
 # @login_required
 def salary_configuration(request):
-    """View and edit salary configuration."""
-    config = SalaryConfiguration.objects.first()
+    """View and edit salary configuration versions."""
+    config = SalaryConfiguration.objects.for_date()
 
     if request.method == 'POST':
-        form = SalaryConfigurationForm(request.POST, instance=config)
+        # Saving with a new effective date adds a version instead of rewriting history
+        effective_from = parse_date(request.POST.get('effective_from') or '')
+        instance = SalaryConfiguration.objects.filter(effective_from=effective_from).first() if effective_from else None
+        form = SalaryConfigurationForm(request.POST, instance=instance)
         if form.is_valid():
-            form.save()
-            messages.success(request, "Salary configuration updated successfully!")
+            version = form.save()
+            messages.success(
+                request,
+                f"Salary configuration effective from {version.effective_from} saved. Salary reports from "
+                f"{version.effective_from:%B %Y} onward will use the new rates; run recompute_salaries "
+                f"--start {version.effective_from:%Y-%m} to update stored salaries."
+            )
             return redirect('salary_configuration')
     else:
         form = SalaryConfigurationForm(instance=config)
@@ -454,5 +736,6 @@ def salary_configuration(request):
     context = {
         'form': form,
         'config': config,
+        'versions': SalaryConfiguration.objects.order_by('-effective_from'),
     }
     return render(request, 'core/salary_configuration.html', context)
\ No newline at end of file